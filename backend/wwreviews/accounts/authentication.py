@@ -0,0 +1,47 @@
+"""
+Token authentication loading the token, user and member in one query, with an optional in-process token cache.
+"""
+import time
+
+from django.conf import settings
+from django.utils.translation import gettext_lazy as _
+from rest_framework import exceptions
+from rest_framework.authentication import TokenAuthentication
+
+# Maps token keys to `(expires_at, user, token)`, shared by the threads of a process.
+_token_cache: dict[str, tuple[float, object, object]] = {}
+TOKEN_CACHE_MAX_SIZE = 10_000
+
+
+def clear_token_cache():
+    _token_cache.clear()
+
+
+class MemberTokenAuthentication(TokenAuthentication):
+    """
+    Token authentication which joins the user's member onto the token lookup, so role checks need no extra query.
+
+    With `TOKEN_CACHE_TTL` set to a positive number of seconds, authenticated tokens are also reused from an
+    in-process cache for that long. Writes to tokens, users and members clear the cache of the process making them,
+    other processes see them once the TTL expires.
+    """
+
+    def authenticate_credentials(self, key):
+        ttl = getattr(settings, "TOKEN_CACHE_TTL", 0)
+        if ttl > 0:
+            cached = _token_cache.get(key)
+            if cached is not None and cached[0] > time.monotonic():
+                return cached[1], cached[2]
+
+        try:
+            token = self.get_model().objects.select_related("user__member").get(key=key)
+        except self.get_model().DoesNotExist as err:
+            raise exceptions.AuthenticationFailed(_("Invalid token.")) from err
+        if not token.user.is_active:
+            raise exceptions.AuthenticationFailed(_("User inactive or deleted."))
+
+        if ttl > 0:
+            if len(_token_cache) >= TOKEN_CACHE_MAX_SIZE:
+                _token_cache.clear()
+            _token_cache[key] = (time.monotonic() + ttl, token.user, token)
+        return token.user, token
@@ -0,0 +1,23 @@
+from rest_framework.permissions import BasePermission
+
+from accounts.models import Member
+
+
+def is_moderator(request) -> bool:
+    """
+    Whether the requesting user's member has the moderator role, for views that only allow some actions to moderators.
+    """
+    # Users without a member, including anonymous users, raise an AttributeError subclass on `.member`.
+    member = getattr(request.user, "member", None)
+    return member is not None and member.role == Member.Role.MODERATOR
+
+
+class IsModerator(BasePermission):
+    """
+    Allows access only to users whose member has the moderator role.
+    """
+
+    message = "Only moderators are authorized to perform this action."
+
+    def has_permission(self, request, view) -> bool:
+        return is_moderator(request)
@@ -0,0 +1,135 @@
+"""
+Lazily constructed Reddit API clients.
+
+praw is only imported, and the application's client only constructed, the first time a view needs to talk to Reddit,
+so settings imports, worker boots and management commands do not pay for it.
+
+The OAuth login callback talks to Reddit with an async HTTP client (httpx, imported as lazily as praw) instead, so
+slow Reddit responses do not tie up a worker while it waits for them. Each event loop has its own client, so logins
+served by a loop reuse its pooled connections to Reddit.
+"""
+import asyncio
+import threading
+
+from django.conf import settings
+
+_lock = threading.Lock()
+_client = None
+# Maps each running event loop to its HTTP client for Reddit, see `get_http_client`.
+_http_clients = {}
+_http_client_closers = set()
+
+
+class RedditAuthError(Exception):
+    """
+    Raised when Reddit rejects an authorization code or cannot be reached.
+    """
+
+
+def create_reddit_client():
+    """
+    Creates a new Reddit client with the application's credentials. Clients authorizing a user hold that user's
+    tokens afterwards, so they must not be shared between requests.
+    """
+    import praw  # pylint: disable=C0415
+
+    return praw.Reddit(
+        client_id=settings.REDDIT_CLIENT_ID,
+        client_secret=settings.REDDIT_CLIENT_SECRET,
+        redirect_uri=settings.REDDIT_REDIRECT_URL,
+        user_agent=settings.REDDIT_USER_AGENT,
+        check_for_updates=False,
+    )
+
+
+def get_reddit_client():
+    """
+    Gets the process-wide Reddit client of the application, constructing it on first use.
+    """
+    global _client  # pylint: disable=W0603
+    if _client is None:
+        with _lock:
+            if _client is None:
+                _client = create_reddit_client()
+    return _client
+
+
+def create_http_client():
+    """
+    Creates an async HTTP client for Reddit. Clients are bound to the event loop they are used in.
+    """
+    import httpx  # pylint: disable=C0415
+
+    return httpx.AsyncClient(
+        headers={"User-Agent": settings.REDDIT_USER_AGENT or "wwreviews"},
+        timeout=httpx.Timeout(settings.REDDIT_HTTP_TIMEOUT, connect=settings.REDDIT_HTTP_CONNECT_TIMEOUT),
+    )
+
+
+async def _close_on_shutdown(loop, client):
+    try:
+        await loop.create_future()
+    finally:
+        del _http_clients[loop]
+        await client.aclose()
+
+
+def get_http_client():
+    """
+    Gets the async HTTP client for Reddit of the running event loop, creating it on first use. The client is closed
+    when the loop shuts down, as `asyncio.run` (which ASGI servers and `async_to_sync` run their loops with) cancels
+    the tasks left in the loop before closing it.
+    """
+    loop = asyncio.get_running_loop()
+    if loop not in _http_clients:
+        _http_clients[loop] = create_http_client()
+        # The loop only keeps weak references to its tasks.
+        closer = loop.create_task(_close_on_shutdown(loop, _http_clients[loop]))
+        _http_client_closers.add(closer)
+        closer.add_done_callback(_http_client_closers.discard)
+    return _http_clients[loop]
+
+
+async def authorize(client, code: str) -> dict:
+    """
+    Exchanges an OAuth authorization code for the user's tokens.
+
+    Args:
+        client: HTTP client from `get_http_client`.
+        code: Authorization code Reddit redirected the user back with.
+
+    Returns:
+        Dictionary of the token response, including the `access_token` and `refresh_token`.
+    """
+    import httpx  # pylint: disable=C0415
+
+    try:
+        response = await client.post(
+            f"{settings.REDDIT_WWW_URL}/api/v1/access_token",
+            auth=(settings.REDDIT_CLIENT_ID, settings.REDDIT_CLIENT_SECRET),
+            data={"grant_type": "authorization_code", "code": code, "redirect_uri": settings.REDDIT_REDIRECT_URL},
+        )
+        response.raise_for_status()
+        tokens = response.json()
+    except (httpx.HTTPError, ValueError) as err:
+        raise RedditAuthError(f"Could not authorize with Reddit: {err}") from err
+    # Reddit reports invalid codes with a successful status and an error in the body.
+    if "error" in tokens or "access_token" not in tokens:
+        raise RedditAuthError(f"Reddit rejected the authorization code: {tokens.get('error')}")
+    return tokens
+
+
+async def fetch_username(client, access_token: str) -> str:
+    """
+    Gets the Reddit username of the user an access token was issued to, with an HTTP client from `get_http_client`.
+    """
+    import httpx  # pylint: disable=C0415
+
+    try:
+        response = await client.get(
+            f"{settings.REDDIT_OAUTH_URL}/api/v1/me", headers={"Authorization": f"bearer {access_token}"}
+        )
+        response.raise_for_status()
+        return response.json()["name"]
+    except (httpx.HTTPError, ValueError, KeyError) as err:
+        raise RedditAuthError(f"Could not fetch the Reddit user: {err}") from err
@@ -0,0 +1,20 @@
+"""
+Signal handlers clearing the in-process token cache when the data it holds is written.
+"""
+from django.contrib.auth.models import User
+from django.db.models.signals import post_delete, post_save
+from django.dispatch import receiver
+from rest_framework.authtoken.models import Token
+
+from accounts.authentication import clear_token_cache
+from accounts.models import Member
+
+
+@receiver(post_save, sender=Token)
+@receiver(post_delete, sender=Token)
+@receiver(post_save, sender=User)
+@receiver(post_delete, sender=User)
+@receiver(post_save, sender=Member)
+@receiver(post_delete, sender=Member)
+def invalidate_token_cache(sender, **kwargs):
+    clear_token_cache()
@@ -1,3 +1,235 @@
-from django.test import TestCase
+import asyncio
+import json
+import threading
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from urllib.parse import parse_qs
 
-# Create your tests here.
+from django.conf import settings
+from django.contrib.auth.models import User
+from django.contrib.sessions.backends.db import SessionStore
+from django.test import SimpleTestCase, TestCase, override_settings
+from rest_framework.authtoken.models import Token
+from rest_framework.test import APIClient
+
+from accounts.authentication import clear_token_cache
+from accounts.models import Member
+from accounts.reddit import get_http_client, get_reddit_client
+from benchmarks.utils import measure_import_time
+from products.models import SuggestedProduct
+
+
+def create_client(username: str, role: Member.Role = Member.Role.USER) -> APIClient:
+    """
+    Creates a member with the given role and returns an API client authenticated with their token.
+    """
+    user = User.objects.create(username=username)
+    Member.objects.create(user=user, role=role, reddit_username=username)
+    client = APIClient()
+    client.credentials(HTTP_AUTHORIZATION=f"Token {Token.objects.create(user=user).key}")
+    return client
+
+
+class MemberTokenAuthenticationTests(TestCase):
+    def setUp(self):
+        clear_token_cache()
+        self.moderator = create_client("moderator", Member.Role.MODERATOR)
+
+    def test_role_checks_need_no_member_query(self):
+        # One query authenticates with the member joined (it was a second, separate query before), one lists.
+        with self.assertNumQueries(2):
+            response = self.moderator.get("/v1/products/suggested-product/")
+        self.assertEqual(response.status_code, 200)
+        SuggestedProduct.objects.create(
+            name="Saw",
+            price=1.0,
+            link="https://example.com/saw",
+            image_url="https://example.com/saw.png",
+            user=User.objects.get(),
+            category="Saws",
+        )
+        self.assertEqual(len(self.moderator.get("/v1/products/suggested-product/").data), 1)
+
+    @override_settings(TOKEN_CACHE_TTL=60)
+    def test_cached_token_skips_authentication_query(self):
+        self.moderator.get("/v1/products/suggested-product/")
+        with self.assertNumQueries(1):
+            self.moderator.get("/v1/products/suggested-product/")
+
+    @override_settings(TOKEN_CACHE_TTL=60)
+    def test_role_changes_clear_cached_tokens(self):
+        self.moderator.post("/v1/products/category/", {"name": "Saws"})
+        Member.objects.update(role=Member.Role.USER)
+        Member.objects.get().save()
+        response = self.moderator.post("/v1/products/category/", {"name": "Chisels"})
+        self.assertEqual(response.status_code, 401)
+
+    def test_invalid_token_is_rejected(self):
+        client = APIClient()
+        client.credentials(HTTP_AUTHORIZATION="Token invalid")
+        self.assertEqual(client.get("/v1/products/suggested-product/").status_code, 401)
+
+
+class IsModeratorTests(TestCase):
+    def test_only_moderators_create_categories(self):
+        response = create_client("user").post("/v1/products/category/", {"name": "Saws"})
+        self.assertEqual(response.status_code, 401)
+        response = create_client("moderator", Member.Role.MODERATOR).post("/v1/products/category/", {"name": "Saws"})
+        self.assertEqual(response.status_code, 201)
+
+    def test_user_without_member_is_not_a_moderator(self):
+        user = User.objects.create()
+        User.objects.create(username="other")
+        client = APIClient()
+        client.credentials(HTTP_AUTHORIZATION=f"Token {Token.objects.create(user=user).key}")
+        self.assertEqual(client.post("/v1/products/category/", {"name": "Saws"}).status_code, 401)
+        self.assertEqual(client.get("/v1/accounts/member/").data, [])
+        self.assertEqual([found["id"] for found in client.get("/v1/auth/user/").data], [user.pk])
+
+
+class StartupImportTests(SimpleTestCase):
+    # Modules only the views talking to Reddit may import. Import times are measured by the `benchmark_startup` command.
+    LAZY_MODULES = {"praw", "prawcore", "httpx"}
+
+    def test_startup_does_not_import_reddit_clients(self):
+        for module in ("wwreviews.settings", "wwreviews.wsgi", "wwreviews.asgi"):
+            with self.subTest(module=module):
+                _, modules = measure_import_time(module, repeat=1)
+                self.assertIn(module, modules)
+                self.assertFalse(self.LAZY_MODULES & modules)
+
+    @override_settings(REDDIT_CLIENT_ID="id", REDDIT_CLIENT_SECRET="secret", REDDIT_USER_AGENT="tests")
+    def test_reddit_client_is_shared(self):
+        self.assertIs(get_reddit_client(), get_reddit_client())
+
+
+class StubRedditServer:
+    """
+    Local stand-in for Reddit's OAuth endpoints, counting the connections made to it and the requests in flight, which
+    are held until `gate` is set. The authorization code is used as the username, and the code "invalid" is rejected.
+    """
+
+    def __init__(self):
+        self.gate = threading.Event()
+        self.gate.set()
+        self.connections = 0
+        self.in_flight = 0
+        self.lock = threading.Lock()
+        stub = self
+
+        class Handler(BaseHTTPRequestHandler):
+            # Keeps connections alive between requests.
+            protocol_version = "HTTP/1.1"
+
+            def setup(self):
+                super().setup()
+                with stub.lock:
+                    stub.connections += 1
+
+            def do_POST(self):  # pylint: disable=C0103
+                form = parse_qs(self.rfile.read(int(self.headers["Content-Length"])).decode())
+                code = form["code"][0]
+                if code == "invalid":
+                    self.respond({"error": "invalid_grant"})
+                else:
+                    self.respond({"access_token": f"access-{code}", "refresh_token": f"refresh-{code}"})
+
+            def do_GET(self):  # pylint: disable=C0103
+                self.respond({"name": self.headers["Authorization"].removeprefix("bearer access-")})
+
+            def respond(self, body: dict):
+                with stub.lock:
+                    stub.in_flight += 1
+                stub.gate.wait()
+                with stub.lock:
+                    stub.in_flight -= 1
+                content = json.dumps(body).encode()
+                self.send_response(200)
+                self.send_header("Content-Type", "application/json")
+                self.send_header("Content-Length", str(len(content)))
+                self.end_headers()
+                self.wfile.write(content)
+
+            def log_message(self, *args):
+                pass
+
+        self.server = ThreadingHTTPServer(("127.0.0.1", 0), Handler)
+        self.server.daemon_threads = True
+        self.url = f"http://127.0.0.1:{self.server.server_port}"
+
+    def __enter__(self) -> "StubRedditServer":
+        threading.Thread(target=self.server.serve_forever, daemon=True).start()
+        return self
+
+    def __exit__(self, *exc_info):
+        self.server.shutdown()
+        self.server.server_close()
+
+
+class RedditCallbackTests(TestCase):
+    def setUp(self):
+        self.reddit = StubRedditServer().__enter__()
+        self.addCleanup(self.reddit.__exit__, None, None, None)
+        reddit_settings = override_settings(
+            REDDIT_CLIENT_ID="id",
+            REDDIT_CLIENT_SECRET="secret",
+            REDDIT_WWW_URL=self.reddit.url,
+            REDDIT_OAUTH_URL=self.reddit.url,
+        )
+        reddit_settings.enable()
+        self.addCleanup(reddit_settings.disable)
+        session = SessionStore()
+        session["reddit_state"] = "state"
+        session.save()
+        self.async_client.cookies[settings.SESSION_COOKIE_NAME] = session.session_key
+
+    async def login(self, code: str, state: str = "state"):
+        return await self.async_client.get("/v1/accounts/reddit-callback/", {"code": code, "state": state})
+
+    async def test_login_creates_then_updates_member(self):
+        response = await self.login("alice")
+        self.assertEqual(response.status_code, 302)
+        member = await Member.objects.select_related("user__auth_token").aget(reddit_username="alice")
+        self.assertEqual(member.reddit_refresh_token, "refresh-alice")
+        self.assertEqual(response.url, f"{settings.FE_URL}login?token={member.user.auth_token.key}")
+
+        self.assertEqual((await self.login("alice")).url, response.url)
+        self.assertEqual(await Member.objects.acount(), 1)
+
+    async def test_rejected_logins(self):
+        self.assertEqual((await self.login("alice", state="forged")).status_code, 400)
+        with self.assertLogs("accounts.views", "WARNING"):
+            self.assertEqual((await self.login("invalid")).status_code, 502)
+        self.assertFalse(await Member.objects.aexists())
+
+    async def test_logins_reuse_pooled_connections(self):
+        self.assertEqual((await self.login("alice")).status_code, 302)
+        self.assertEqual((await self.login("bob")).status_code, 302)
+        self.assertEqual(self.reddit.connections, 1)
+
+    def test_http_client_is_closed_with_its_event_loop(self):
+        async def get_clients():
+            return get_http_client(), get_http_client()
+
+        client, other = asyncio.run(get_clients())
+        self.assertIs(client, other)
+        self.assertTrue(client.is_closed)
+
+    async def test_slow_reddit_does_not_block_other_requests(self):
+        # Reddit holds the requests of the logins until released, while another request is served.
+        self.reddit.gate.clear()
+        self.addCleanup(self.reddit.gate.set)
+        logins = [asyncio.ensure_future(self.login(f"user-{i}")) for i in range(5)]
+
+        async def wait_for_logins():
+            while self.reddit.in_flight < len(logins):
+                await asyncio.sleep(0.01)
+
+        await asyncio.wait_for(wait_for_logins(), timeout=10)
+        response = await self.async_client.get("/v1/products/category/")
+        self.assertEqual(response.status_code, 200)
+        self.assertFalse(any(login.done() for login in logins))
+
+        self.reddit.gate.set()
+        responses = await asyncio.gather(*logins)
+        self.assertEqual({response.status_code for response in responses}, {302})
+        self.assertEqual(await Member.objects.acount(), 5)
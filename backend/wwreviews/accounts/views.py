@@ -1,9 +1,12 @@
+import logging
 import uuid
 
-import praw
+from asgiref.sync import sync_to_async
 from django.conf import settings
 from django.contrib.auth.models import User
+from django.http import JsonResponse
 from django.shortcuts import redirect
+from django.views import View
 from django_filters.rest_framework import DjangoFilterBackend
 from rest_framework import status
 from rest_framework.authtoken.models import Token
@@ -11,10 +14,13 @@ from rest_framework.decorators import action
 from rest_framework.response import Response
 from rest_framework.views import APIView
 
+from accounts import reddit
 from accounts.models import Member
 from accounts.serializers import MemberSerializer
 from wwreviews.utils import IsAuthenticatedMixin, ReadOnlyIsAuthenticatedView
 
+logger = logging.getLogger(__name__)
+
 
 class MemberView(ReadOnlyIsAuthenticatedView):
     queryset = Member.objects.all()
@@ -25,7 +31,7 @@ class MemberView(ReadOnlyIsAuthenticatedView):
     def get_queryset(self):
         if self.request is None:
             return self.queryset.none()
-        if self.request.user.member is None:
+        if getattr(self.request.user, "member", None) is None:
             return self.queryset.none()
         return self.queryset.filter(user=self.request.user)
 
@@ -37,36 +43,48 @@ class MemberView(ReadOnlyIsAuthenticatedView):
 class RedditAuthView(APIView):
     def get(self, request):
         state = str(uuid.uuid4())
-        redirect_url = settings.REDDIT_CLIENT.auth.url(scopes=["identity"], state=state, duration="permanent")
+        redirect_url = reddit.get_reddit_client().auth.url(scopes=["identity"], state=state, duration="permanent")
         request.session["reddit_state"] = state
         return redirect(redirect_url)
 
 
-class RedditCallbackView(APIView):
-    def get(self, request):
+def login_member(username: str, refresh_token: str) -> Token:
+    """
+    Creates or updates the member of a Reddit user who logged in.
+
+    Returns:
+        The API token of the member's user.
+    """
+    member_query = Member.objects.filter(reddit_username=username)
+    if member_query.exists():
+        member = member_query.get()
+        member.reddit_refresh_token = refresh_token
+        member.save()
+        return Token.objects.get(user=member.user)
+    user = User.objects.create(username=username, password=str(uuid.uuid4()))
+    Member.objects.create(user=user, reddit_username=username, reddit_refresh_token=refresh_token)
+    return Token.objects.create(user=user)
+
+
+class RedditCallbackView(View):
+    """
+    Completes a Reddit login. The view is async, so while it waits on Reddit an ASGI worker keeps serving other
+    requests.
+    """
+
+    async def get(self, request):
         code = request.GET.get("code")
         state = request.GET.get("state")
-        if state != request.session.get("reddit_state"):
-            return Response({"state": ["state does not match."]}, status=status.HTTP_400_BAD_REQUEST)
-
-        user_client = praw.Reddit(
-            client_id=settings.REDDIT_CLIENT_ID,
-            client_secret=settings.REDDIT_CLIENT_SECRET,
-            redirect_uri=settings.REDDIT_REDIRECT_URL,
-            user_agent=settings.REDDIT_USER_AGENT,
-        )
-        refresh_token = user_client.auth.authorize(code)
-        username = user_client.user.me().name
-
-        member_query = Member.objects.filter(reddit_username=username)
-        if member_query.exists():
-            member = member_query.get()
-            member.reddit_refresh_token = refresh_token
-            member.save()
-            token = Token.objects.get(user=member.user)
-        else:
-            user = User.objects.create(username=username, password=str(uuid.uuid4()))
-            token = Token.objects.create(user=user)
-            member = Member.objects.create(user=user, reddit_username=username, reddit_refresh_token=refresh_token)
+        if state is None or state != await sync_to_async(request.session.get)("reddit_state"):
+            return JsonResponse({"state": ["state does not match."]}, status=status.HTTP_400_BAD_REQUEST)
+
+        try:
+            client = reddit.get_http_client()
+            tokens = await reddit.authorize(client, code)
+            username = await reddit.fetch_username(client, tokens["access_token"])
+        except reddit.RedditAuthError as err:
+            logger.warning("Reddit login failed: %s", err)
+            return JsonResponse({"message": "Could not log in with Reddit."}, status=status.HTTP_502_BAD_GATEWAY)
 
+        token = await sync_to_async(login_member)(username, tokens.get("refresh_token", ""))
         return redirect(f"{settings.FE_URL}login?token={token.key}")
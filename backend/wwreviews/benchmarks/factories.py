@@ -0,0 +1,140 @@
+"""
+Fast bulk factories for seeding large synthetic catalogs.
+
+The factories write with `bulk_create` and therefore bypass the model signals, so derived data is rebuilt once at the
+end of `seed_catalog` rather than row by row.
+"""
+import random
+from dataclasses import dataclass
+
+from django.contrib.auth.models import User
+from django.db import transaction
+
+from products.aggregates import refresh_review_aggregates
+from products.models import RATING_VALUES, Category, Feedback, Product, ProductAction, Rating
+
+BATCH_SIZE = 5000
+
+TOOLS = ("Saw", "Chisel", "Plane", "Router", "Drill", "Sander", "Clamp", "Lathe", "Jointer", "Planer", "Rasp", "Vise")
+BRANDS = ("Festool", "DeWalt", "Makita", "Veritas", "Stanley", "Bosch", "Milwaukee", "Narex", "Lie-Nielsen", "Jet")
+WORDS = ("sharp", "sturdy", "accurate", "flimsy", "heavy", "smooth", "loud", "precise", "cheap", "reliable", "great")
+
+
+@dataclass
+class SeedSize:
+    """
+    Shape of a synthetic catalog.
+    """
+
+    categories: int = 100
+    products: int = 10_000
+    users: int = 1_000
+    ratings_per_product: int = 20
+    feedback_per_product: int = 5
+    actions_per_product: int = 3
+
+
+def _bulk_create(model, objs, batch_size: int = BATCH_SIZE):
+    """
+    Lazily bulk creates the objects of a (possibly huge) generator in batches, without materializing it.
+    """
+    batch = []
+    for obj in objs:
+        batch.append(obj)
+        if len(batch) >= batch_size:
+            model.objects.bulk_create(batch)
+            batch = []
+    if batch:
+        model.objects.bulk_create(batch)
+
+
+def seed_categories(count: int, rng: random.Random) -> list[int]:
+    """
+    Seeds a category forest where roughly a tenth of the categories are roots and the rest hang under earlier ones.
+    """
+    start = Category.objects.count()
+    roots = max(1, count // 10)
+    ids = []
+    for i in range(count):
+        parent_id = rng.choice(ids) if i >= roots else None
+        ids.append(Category.objects.create(name=f"Category {start + i}", parent_id=parent_id).pk)
+    return ids
+
+
+def seed_users(count: int) -> list[int]:
+    start = User.objects.count()
+    _bulk_create(User, (User(username=f"bench-user-{start + i}", password="!") for i in range(count)))
+    return list(User.objects.filter(username__startswith="bench-user-").values_list("id", flat=True))
+
+
+def seed_products(count: int, category_ids: list[int], rng: random.Random) -> list[int]:
+    start = Product.objects.count()
+    _bulk_create(
+        Product,
+        (
+            Product(
+                name=f"{rng.choice(BRANDS)} {rng.choice(TOOLS)} {start + i}",
+                price=round(rng.uniform(5, 2500), 2),
+                link=f"https://example.com/products/{start + i}",
+                image_url=f"https://example.com/images/{start + i}.png",
+                category_id=rng.choice(category_ids),
+            )
+            for i in range(count)
+        ),
+    )
+    return list(Product.objects.order_by("-id").values_list("id", flat=True)[:count])
+
+
+def seed_reviews(product_ids: list[int], user_ids: list[int], size: SeedSize, rng: random.Random):
+    """
+    Seeds ratings, feedback and product actions. Each product is reviewed by a random sample of distinct users so the
+    `(product, user)` uniqueness constraints hold.
+    """
+    ratings_per_product = min(size.ratings_per_product, len(user_ids))
+    feedback_per_product = min(size.feedback_per_product, ratings_per_product)
+
+    def ratings():
+        for product_id in product_ids:
+            for user_id in rng.sample(user_ids, ratings_per_product):
+                yield Rating(product_id=product_id, user_id=user_id, value=rng.choice(RATING_VALUES))
+
+    def feedback():
+        for product_id in product_ids:
+            for user_id in rng.sample(user_ids, feedback_per_product):
+                text = " ".join(rng.choices(WORDS, k=rng.randint(3, 30)))
+                yield Feedback(product_id=product_id, user_id=user_id, text=text)
+
+    def actions():
+        for product_id in product_ids:
+            for _ in range(size.actions_per_product):
+                prev, curr = round(rng.uniform(5, 2500), 2), round(rng.uniform(5, 2500), 2)
+                yield ProductAction(
+                    product_id=product_id,
+                    action=ProductAction.Action.PRICE_UPDATED,
+                    details={"prev": prev, "curr": curr},
+                )
+
+    _bulk_create(Rating, ratings())
+    _bulk_create(Feedback, feedback())
+    _bulk_create(ProductAction, actions())
+
+
+def seed_catalog(size: SeedSize, seed: int = 0) -> list[int]:
+    """
+    Seeds a synthetic catalog and rebuilds the derived data for it.
+
+    Args:
+        size: Shape of the catalog to seed.
+        seed: Seed for the random number generator, so runs are reproducible.
+
+    Returns:
+        List of the seeded product ids.
+    """
+    rng = random.Random(seed)
+    with transaction.atomic():
+        category_ids = seed_categories(size.categories, rng)
+        user_ids = seed_users(size.users)
+        product_ids = seed_products(size.products, category_ids, rng)
+        seed_reviews(product_ids, user_ids, size, rng)
+        refresh_review_aggregates(product_ids)
+    return product_ids
@@ -0,0 +1,151 @@
+"""
+Local HTTP load generator for benchmarking the API end to end.
+
+The API is served by Django's threaded development WSGI server (or by uvicorn, for the ASGI application) in a background
+thread, and driven by a pool of client threads each keeping its own HTTP connection, so a run covers the whole request
+path.
+"""
+import http.client
+import math
+import socket
+import threading
+import time
+from collections.abc import Callable
+from concurrent.futures import ThreadPoolExecutor
+from dataclasses import dataclass
+
+from django.core.servers.basehttp import ThreadedWSGIServer, WSGIRequestHandler, get_internal_wsgi_application
+
+
+class QuietRequestHandler(WSGIRequestHandler):
+    def log_message(self, format, *args):
+        pass
+
+
+class LoadServer:
+    """
+    Context manager serving the project's WSGI application on a free local port in a background thread.
+    """
+
+    def __enter__(self):
+        self.server = ThreadedWSGIServer(("127.0.0.1", 0), QuietRequestHandler, allow_reuse_address=False)
+        self.server.set_app(get_internal_wsgi_application())
+        self.port = self.server.server_address[1]
+        self.thread = threading.Thread(target=self.server.serve_forever, daemon=True)
+        self.thread.start()
+        return self
+
+    def __exit__(self, *exc_info):
+        self.server.shutdown()
+        self.server.server_close()
+        self.thread.join()
+
+
+class AsgiLoadServer:
+    """
+    Context manager serving the project's ASGI application with uvicorn on a free local port in a background thread.
+    """
+
+    def __enter__(self):
+        import uvicorn  # pylint: disable=C0415
+
+        from wwreviews.asgi import application  # pylint: disable=C0415
+
+        self.socket = socket.create_server(("127.0.0.1", 0))
+        self.port = self.socket.getsockname()[1]
+        self.server = uvicorn.Server(uvicorn.Config(application, lifespan="off", log_level="warning", access_log=False))
+        self.thread = threading.Thread(target=self.server.run, kwargs={"sockets": [self.socket]}, daemon=True)
+        self.thread.start()
+        while not self.server.started:
+            time.sleep(0.01)
+        return self
+
+    def __exit__(self, *exc_info):
+        self.server.should_exit = True
+        self.thread.join()
+        self.socket.close()
+
+
+@dataclass
+class Request:
+    method: str
+    path: str
+    body: bytes | None = None
+    headers: dict[str, str] | None = None
+
+
+@dataclass
+class ScenarioResult:
+    name: str
+    requests: int
+    errors: int
+    duration: float
+    latencies: list[float]
+
+    def percentile(self, percent: float) -> float:
+        """
+        Gets a latency percentile in milliseconds, by the nearest-rank method.
+        """
+        ordered = sorted(self.latencies)
+        return ordered[max(0, math.ceil(percent / 100 * len(ordered)) - 1)] * 1000
+
+    def summary(self) -> dict:
+        """
+        Summarizes the run as its throughput and latency percentiles in milliseconds.
+        """
+        return {
+            "requests": self.requests,
+            "errors": self.errors,
+            "requests_per_second": self.requests / self.duration,
+            "p50_ms": self.percentile(50),
+            "p95_ms": self.percentile(95),
+            "p99_ms": self.percentile(99),
+        }
+
+
+def run_scenario(
+    name: str, port: int, next_request: Callable[[], Request], requests: int, concurrency: int
+) -> ScenarioResult:
+    """
+    Sends requests to the server from concurrent client threads and times each one.
+
+    Args:
+        name: Name of the scenario.
+        port: Port of the local server.
+        next_request: Thread-safe callable building the next request to send.
+        requests: Total number of requests to send.
+        concurrency: Number of client threads, each with its own keep-alive connection.
+
+    Returns:
+        Result of the run, where responses with a status of 400 or above count as errors.
+    """
+    remaining = iter(range(requests))
+    lock = threading.Lock()
+    latencies, errors = [], 0
+
+    def client():
+        nonlocal errors
+        conn = http.client.HTTPConnection("127.0.0.1", port, timeout=60)
+        while True:
+            with lock:
+                if next(remaining, None) is None:
+                    break
+            request = next_request()
+            start = time.perf_counter()
+            conn.request(request.method, request.path, body=request.body, headers=request.headers or {})
+            response = conn.getresponse()
+            response.read()
+            latency = time.perf_counter() - start
+            if response.will_close:
+                conn.close()
+            with lock:
+                latencies.append(latency)
+                errors += response.status >= 400
+        conn.close()
+
+    start = time.perf_counter()
+    with ThreadPoolExecutor(concurrency) as pool:
+        for future in [pool.submit(client) for _ in range(concurrency)]:
+            future.result()
+    duration = time.perf_counter() - start
+    return ScenarioResult(name, requests, errors, duration, latencies)
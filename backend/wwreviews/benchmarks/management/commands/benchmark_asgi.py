@@ -0,0 +1,65 @@
+import random
+from collections.abc import Callable
+
+from django.core.management.base import BaseCommand
+
+from benchmarks.factories import seed_catalog
+from benchmarks.load import AsgiLoadServer, LoadServer, Request, run_scenario
+from benchmarks.utils import add_seed_arguments, benchmark_database, seed_size_from_options
+from products.models import Category
+
+
+class Command(BaseCommand):
+    help = (
+        "Compares the concurrent-request throughput of the catalog read endpoints served by WSGI, by ASGI through the "
+        "sync DRF views, and by ASGI through the async views."
+    )
+
+    def add_arguments(self, parser):
+        add_seed_arguments(parser, feedback_per_product=0, actions_per_product=0)
+        parser.add_argument("--requests", type=int, default=1_000, help="Number of requests per run.")
+        parser.add_argument("--concurrency", type=int, default=32, help="Number of concurrent client connections.")
+
+    def get_endpoints(self, product_ids: list[int], category_ids: list[int]) -> dict[str, Callable[[str], str]]:
+        rng = random.Random(0)
+        return {
+            "product-detail": lambda prefix: f"/v1/products/{prefix}product/{rng.choice(product_ids)}/",
+            "product-list": lambda prefix: (
+                f"/v1/products/{prefix}product/?page_size=20&category_ancestor={rng.choice(category_ids)}"
+            ),
+            "category-list": lambda prefix: f"/v1/products/{prefix}category/?page_size=50",
+            "basic-product-review": lambda prefix: (
+                f"/v1/products/{prefix}basic-product-review/?page_size=20"
+                f"&ids={','.join(map(str, rng.sample(product_ids, 20)))}"
+            ),
+        }
+
+    def handle(self, *args, **options):
+        with benchmark_database(options["use_default_db"]):
+            size = seed_size_from_options(options)
+            self.stdout.write(f"Seeding {size}...")
+            product_ids = seed_catalog(size, seed=options["seed"])
+            category_ids = list(Category.objects.values_list("id", flat=True))
+            endpoints = self.get_endpoints(product_ids, category_ids)
+
+            runs = (
+                ("wsgi", LoadServer, ""),
+                ("asgi-sync", AsgiLoadServer, ""),
+                ("asgi-async", AsgiLoadServer, "async/"),
+            )
+            for name, path in endpoints.items():
+                self.stdout.write(self.style.MIGRATE_HEADING(name))
+                for label, server_class, prefix in runs:
+                    with server_class() as server:
+                        result = run_scenario(
+                            label,
+                            server.port,
+                            lambda: Request("GET", path(prefix)),
+                            options["requests"],
+                            options["concurrency"],
+                        )
+                    summary = result.summary()
+                    self.stdout.write(
+                        f"  {label:<10} rps={summary['requests_per_second']:8.1f} p50={summary['p50_ms']:7.2f}ms "
+                        f"p95={summary['p95_ms']:7.2f}ms p99={summary['p99_ms']:7.2f}ms errors={summary['errors']}"
+                    )
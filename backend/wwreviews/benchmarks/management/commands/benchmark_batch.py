@@ -0,0 +1,50 @@
+from django.contrib.auth.models import User
+from django.core.management.base import BaseCommand
+from django.test import Client
+from rest_framework.authtoken.models import Token
+
+from benchmarks.factories import seed_catalog
+from benchmarks.utils import (QueryCounter, add_seed_arguments, benchmark_database, format_timing,
+                              seed_size_from_options, time_call)
+from products.models import Rating
+
+
+class Command(BaseCommand):
+    help = "Compares fetching product cards from the batch endpoint with fetching them one product at a time."
+
+    def add_arguments(self, parser):
+        add_seed_arguments(parser, products=5_000, feedback_per_product=1, actions_per_product=0)
+        parser.add_argument("--ids", type=int, default=500, help="Number of product ids to fetch.")
+        parser.add_argument("--repeat", type=int, default=5, help="Number of timed runs per strategy.")
+
+    def benchmark(self, label: str, fetch, repeat: int):
+        with QueryCounter() as queries:
+            fetch()
+        timing = time_call(fetch, repeat=repeat)
+        self.stdout.write(f"  {label:<9} queries={queries.count} {format_timing(timing)}")
+
+    def handle(self, *args, **options):
+        with benchmark_database(options["use_default_db"]):
+            size = seed_size_from_options(options)
+            self.stdout.write(f"Seeding {size}...")
+            product_ids = seed_catalog(size, seed=options["seed"])[: options["ids"]]
+
+            user = User.objects.get(pk=Rating.objects.values_list("user_id", flat=True).first())
+            client = Client(HTTP_AUTHORIZATION=f"Token {Token.objects.create(user=user).key}")
+            ids = ",".join(map(str, product_ids))
+
+            def fetch_batch():
+                response = client.get("/v1/products/product/batch/", {"ids": ids})
+                assert response.status_code == 200, response.content
+
+            def fetch_per_product():
+                for product_id in product_ids:
+                    response = client.get(f"/v1/products/product/{product_id}/")
+                    assert response.status_code == 200, response.content
+                    client.get("/v1/products/rating/", {"product": product_id, "user": user.pk})
+                response = client.get("/v1/products/basic-product-review/", {"ids": ids, "limit": len(product_ids)})
+                assert response.status_code == 200, response.content
+
+            self.stdout.write(self.style.MIGRATE_HEADING(f"Product cards for {len(product_ids)} ids"))
+            self.benchmark("batch", fetch_batch, options["repeat"])
+            self.benchmark("per-item", fetch_per_product, options["repeat"])
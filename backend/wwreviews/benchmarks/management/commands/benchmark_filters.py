@@ -0,0 +1,56 @@
+from django.core.management.base import BaseCommand
+from django_filters.filterset import filterset_factory
+
+from benchmarks.factories import seed_catalog
+from benchmarks.utils import add_seed_arguments, benchmark_database, format_timing, seed_size_from_options, time_call
+from products.models import Product
+from products.views import CategoryView, FeedbackView, ProductActionView, ProductView, RatingView
+
+
+def get_filterset_class(view):
+    return getattr(view, "filterset_class", None) or filterset_factory(
+        view.queryset.model, fields=view.filterset_fields
+    )
+
+
+class Command(BaseCommand):
+    help = "Seeds a synthetic catalog, then prints the query plan and timings of each hot FilterSet lookup."
+
+    def add_arguments(self, parser):
+        add_seed_arguments(parser)
+        parser.add_argument("--repeat", type=int, default=5, help="Number of timed runs per lookup.")
+
+    def get_cases(self, product: Product) -> list[tuple[type, dict]]:
+        return [
+            (ProductView, {"name": product.name}),
+            (ProductView, {"name__startswith": product.name[:8]}),
+            (ProductView, {"name__icontains": product.name.split()[-1]}),
+            (ProductView, {"price__gte": product.price - 5, "price__lte": product.price + 5}),
+            (ProductView, {"link": product.link}),
+            (RatingView, {"product": product.pk}),
+            (RatingView, {"product": product.pk, "value": 5}),
+            (FeedbackView, {"product": product.pk}),
+            (ProductActionView, {"product": product.pk}),
+            (ProductActionView, {"product": product.pk, "action": 2}),
+            (CategoryView, {"parent": product.category.parent_id or product.category_id}),
+            (CategoryView, {"no_parent": True}),
+        ]
+
+    def handle(self, *args, **options):
+        with benchmark_database(options["use_default_db"]):
+            size = seed_size_from_options(options)
+            self.stdout.write(f"Seeding {size}...")
+            product_ids = seed_catalog(size, seed=options["seed"])
+            product = Product.objects.select_related("category").get(pk=product_ids[len(product_ids) // 2])
+
+            for view, params in self.get_cases(product):
+                filterset = get_filterset_class(view)(params, queryset=view.queryset)
+                if not filterset.is_valid():
+                    self.stderr.write(f"{view.__name__} {params}: {filterset.errors}")
+                    continue
+                queryset = filterset.qs
+                timing = time_call(lambda: list(queryset.all()), repeat=options["repeat"])
+                self.stdout.write(self.style.MIGRATE_HEADING(f"{view.__name__} {params}"))
+                self.stdout.write(f"  rows={queryset.count()} {format_timing(timing)}")
+                for line in queryset.explain().splitlines():
+                    self.stdout.write(f"  {line}")
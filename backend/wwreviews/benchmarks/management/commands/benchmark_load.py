@@ -0,0 +1,161 @@
+import json
+import random
+import subprocess
+from collections.abc import Callable
+from dataclasses import dataclass
+from datetime import datetime, timezone
+from pathlib import Path
+from urllib.parse import urlencode
+
+from django.conf import settings
+from django.contrib.auth.models import User
+from django.core.management.base import BaseCommand
+from django.test import override_settings
+from rest_framework.authtoken.models import Token
+
+from benchmarks.factories import seed_catalog
+from benchmarks.load import LoadServer, Request, run_scenario
+from benchmarks.utils import add_seed_arguments, benchmark_database, seed_size_from_options
+from products.models import Category
+from wwreviews.metrics import REGISTRY
+
+RESULTS_DIR = Path(settings.BASE_DIR) / "benchmarks" / "results"
+LOGIN_EMAIL = "bench-login@example.com"
+LOGIN_PASSWORD = "bench-password"
+
+
+@dataclass
+class Scenario:
+    name: str
+    build: Callable[[], Request]
+    # Share of the requested number of requests to send, for scenarios too slow to run as many times as the others.
+    share: float = 1.0
+
+
+def get_commit() -> str:
+    try:
+        result = subprocess.run(["git", "describe", "--always", "--dirty"], capture_output=True, text=True, check=True)
+    except (OSError, subprocess.CalledProcessError):
+        return "unknown"
+    return result.stdout.strip()
+
+
+class Command(BaseCommand):
+    help = (
+        "Seeds a synthetic catalog, then load tests the main API endpoints over HTTP, reporting latency percentiles, "
+        "throughput and queries per request, and stores the results for comparison across commits."
+    )
+
+    def add_arguments(self, parser):
+        add_seed_arguments(
+            parser, categories=2_000, products=50_000, users=20_000, ratings_per_product=40, actions_per_product=1
+        )
+        parser.add_argument("--requests", type=int, default=1_000, help="Number of requests per scenario.")
+        parser.add_argument("--concurrency", type=int, default=8, help="Number of concurrent client connections.")
+        parser.add_argument(
+            "--scenario", action="append", dest="scenarios", help="Scenario to run, can be repeated. Defaults to all."
+        )
+        parser.add_argument(
+            "--output", help="Path of the JSON results file. Defaults to benchmarks/results/<commit>.json."
+        )
+        parser.add_argument("--compare", help="Path of an earlier JSON results file to compare the results with.")
+
+    def get_scenarios(self, product_ids: list[int], category_ids: list[int], tokens: list[str]) -> list[Scenario]:
+        rng = random.Random(0)
+
+        def authorized(method: str, path: str, **kwargs) -> Request:
+            return Request(method, path, headers={"Authorization": f"Token {rng.choice(tokens)}"}, **kwargs)
+
+        def ids(count: int = 20) -> str:
+            return ",".join(map(str, rng.sample(product_ids, count)))
+
+        login = urlencode({"email": LOGIN_EMAIL, "password": LOGIN_PASSWORD}).encode()
+        return [
+            Scenario(
+                "product-list",
+                lambda: Request("GET", f"/v1/products/product/?category_ancestor={rng.choice(category_ids)}"),
+            ),
+            Scenario("product-detail", lambda: Request("GET", f"/v1/products/product/{rng.choice(product_ids)}/")),
+            Scenario("product-batch", lambda: authorized("GET", f"/v1/products/product/batch/?ids={ids()}")),
+            Scenario(
+                "feedback-list", lambda: Request("GET", f"/v1/products/feedback/?product={rng.choice(product_ids)}")
+            ),
+            Scenario("basic-product-review", lambda: Request("GET", f"/v1/products/basic-product-review/?ids={ids()}")),
+            Scenario("auth-me", lambda: authorized("GET", "/v1/auth/user/me/")),
+            Scenario(
+                "auth-login",
+                lambda: Request(
+                    "POST",
+                    "/v1/auth/token/",
+                    body=login,
+                    headers={"Content-Type": "application/x-www-form-urlencoded"},
+                ),
+                # Checking the password is deliberately slow.
+                share=0.05,
+            ),
+        ]
+
+    def seed_accounts(self, count: int = 100) -> list[str]:
+        users = list(User.objects.filter(username__startswith="bench-user-").order_by("id")[:count])
+        tokens = Token.objects.bulk_create([Token(user=user, key=Token.generate_key()) for user in users])
+        login = User.objects.create_user("bench-login", LOGIN_EMAIL, LOGIN_PASSWORD)
+        Token.objects.create(user=login)
+        return [token.key for token in tokens]
+
+    def handle(self, *args, **options):
+        with benchmark_database(options["use_default_db"]):
+            size = seed_size_from_options(options)
+            self.stdout.write(f"Seeding {size}...")
+            product_ids = seed_catalog(size, seed=options["seed"])
+            category_ids = list(Category.objects.values_list("id", flat=True))
+            scenarios = self.get_scenarios(product_ids, category_ids, self.seed_accounts())
+            if options["scenarios"]:
+                scenarios = [scenario for scenario in scenarios if scenario.name in options["scenarios"]]
+
+            results = {}
+            with override_settings(REQUEST_METRICS=True, SLOW_REQUEST_MS=0), LoadServer() as server:
+                for scenario in scenarios:
+                    REGISTRY.clear()
+                    requests = max(1, int(options["requests"] * scenario.share))
+                    result = run_scenario(scenario.name, server.port, scenario.build, requests, options["concurrency"])
+                    views = REGISTRY.snapshot().values()
+                    queries = sum(stats.queries for stats in views) / max(1, sum(stats.requests for stats in views))
+                    results[scenario.name] = {**result.summary(), "queries_per_request": queries}
+                    self.write_result(scenario.name, results[scenario.name])
+
+        self.save_results(size, options, results)
+
+    def write_result(self, name: str, result: dict, previous: dict | None = None):
+        line = (
+            f"  {name:<22} rps={result['requests_per_second']:8.1f} p50={result['p50_ms']:7.2f}ms "
+            f"p95={result['p95_ms']:7.2f}ms p99={result['p99_ms']:7.2f}ms "
+            f"queries/request={result['queries_per_request']:5.2f} errors={result['errors']}"
+        )
+        if previous is not None:
+            change = {
+                key: (result[key] - previous[key]) / previous[key] * 100 if previous[key] else 0.0
+                for key in ("requests_per_second", "p50_ms", "p95_ms", "p99_ms")
+            }
+            line += " | vs previous: " + " ".join(f"{key}={value:+.1f}%" for key, value in change.items())
+        self.stdout.write(line)
+
+    def save_results(self, size, options: dict, results: dict):
+        commit = get_commit()
+        output = Path(options["output"]) if options["output"] else RESULTS_DIR / f"{commit}.json"
+        output.parent.mkdir(parents=True, exist_ok=True)
+        document = {
+            "commit": commit,
+            "created_at": datetime.now(timezone.utc).isoformat(),
+            "seed": {**vars(size), "seed": options["seed"]},
+            "concurrency": options["concurrency"],
+            "scenarios": results,
+        }
+        output.write_text(json.dumps(document, indent=2) + "\n")
+        self.stdout.write(f"Results saved to {output}")
+
+        if options["compare"]:
+            previous = json.loads(Path(options["compare"]).read_text())
+            self.stdout.write(self.style.MIGRATE_HEADING(f"Compared with {previous['commit']}"))
+            for name, result in results.items():
+                if name in previous["scenarios"]:
+                    self.write_result(name, result, previous["scenarios"][name])
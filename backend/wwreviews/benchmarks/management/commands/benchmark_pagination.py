@@ -0,0 +1,63 @@
+from django.core.management.base import BaseCommand
+from django.test import Client
+
+from benchmarks.factories import seed_catalog
+from benchmarks.utils import (QueryCounter, add_seed_arguments, benchmark_database, format_timing,
+                              seed_size_from_options, time_call)
+from products.models import Product, Rating
+from wwreviews.pagination import KeysetPagination
+
+
+class Command(BaseCommand):
+    help = "Compares offset and keyset pagination of the products endpoints at a deep page."
+
+    def add_arguments(self, parser):
+        add_seed_arguments(
+            parser, products=25_000, ratings_per_product=2, feedback_per_product=0, actions_per_product=0
+        )
+        parser.add_argument("--page", type=int, default=1_000, help="One-based page number to fetch.")
+        parser.add_argument("--page-size", type=int, default=20)
+        parser.add_argument("--repeat", type=int, default=5, help="Number of timed runs per request.")
+
+    def benchmark(self, client: Client, label: str, url: str, params: dict, plan: str, repeat: int):
+        def fetch():
+            response = client.get(url, params)
+            assert response.status_code == 200, response.content
+
+        with QueryCounter() as queries:
+            fetch()
+        timing = time_call(fetch, repeat=repeat)
+        self.stdout.write(f"  {label:<8} queries={queries.count} {format_timing(timing)}")
+        for line in plan.splitlines():
+            self.stdout.write(f"    {line}")
+
+    def handle(self, *args, **options):
+        with benchmark_database(options["use_default_db"]):
+            size = seed_size_from_options(options)
+            self.stdout.write(f"Seeding {size}...")
+            seed_catalog(size, seed=options["seed"])
+
+            page_size = options["page_size"]
+            offset = (options["page"] - 1) * page_size
+            client = Client()
+            for model, url in ((Product, "/v1/products/product/"), (Rating, "/v1/products/rating/")):
+                ordering = list(KeysetPagination.ordering)
+                rows = model.objects.order_by(*ordering)
+                if rows.count() <= offset:
+                    self.stderr.write(f"{model.__name__}: only {rows.count()} rows, page {options['page']} is empty.")
+                    continue
+                # The keyset cursor for a page is the position of the last row of the page before it.
+                boundary = rows[offset - 1] if offset else None
+                position = KeysetPagination().get_position(boundary) if boundary else None
+                cursor_params = {"page_size": page_size}
+                if position is not None:
+                    cursor_params["cursor"] = KeysetPagination.encode_position(position)
+
+                offset_plan = rows[offset : offset + page_size].explain()
+                cursor_rows = rows.filter(KeysetPagination.seek_filter(ordering, position)) if position else rows
+                cursor_plan = cursor_rows[: page_size + 1].explain()
+
+                self.stdout.write(self.style.MIGRATE_HEADING(f"{url} page {options['page']} of size {page_size}"))
+                offset_params = {"limit": page_size, "offset": offset}
+                self.benchmark(client, "offset", url, offset_params, offset_plan, options["repeat"])
+                self.benchmark(client, "cursor", url, cursor_params, cursor_plan, options["repeat"])
@@ -0,0 +1,27 @@
+from django.core.management.base import BaseCommand
+
+from benchmarks.utils import measure_import_time
+
+# Cold import budgets in milliseconds, a few times the measured times to absorb noisy machines. Importing praw in
+# settings alone used to take over 120ms, now the settings import in about 10ms and the WSGI application in 450ms.
+BUDGETS = {"wwreviews.settings": 60, "wwreviews.wsgi": 1500, "wwreviews.asgi": 1500}
+
+
+class Command(BaseCommand):
+    help = "Measures the cold import time of the settings and the WSGI and ASGI applications against their budgets."
+
+    def add_arguments(self, parser):
+        parser.add_argument("--repeat", type=int, default=5, help="Interpreters to start per module.")
+
+    def handle(self, *args, **options):
+        over = []
+        for module, budget in BUDGETS.items():
+            duration, modules = measure_import_time(module, options["repeat"])
+            line = f"{module}: {duration:.1f}ms (budget {budget}ms, {len(modules)} modules)"
+            if duration > budget:
+                over.append(module)
+                self.stdout.write(self.style.ERROR(line))
+            else:
+                self.stdout.write(line)
+        if over:
+            self.stderr.write(f"Over budget: {', '.join(over)}.")
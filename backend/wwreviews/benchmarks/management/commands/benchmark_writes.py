@@ -0,0 +1,120 @@
+import random
+import tempfile
+import threading
+import time
+from pathlib import Path
+
+from django.conf import settings
+from django.contrib.auth.models import User
+from django.core.management.base import BaseCommand
+from django.db import OperationalError, connection
+from django.test import override_settings
+
+from benchmarks.factories import seed_catalog
+from benchmarks.load import ScenarioResult
+from benchmarks.utils import add_seed_arguments, benchmark_database, seed_size_from_options
+from products.models import Product, Rating
+
+# SQLite's own defaults, which the database ran with before `SQLITE_PRAGMAS` was introduced.
+SQLITE_DEFAULT_PRAGMAS = {
+    "journal_mode": "delete",
+    "synchronous": "full",
+    "temp_store": "default",
+    "cache_size": -2000,
+    "mmap_size": 0,
+}
+
+
+class Command(BaseCommand):
+    help = (
+        "Measures rating write throughput and latency with concurrent writers and readers. On SQLite, compares the "
+        "default rollback journal with the configured pragmas on a file database."
+    )
+
+    def add_arguments(self, parser):
+        add_seed_arguments(
+            parser, categories=20, products=1_000, users=200, ratings_per_product=5, actions_per_product=0
+        )
+        parser.add_argument("--writers", type=int, default=8, help="Number of concurrent writer threads.")
+        parser.add_argument("--writes", type=int, default=200, help="Number of ratings each writer creates.")
+        parser.add_argument("--readers", type=int, default=4, help="Number of concurrent reader threads.")
+
+    def run_writers(self, options: dict) -> tuple[ScenarioResult, int]:
+        """
+        Rates products from concurrent writer threads, each as its own user, while reader threads keep reading review
+        aggregates.
+
+        Returns:
+            Tuple of the write results, where failed writes count as errors, and the number of reads made meanwhile.
+        """
+        size = seed_size_from_options(options)
+        product_ids = seed_catalog(size, seed=options["seed"])
+        if options["writes"] > len(product_ids):
+            raise ValueError("Each writer rates every product at most once, --writes cannot exceed --products.")
+        writers = [User.objects.create(username=f"bench-writer-{i}") for i in range(options["writers"])]
+        lock, latencies, errors, reads = threading.Lock(), [], 0, 0
+        done = threading.Event()
+
+        def write(user: User):
+            nonlocal errors
+            try:
+                for product_id in random.Random(user.pk).sample(product_ids, options["writes"]):
+                    start = time.perf_counter()
+                    try:
+                        Rating.objects.create(product_id=product_id, user=user, value=random.randint(0, 5))
+                    except OperationalError:
+                        with lock:
+                            errors += 1
+                        continue
+                    with lock:
+                        latencies.append(time.perf_counter() - start)
+            finally:
+                connection.close()
+
+        def read():
+            nonlocal reads
+            rng = random.Random()
+            try:
+                while not done.is_set():
+                    list(Product.objects.select_related("review_aggregate").filter(id__in=rng.sample(product_ids, 20)))
+                    with lock:
+                        reads += 1
+            finally:
+                connection.close()
+
+        readers = [threading.Thread(target=read) for _ in range(options["readers"])]
+        threads = [threading.Thread(target=write, args=(user,)) for user in writers]
+        for thread in readers:
+            thread.start()
+        start = time.perf_counter()
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+        duration = time.perf_counter() - start
+        done.set()
+        for thread in readers:
+            thread.join()
+        return ScenarioResult("writes", len(writers) * options["writes"], errors, duration, latencies), reads
+
+    def write_result(self, label: str, result: ScenarioResult, reads: int):
+        summary = result.summary()
+        self.stdout.write(
+            f"  {label:<10} writes/s={summary['requests_per_second']:8.1f} p50={summary['p50_ms']:7.2f}ms "
+            f"p95={summary['p95_ms']:7.2f}ms p99={summary['p99_ms']:7.2f}ms failed={result.errors} "
+            f"reads/s={reads / result.duration:8.1f}"
+        )
+
+    def handle(self, *args, **options):
+        self.stdout.write(f"Seeding {seed_size_from_options(options)} per run...")
+        if connection.vendor != "sqlite":
+            with benchmark_database(options["use_default_db"]):
+                self.write_result(connection.vendor, *self.run_writers(options))
+            return
+
+        configurations = {"default": SQLITE_DEFAULT_PRAGMAS, "configured": settings.SQLITE_PRAGMAS}
+        for label, pragmas in configurations.items():
+            # WAL needs a file database, so each run gets a fresh one in a temporary directory.
+            with tempfile.TemporaryDirectory() as directory, override_settings(SQLITE_PRAGMAS=pragmas):
+                with benchmark_database(test_name=str(Path(directory) / "benchmark.sqlite3")):
+                    self.write_result(label, *self.run_writers(options))
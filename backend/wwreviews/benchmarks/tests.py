@@ -0,0 +1,15 @@
+from django.test import SimpleTestCase, override_settings
+
+from benchmarks.load import LoadServer, Request, run_scenario
+
+
+class LoadGeneratorTests(SimpleTestCase):
+    @override_settings(REQUEST_METRICS=True, METRICS_ALLOWED_NETWORKS=["127.0.0.0/8"])
+    def test_run_scenario(self):
+        with LoadServer() as server:
+            result = run_scenario("metrics", server.port, lambda: Request("GET", "/v1/metrics/"), 20, concurrency=4)
+        self.assertEqual((result.requests, result.errors, len(result.latencies)), (20, 0, 20))
+        summary = result.summary()
+        self.assertLessEqual(summary["p50_ms"], summary["p95_ms"])
+        self.assertLessEqual(summary["p95_ms"], summary["p99_ms"])
+        self.assertEqual(summary["p99_ms"], max(result.latencies) * 1000)
@@ -0,0 +1,143 @@
+"""
+Shared helpers for the benchmark management commands.
+"""
+import os
+import re
+import statistics
+import subprocess
+import sys
+import time
+from collections.abc import Callable
+from contextlib import contextmanager
+
+from django.conf import settings
+from django.db import connection
+
+from benchmarks.factories import SeedSize
+
+
+def add_seed_arguments(parser, **defaults):
+    """
+    Adds the arguments shaping the seeded catalog to a management command parser.
+
+    Args:
+        parser: Argument parser of the management command.
+        defaults: Overrides of the `SeedSize` defaults for this command.
+    """
+    size = SeedSize(**defaults)
+    for field in SeedSize.__dataclass_fields__:
+        parser.add_argument(f"--{field.replace('_', '-')}", type=int, default=getattr(size, field))
+    parser.add_argument("--seed", type=int, default=0, help="Seed for the random number generator.")
+    parser.add_argument(
+        "--use-default-db",
+        action="store_true",
+        help="Seed into the configured database instead of a throwaway test database.",
+    )
+
+
+def seed_size_from_options(options: dict) -> SeedSize:
+    return SeedSize(**{field: options[field] for field in SeedSize.__dataclass_fields__})
+
+
+@contextmanager
+def benchmark_database(use_default_db: bool = False, verbosity: int = 0, test_name: str | None = None):
+    """
+    Context manager running the body against a freshly migrated throwaway database, so benchmarks never seed into the
+    configured database unless explicitly asked to.
+
+    Args:
+        use_default_db: If true, the body runs against the configured database instead.
+        verbosity: Verbosity of the database creation and destruction.
+        test_name: Name of the throwaway database, defaults to the test database name. For SQLite, this gives a file
+            database instead of an in-memory one.
+    """
+    if use_default_db:
+        yield
+        return
+    old_name, old_test_name = connection.settings_dict["NAME"], connection.settings_dict["TEST"]["NAME"]
+    if test_name is not None:
+        connection.settings_dict["TEST"]["NAME"] = test_name
+    connection.creation.create_test_db(verbosity=verbosity, autoclobber=True, serialize=False)
+    try:
+        yield
+    finally:
+        connection.creation.destroy_test_db(old_name, verbosity=verbosity)
+        connection.settings_dict["TEST"]["NAME"] = old_test_name
+
+
+def time_call(func: Callable, repeat: int = 5) -> dict[str, float]:
+    """
+    Times repeated calls of a function.
+
+    Args:
+        func: Function to call.
+        repeat: Number of times to call the function.
+
+    Returns:
+        Dictionary with the min, median and max durations in milliseconds.
+    """
+    durations = []
+    for _ in range(repeat):
+        start = time.perf_counter()
+        func()
+        durations.append((time.perf_counter() - start) * 1000)
+    return {"min": min(durations), "median": statistics.median(durations), "max": max(durations)}
+
+
+def format_timing(timing: dict[str, float]) -> str:
+    return " ".join(f"{key}={value:.2f}ms" for key, value in timing.items())
+
+
+class QueryCounter:
+    """
+    Context manager counting the queries executed on the default connection. Unlike `CaptureQueriesContext` it keeps
+    counting across requests made with the test client, which reset the connection's query log when they start.
+    """
+
+    def __init__(self):
+        self.count = 0
+
+    def __call__(self, execute, sql, params, many, context):
+        self.count += 1
+        return execute(sql, params, many, context)
+
+    def __enter__(self):
+        self._wrapper = connection.execute_wrapper(self)
+        self._wrapper.__enter__()
+        return self
+
+    def __exit__(self, *exc_info):
+        self._wrapper.__exit__(*exc_info)
+
+
+def measure_import_time(module: str, repeat: int = 3) -> tuple[float, set[str]]:
+    """
+    Measures the cold import time of a module in fresh interpreters with `python -X importtime`.
+
+    Args:
+        module: Dotted path of the module to import.
+        repeat: Number of interpreters to start, the fastest one is reported to filter out noise.
+
+    Returns:
+        Tuple of the cumulative import time of the module in milliseconds and the names of all modules it imported.
+    """
+    env = {**os.environ, "DJANGO_SETTINGS_MODULE": os.environ.get("DJANGO_SETTINGS_MODULE", "wwreviews.settings")}
+    best, modules = None, set()
+    for _ in range(repeat):
+        result = subprocess.run(
+            [sys.executable, "-X", "importtime", "-c", f"import {module}"],
+            cwd=settings.BASE_DIR,
+            env=env,
+            capture_output=True,
+            text=True,
+            check=True,
+        )
+        for line in result.stderr.splitlines():
+            match = re.match(r"import time:\s+\d+ \|\s+(\d+) \| ( *)(\S+)$", line)
+            if match is None:
+                continue
+            modules.add(match.group(3))
+            if match.group(3) == module and not match.group(2):
+                duration = int(match.group(1)) / 1000
+                best = duration if best is None else min(best, duration)
+    return best, modules
@@ -1,10 +1,14 @@
 from django.contrib import admin
 
-from products.models import Category, Feedback, Product, ProductAction, Rating, SuggestedProduct
+from products.models import (Category, Feedback, PriceHistory, Product, ProductAction, ProductJob, Rating,
+                             ReviewAggregate, SuggestedProduct)
 
 admin.site.register(Category)
 admin.site.register(Feedback)
+admin.site.register(PriceHistory)
 admin.site.register(Product)
 admin.site.register(ProductAction)
+admin.site.register(ProductJob)
 admin.site.register(Rating)
+admin.site.register(ReviewAggregate)
 admin.site.register(SuggestedProduct)
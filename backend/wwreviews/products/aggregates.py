@@ -0,0 +1,181 @@
+"""
+Maintenance of the denormalized `ReviewAggregate` rows.
+"""
+import math
+from collections.abc import Iterable
+from datetime import datetime
+
+from django.db.models import Count, F, Q
+from django.utils import timezone
+
+from products import ranking
+from products.models import RATING_VALUES, Feedback, Product, Rating, ReviewAggregate
+from wwreviews.caching import invalidate_model
+
+AGGREGATE_FIELDS = (
+    "rating_count",
+    "rating_sum",
+    "feedback_count",
+    *(ReviewAggregate.histogram_field(value) for value in RATING_VALUES),
+)
+
+
+def compute_review_aggregates(product_ids: Iterable[int] | None = None) -> dict[int, ReviewAggregate]:
+    """
+    Computes review aggregates from the underlying `Rating` and `Feedback` rows, without saving them.
+
+    Args:
+        product_ids: Products to compute the aggregates for. If None, all products are computed.
+
+    Returns:
+        Dictionary mapping product id to an unsaved `ReviewAggregate`.
+    """
+    if product_ids is None:
+        product_ids = Product.objects.values_list("id", flat=True)
+        ratings = Rating.objects.all()
+        feedback = Feedback.objects.all()
+    else:
+        product_ids = list(product_ids)
+        ratings = Rating.objects.filter(product_id__in=product_ids)
+        feedback = Feedback.objects.filter(product_id__in=product_ids)
+
+    aggregates = {product_id: ReviewAggregate(product_id=product_id) for product_id in product_ids}
+    for row in ratings.order_by().values("product_id", "value").annotate(count=Count("id")):
+        aggregate = aggregates[row["product_id"]]
+        aggregate.rating_count += row["count"]
+        aggregate.rating_sum += row["value"] * row["count"]
+        field = ReviewAggregate.histogram_field(row["value"])
+        setattr(aggregate, field, getattr(aggregate, field) + row["count"])
+    for row in feedback.order_by().values("product_id").annotate(count=Count("id")):
+        aggregates[row["product_id"]].feedback_count = row["count"]
+
+    # The trending score depends on when each rating was made, so it is summed per rating rather than grouped.
+    for product_id, value, created_at in ratings.order_by().values_list("product_id", "value", "created_at"):
+        aggregates[product_id].trending_score += ranking.trending_weight(value, created_at)
+    for aggregate in aggregates.values():
+        aggregate.bayesian_score = ranking.bayesian_score(aggregate.rating_count, aggregate.rating_sum)
+        aggregate.wilson_score = ranking.wilson_score(aggregate.rating_count, aggregate.rating_sum)
+    return aggregates
+
+
+def refresh_review_aggregates(product_ids: Iterable[int] | None = None) -> list[ReviewAggregate]:
+    """
+    Recomputes and upserts the review aggregates for the given products.
+
+    Args:
+        product_ids: Products to refresh the aggregates for. If None, all products are refreshed.
+
+    Returns:
+        List of the saved aggregates.
+    """
+    aggregates = list(compute_review_aggregates(product_ids).values())
+    now = timezone.now()
+    for aggregate in aggregates:
+        aggregate.updated_at = now
+    aggregates = ReviewAggregate.objects.bulk_create(
+        aggregates,
+        batch_size=500,
+        update_conflicts=True,
+        unique_fields=["product"],
+        update_fields=[*AGGREGATE_FIELDS, *ranking.SCORE_FIELDS, "updated_at"],
+    )
+    invalidate_model(ReviewAggregate)
+    return aggregates
+
+
+def find_review_aggregate_drift(product_ids: Iterable[int] | None = None) -> dict[int, dict[str, tuple[int, int]]]:
+    """
+    Compares the stored review aggregates against freshly computed ones.
+
+    Args:
+        product_ids: Products to check. If None, all products are checked.
+
+    Returns:
+        Dictionary mapping product id to the drifted fields, each as a `(stored, expected)` tuple. Products without a
+        stored aggregate are compared against an empty one. Scores only drift beyond floating point rounding.
+    """
+    expected = compute_review_aggregates(product_ids)
+    stored = ReviewAggregate.objects.in_bulk(list(expected))
+    drift = {}
+    for product_id, aggregate in expected.items():
+        current = stored.get(product_id, ReviewAggregate(product_id=product_id))
+        fields = {
+            field: (getattr(current, field), getattr(aggregate, field))
+            for field in AGGREGATE_FIELDS
+            if getattr(current, field) != getattr(aggregate, field)
+        }
+        fields.update(
+            (field, (getattr(current, field), getattr(aggregate, field)))
+            for field in ranking.SCORE_FIELDS
+            if not math.isclose(getattr(current, field), getattr(aggregate, field), rel_tol=1e-9, abs_tol=1e-12)
+        )
+        if fields or product_id not in stored:
+            drift[product_id] = fields
+    return drift
+
+
+def _apply_delta(product_id: int, create_missing: bool, **deltas: float):
+    """
+    Atomically adds the given deltas to a product's aggregate row, recomputing its scores in the same update.
+
+    Args:
+        product_id: Product whose aggregate is being updated.
+        create_missing: If true and the product has no aggregate row yet, the row is computed from scratch. This must
+            be false while deleting, where the product itself may be in the middle of a cascading delete.
+        deltas: Mapping of aggregate field name to the amount to add to it.
+    """
+    updates = {field: F(field) + delta for field, delta in deltas.items() if delta}
+    if not updates:
+        return
+    if "rating_count" in updates:
+        updates.update(ranking.score_expressions(updates["rating_count"], F("rating_sum") + deltas["rating_sum"]))
+    updated = ReviewAggregate.objects.filter(product_id=product_id).update(**updates, updated_at=timezone.now())
+    if updated:
+        invalidate_model(ReviewAggregate)
+    elif create_missing:
+        refresh_review_aggregates([product_id])
+
+
+def add_rating(product_id: int, value: int, created_at: datetime, sign: int = 1, create_missing: bool = True):
+    """
+    Adds (or with `sign=-1`, removes) a single rating to a product's aggregate.
+    """
+    _apply_delta(
+        product_id,
+        create_missing,
+        rating_count=sign,
+        rating_sum=sign * value,
+        trending_score=sign * ranking.trending_weight(value, created_at),
+        **{ReviewAggregate.histogram_field(value): sign},
+    )
+
+
+def add_feedback(product_id: int, sign: int = 1, create_missing: bool = True):
+    """
+    Adds (or with `sign=-1`, removes) a single feedback to a product's aggregate.
+    """
+    _apply_delta(product_id, create_missing, feedback_count=sign)
+
+
+def rating_histograms(product_ids: Iterable[int], live: bool = False) -> dict[int, dict[int, int]]:
+    """
+    Gets the number of ratings of each value for the given products, in a single query.
+
+    Args:
+        product_ids: Products to get the histograms of. Ids of products which do not exist are left out.
+        live: If true, the histograms are counted from the ratings themselves rather than read from the aggregates.
+
+    Returns:
+        Dictionary mapping product id to its histogram, which maps each rating value to its number of ratings.
+    """
+    products = Product.objects.filter(id__in=product_ids).order_by()
+    if live:
+        counts = {str(value): Count("rating", filter=Q(rating__value=value)) for value in RATING_VALUES}
+        rows = products.values("id").annotate(**counts).values_list("id", *counts)
+    else:
+        # Left joined, so products without an aggregate row yet are counted as having no ratings.
+        fields = [f"review_aggregate__{ReviewAggregate.histogram_field(value)}" for value in RATING_VALUES]
+        rows = products.values_list("id", *fields)
+    return {
+        product_id: {value: count or 0 for value, count in zip(RATING_VALUES, counts)} for product_id, *counts in rows
+    }
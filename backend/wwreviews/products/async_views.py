@@ -0,0 +1,93 @@
+"""
+Async read-only endpoints for the catalog, using Django's async ORM.
+
+They serve the same data as the read actions of `ProductView`, `CategoryView` and `BasicProductReviewView`, with the
+same filters and serializers, but as native async views: under ASGI a request waiting on the database does not hold a
+worker thread. DRF views are sync only, so these are plain Django views like `RedditCallbackView`. List endpoints are
+always paginated by keyset, and responses are not conditional or cached.
+"""
+from asgiref.sync import sync_to_async
+from django.http import JsonResponse
+from django.views import View
+from rest_framework import status
+from rest_framework.exceptions import NotFound
+from rest_framework.request import Request
+
+from products.models import Category, Product
+from products.serializers import BasicProductReviewSerializer, CategorySerializer, ProductSerializer
+from products.views import BasicProductReviewFilter, CategoryFilter, ProductFilter
+from wwreviews.pagination import IdKeysetPagination, KeysetPagination
+
+
+class AsyncReadView(View):
+    """
+    Base async view listing (paginated and filtered) or retrieving instances of a model.
+    """
+
+    queryset = None
+    serializer_class = None
+    filterset_class = None
+    pagination_class = KeysetPagination
+    http_method_names = ["get", "options"]
+
+    async def get(self, request, pk: int | None = None):
+        # Wrapped for its `query_params`, which the filters and pagination read.
+        request = Request(request)
+        if pk is not None:
+            return await self.retrieve(pk)
+        return await self.list(request)
+
+    def filter_queryset(self, request):
+        """
+        Filters the queryset with the view's filterset. Sync, since validating some filters queries the database.
+
+        Returns:
+            Tuple of the filtered queryset, and the errors of the filters or None if they are valid.
+        """
+        queryset = self.queryset.all()
+        if self.filterset_class is None:
+            return queryset, None
+        filterset = self.filterset_class(request.query_params, queryset=queryset, request=request)
+        if not filterset.is_valid():
+            return None, filterset.errors
+        return filterset.qs, None
+
+    async def list(self, request) -> JsonResponse:
+        queryset, errors = await sync_to_async(self.filter_queryset)(request)
+        if errors is not None:
+            return JsonResponse(errors, status=status.HTTP_400_BAD_REQUEST)
+        paginator = self.pagination_class()
+        try:
+            rows = await paginator.apaginate_queryset(queryset, request)
+        except NotFound as err:
+            return JsonResponse({"detail": err.detail}, status=status.HTTP_404_NOT_FOUND)
+        data = self.serializer_class(rows, many=True).data
+        return JsonResponse(
+            {"next": paginator.get_next_link(), "previous": paginator.get_previous_link(), "results": data}
+        )
+
+    async def retrieve(self, pk: int) -> JsonResponse:
+        try:
+            instance = await self.queryset.aget(pk=pk)
+        except self.queryset.model.DoesNotExist:
+            return JsonResponse({"detail": "Not found."}, status=status.HTTP_404_NOT_FOUND)
+        return JsonResponse(self.serializer_class(instance).data)
+
+
+class AsyncProductView(AsyncReadView):
+    queryset = Product.objects.all()
+    serializer_class = ProductSerializer
+    filterset_class = ProductFilter
+
+
+class AsyncCategoryView(AsyncReadView):
+    queryset = Category.objects.all()
+    serializer_class = CategorySerializer
+    filterset_class = CategoryFilter
+    pagination_class = IdKeysetPagination
+
+
+class AsyncBasicProductReviewView(AsyncReadView):
+    queryset = Product.objects.select_related("review_aggregate")
+    serializer_class = BasicProductReviewSerializer
+    filterset_class = BasicProductReviewFilter
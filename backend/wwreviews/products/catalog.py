@@ -0,0 +1,255 @@
+"""
+Bulk import and streaming export of the product catalog.
+
+Imports accept NDJSON (one JSON object per line) or CSV with a header row. Rows are validated and written in chunks
+with `bulk_create`/`bulk_update`, matching existing products by `id` when given and by `link` otherwise, and recording
+a `ProductAction` for every audited field an import changes as well as the price history of the products.
+"""
+import csv
+import json
+from collections.abc import Iterable, Iterator
+from dataclasses import dataclass, field
+from itertools import islice
+
+from django.db import transaction
+from django.utils import timezone
+from rest_framework import serializers
+
+from products import duplicates, prices, search
+from products.models import Category, PriceHistory, Product, ProductAction
+from wwreviews.caching import invalidate_model
+
+CHUNK_SIZE = 500
+EXPORT_FIELDS = (
+    "id",
+    "name",
+    "price",
+    "link",
+    "image_url",
+    "category",
+    "category_name",
+    "rating_count",
+    "average_rating",
+    "feedback_count",
+)
+IMPORT_FORMATS = ("ndjson", "csv")
+
+
+class ProductImportSerializer(serializers.Serializer):
+    """
+    Validates a single imported row. Unlike `ProductSerializer`, the category is only validated as an integer here and
+    checked against the database once per chunk.
+    """
+
+    id = serializers.IntegerField(required=False, min_value=1)
+    name = serializers.CharField()
+    price = serializers.FloatField()
+    link = serializers.URLField()
+    image_url = serializers.URLField()
+    category = serializers.IntegerField(min_value=1)
+
+
+@dataclass
+class ImportResult:
+    created: int = 0
+    updated: int = 0
+    unchanged: int = 0
+    errors: list[dict] = field(default_factory=list)
+
+    def as_dict(self) -> dict:
+        return {"created": self.created, "updated": self.updated, "unchanged": self.unchanged, "errors": self.errors}
+
+
+@dataclass
+class InvalidRow:
+    """
+    Stands in for a row which could not be parsed, reported as the error of its row.
+    """
+
+    error: str
+
+
+def _decode(lines: Iterable[bytes], invalid: set[int]) -> Iterator[str]:
+    """
+    Decodes UTF-8 lines, replacing undecodable bytes and adding the one-based numbers of their lines to `invalid`.
+    """
+    for number, line in enumerate(lines, start=1):
+        try:
+            yield line.decode("utf-8")
+        except UnicodeDecodeError:
+            invalid.add(number)
+            yield line.decode("utf-8", errors="replace")
+
+
+def parse_rows(lines: Iterable[bytes], import_format: str) -> Iterator[dict | InvalidRow]:
+    """
+    Lazily parses the rows of an uploaded catalog.
+
+    Args:
+        lines: The uploaded catalog as an iterable of raw lines, e.g. the request itself.
+        import_format: One of `IMPORT_FORMATS`.
+    """
+    invalid = set()
+    text = _decode(lines, invalid)
+    if import_format == "csv":
+        reader = csv.DictReader(text)
+        # Getting the field names reads the header, which ends at the current line.
+        last_line = reader.line_num if reader.fieldnames is not None else 0
+        for row in reader:
+            # A quoted value can span several lines.
+            if invalid.intersection(range(last_line + 1, reader.line_num + 1)):
+                yield InvalidRow("Invalid UTF-8.")
+            else:
+                # Empty cells are treated as missing values, so exported catalogs can be imported back as they are.
+                yield {name: value for name, value in row.items() if value not in ("", None)}
+            last_line = reader.line_num
+        return
+    for number, line in enumerate(text, start=1):
+        if not line.strip():
+            continue
+        if number in invalid:
+            yield InvalidRow("Invalid UTF-8.")
+            continue
+        try:
+            row = json.loads(line)
+        except json.JSONDecodeError as err:
+            yield InvalidRow(f"Invalid JSON: {err.msg}.")
+            continue
+        yield row if isinstance(row, dict) else InvalidRow("Rows must be JSON objects.")
+
+
+def _chunks(rows: Iterable[dict], size: int) -> Iterator[list[dict]]:
+    rows = iter(rows)
+    while chunk := list(islice(rows, size)):
+        yield chunk
+
+
+def _import_chunk(rows: list[tuple[int, dict | InvalidRow]], result: ImportResult):
+    """
+    Validates and writes one chunk of numbered rows, in a constant number of queries.
+    """
+    valid = []
+    for line, row in rows:
+        if isinstance(row, InvalidRow):
+            result.errors.append({"row": line, "errors": row.error})
+            continue
+        serializer = ProductImportSerializer(data=row)
+        if serializer.is_valid():
+            valid.append((line, serializer.validated_data))
+        else:
+            result.errors.append({"row": line, "errors": serializer.errors})
+
+    category_ids = set(
+        Category.objects.filter(id__in={data["category"] for _, data in valid}).values_list("id", flat=True)
+    )
+    ids = [data["id"] for _, data in valid if "id" in data]
+    links = [data["link"] for _, data in valid if "id" not in data]
+    by_id = Product.objects.in_bulk(ids)
+    by_link = {product.link: product for product in Product.objects.filter(link__in=links)}
+
+    created, updated, actions, now = [], [], [], timezone.now()
+    for line, data in valid:
+        if data["category"] not in category_ids:
+            result.errors.append(
+                {"row": line, "errors": {"category": [f"Category {data['category']} does not exist."]}}
+            )
+            continue
+        product = by_id.get(data["id"]) if "id" in data else by_link.get(data["link"])
+        if product is None and "id" in data:
+            result.errors.append({"row": line, "errors": {"id": [f"Product {data['id']} does not exist."]}})
+            continue
+
+        values = {name: value for name, value in data.items() if name not in ("id", "category")}
+        values["category_id"] = data["category"]
+        if product is None:
+            product = Product(**values)
+            by_link[product.link] = product
+            created.append(product)
+            continue
+        if product.pk is None:
+            # The same link appeared earlier in this chunk, the last row for it wins.
+            for name, value in values.items():
+                setattr(product, name, value)
+            continue
+        previous = ProductAction.snapshot(product)
+        for name, value in values.items():
+            setattr(product, name, value)
+        changes = ProductAction.for_changes(product, previous)
+        if changes:
+            product.updated_at = now
+            actions += changes
+            updated.append(product)
+        else:
+            result.unchanged += 1
+
+    if result.errors:
+        # Nothing is written once any row failed, the import is rolled back as a whole.
+        return
+    Product.objects.bulk_create(created)
+    Product.objects.bulk_update(updated, [*ProductAction.TRACKED_FIELDS, "updated_at"])
+    ProductAction.objects.bulk_create(actions)
+    PriceHistory.objects.bulk_create([*prices.initial_prices(created), *prices.price_changes(updated, actions)])
+    search.index_products([product.pk for product in (*created, *updated)])
+    duplicates.index_products([*created, *updated])
+    # Bulk writes send no signals, so the cached responses are invalidated explicitly.
+    invalidate_model(Product)
+    invalidate_model(ProductAction)
+    result.created += len(created)
+    result.updated += len(updated)
+
+
+def import_products(rows: Iterable[dict | InvalidRow], chunk_size: int = CHUNK_SIZE) -> ImportResult:
+    """
+    Imports catalog rows in chunks within a single transaction. If any row is invalid, the whole import is rolled back
+    and the result lists the errors of every invalid row by its one-based row number.
+    """
+    result = ImportResult()
+    with transaction.atomic():
+        for chunk in _chunks(enumerate(rows, start=1), chunk_size):
+            _import_chunk(chunk, result)
+        if result.errors:
+            transaction.set_rollback(True)
+            result.created = result.updated = result.unchanged = 0
+    return result
+
+
+def export_rows(queryset=None, chunk_size: int = 2000) -> Iterator[dict]:
+    """
+    Lazily yields every product of the catalog with its review aggregates, without loading the catalog into memory.
+    """
+    queryset = Product.objects.all() if queryset is None else queryset
+    for product in queryset.select_related("category", "review_aggregate").order_by("id").iterator(chunk_size):
+        aggregate = getattr(product, "review_aggregate", None)
+        yield {
+            "id": product.pk,
+            "name": product.name,
+            "price": product.price,
+            "link": product.link,
+            "image_url": product.image_url,
+            "category": product.category_id,
+            "category_name": product.category.name,
+            "rating_count": aggregate.rating_count if aggregate else 0,
+            "average_rating": aggregate.average_rating if aggregate else None,
+            "feedback_count": aggregate.feedback_count if aggregate else 0,
+        }
+
+
+def export_ndjson(rows: Iterable[dict]) -> Iterator[str]:
+    for row in rows:
+        yield json.dumps(row) + "\n"
+
+
+class _Echo:
+    """
+    File-like object handing back what is written to it, so `csv.writer` can format rows one at a time.
+    """
+
+    def write(self, value: str) -> str:
+        return value
+
+
+def export_csv(rows: Iterable[dict]) -> Iterator[str]:
+    writer = csv.DictWriter(_Echo(), fieldnames=EXPORT_FIELDS)
+    yield writer.writeheader()
+    for row in rows:
+        yield writer.writerow(row)
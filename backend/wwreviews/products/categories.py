@@ -0,0 +1,101 @@
+"""
+Process-wide, in-memory cache of the category tree.
+
+The tree is loaded with a single query and reused until a category is written. Writes replace a version token in the
+Django cache, so every process sharing that cache reloads its copy on the next lookup. Without a shared cache (see
+`CACHE_SHARED` in the settings) the writes of other processes cannot be seen, so the tree is loaded on every lookup.
+"""
+import uuid
+from dataclasses import dataclass, field
+
+from django.conf import settings
+from django.core.cache import cache
+
+from products.models import Category
+
+VERSION_CACHE_KEY = "products:category-tree:version"
+
+
+@dataclass
+class CategoryNode:
+    id: int
+    name: str
+    parent_id: int | None
+    path: str
+    depth: int
+    children: list["CategoryNode"] = field(default_factory=list)
+
+    def as_dict(self) -> dict:
+        return {
+            "id": self.id,
+            "name": self.name,
+            "parent": self.parent_id,
+            "depth": self.depth,
+            "children": [child.as_dict() for child in self.children],
+        }
+
+    def walk(self):
+        """
+        Yields this node and all of its descendants, depth first.
+        """
+        yield self
+        for child in self.children:
+            yield from child.walk()
+
+
+class CategoryTree:
+    def __init__(self, nodes: list[CategoryNode]):
+        self.nodes = {node.id: node for node in nodes}
+        self.roots = []
+        for node in sorted(nodes, key=lambda node: node.name):
+            parent = self.nodes.get(node.parent_id)
+            (parent.children if parent is not None else self.roots).append(node)
+
+    @classmethod
+    def load(cls) -> "CategoryTree":
+        return cls(
+            [CategoryNode(*row) for row in Category.objects.values_list("id", "name", "parent_id", "path", "depth")]
+        )
+
+    def get(self, category_id: int) -> CategoryNode | None:
+        return self.nodes.get(category_id)
+
+    def descendant_ids(self, category_id: int, include_self: bool = True) -> list[int]:
+        node = self.get(category_id)
+        if node is None:
+            return []
+        return [descendant.id for descendant in node.walk() if include_self or descendant is not node]
+
+    def as_list(self) -> list[dict]:
+        return [root.as_dict() for root in self.roots]
+
+
+_cached: tuple[str, CategoryTree] | None = None
+
+
+def _current_version() -> str:
+    version = cache.get(VERSION_CACHE_KEY)
+    if version is None:
+        cache.add(VERSION_CACHE_KEY, uuid.uuid4().hex, None)
+        version = cache.get(VERSION_CACHE_KEY)
+    return version
+
+
+def get_category_tree() -> CategoryTree:
+    """
+    Gets the category tree, loading it from the database only if a category was written since it was last loaded.
+    """
+    global _cached  # pylint: disable=W0603
+    if not settings.CACHE_SHARED:
+        return CategoryTree.load()
+    version = _current_version()
+    cached = _cached
+    if cached is not None and cached[0] == version:
+        return cached[1]
+    tree = CategoryTree.load()
+    _cached = (version, tree)
+    return tree
+
+
+def invalidate_category_tree():
+    cache.set(VERSION_CACHE_KEY, uuid.uuid4().hex, None)
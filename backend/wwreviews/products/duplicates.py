@@ -0,0 +1,268 @@
+"""
+Near-duplicate detection for products and suggestions.
+
+Each product and suggestion is indexed in the `DuplicateKey` table under the hash of its normalized link, and under
+one hash per band of the MinHash signature of its name's character trigrams (locality-sensitive hashing). Names with a
+trigram Jaccard similarity of 0.7 share at least one band with a probability of over 98%, so the candidates of a link
+and name are found with a single indexed lookup of a few keys, then verified by computing their exact similarity.
+"""
+import hashlib
+import random
+from collections.abc import Iterable
+from dataclasses import dataclass
+from urllib.parse import parse_qsl, urlencode, urlsplit
+
+from django.db.models import Q
+
+from products.models import DuplicateKey, Product, SuggestedProduct
+
+SHINGLE_SIZE = 3
+BANDS = 10
+BAND_ROWS = 3
+# Minimum trigram Jaccard similarity of the names of near-duplicates.
+SIMILARITY_THRESHOLD = 0.7
+
+# Query parameters only used to track visits, which do not change the page a link leads to.
+TRACKING_PARAMS = {"fbclid", "gclid", "msclkid", "mc_cid", "mc_eid", "igshid", "ref", "ref_", "_ga", "psc", "spm"}
+TRACKING_PREFIXES = ("utm_", "pd_rd_", "pf_rd_")
+
+# `(a * x + b) mod p` hash functions standing in for the random permutations of MinHash.
+_PRIME = (1 << 61) - 1
+_rng = random.Random(0)
+_PERMUTATIONS = [(_rng.randrange(1, _PRIME), _rng.randrange(0, _PRIME)) for _ in range(BANDS * BAND_ROWS)]
+
+
+def normalize_link(link: str) -> str:
+    """
+    Normalizes a product link for comparison. Ignores the scheme, a `www.` prefix, default ports, trailing slashes,
+    the fragment, tracking query parameters and the order of the other query parameters.
+    """
+    parts = urlsplit(link.strip())
+    host = (parts.hostname or "").removeprefix("www.")
+    if parts.port and parts.port not in (80, 443):
+        host = f"{host}:{parts.port}"
+    params = sorted(
+        (name, value)
+        for name, value in parse_qsl(parts.query, keep_blank_values=True)
+        if name.lower() not in TRACKING_PARAMS and not name.lower().startswith(TRACKING_PREFIXES)
+    )
+    query = f"?{urlencode(params)}" if params else ""
+    return f"{host}{parts.path.rstrip('/')}{query}"
+
+
+def normalize_name(name: str) -> str:
+    """
+    Normalizes a product name for comparison, ignoring case and whitespace.
+    """
+    return " ".join(name.casefold().split())
+
+
+def shingles(name: str) -> set[str]:
+    """
+    Gets the character trigrams of a normalized name, or the name itself if it is shorter.
+    """
+    name = normalize_name(name)
+    if len(name) <= SHINGLE_SIZE:
+        return {name}
+    return {name[i : i + SHINGLE_SIZE] for i in range(len(name) - SHINGLE_SIZE + 1)}
+
+
+def similarity(name: str, other: str) -> float:
+    """
+    Gets the Jaccard similarity of the trigrams of two names.
+    """
+    name, other = shingles(name), shingles(other)
+    return len(name & other) / len(name | other)
+
+
+def _hash(value: str) -> int:
+    # Signed, to fit a `BigIntegerField`.
+    return int.from_bytes(hashlib.blake2b(value.encode(), digest_size=8).digest(), "big", signed=True)
+
+
+def minhash(name: str) -> list[int]:
+    """
+    Gets the MinHash signature of a name's trigrams.
+    """
+    hashes = [_hash(shingle) & _PRIME for shingle in shingles(name)]
+    return [min((a * value + b) % _PRIME for value in hashes) for a, b in _PERMUTATIONS]
+
+
+def duplicate_keys(name: str, link: str) -> list[int]:
+    """
+    Gets the index keys of a name and link: the hash of the normalized link, then one hash per signature band.
+    """
+    signature = minhash(name)
+    bands = (signature[band * BAND_ROWS : (band + 1) * BAND_ROWS] for band in range(BANDS))
+    return [
+        _hash(f"link:{normalize_link(link)}"),
+        *(_hash(f"band:{band}:{','.join(map(str, values))}") for band, values in enumerate(bands)),
+    ]
+
+
+def index_products(products: Iterable[Product]):
+    """
+    (Re)indexes the given products, which must be saved.
+    """
+    products = list(products)
+    DuplicateKey.objects.filter(product__in=products).delete()
+    DuplicateKey.objects.bulk_create(
+        [
+            DuplicateKey(key=key, product=product)
+            for product in products
+            for key in duplicate_keys(product.name, product.link)
+        ],
+        batch_size=1000,
+    )
+
+
+def index_suggestions(suggestions: Iterable[SuggestedProduct]):
+    """
+    (Re)indexes the given suggestions, which must be saved.
+    """
+    suggestions = list(suggestions)
+    DuplicateKey.objects.filter(suggestion__in=suggestions).delete()
+    DuplicateKey.objects.bulk_create(
+        [
+            DuplicateKey(key=key, suggestion=suggestion)
+            for suggestion in suggestions
+            for key in duplicate_keys(suggestion.name, suggestion.link)
+        ],
+        batch_size=1000,
+    )
+
+
+def rebuild_index(chunk_size: int = 1000) -> int:
+    """
+    Rebuilds the duplicate detection index of all products and pending suggestions.
+
+    Returns:
+        Number of indexed products and suggestions.
+    """
+    DuplicateKey.objects.all().delete()
+    count = 0
+    querysets = (
+        Product.objects.only("name", "link"),
+        SuggestedProduct.objects.filter(status=SuggestedProduct.Status.PENDING).only("name", "link"),
+    )
+    for queryset, index in zip(querysets, (index_products, index_suggestions)):
+        chunk = []
+        for instance in queryset.order_by("id").iterator(chunk_size):
+            chunk.append(instance)
+            if len(chunk) == chunk_size:
+                index(chunk)
+                count, chunk = count + len(chunk), []
+        index(chunk)
+        count += len(chunk)
+    return count
+
+
+@dataclass
+class Duplicate:
+    """
+    An existing product or pending suggestion with the same link as, or a similar name to, the one checked.
+    """
+
+    instance: Product | SuggestedProduct
+    same_link: bool
+    similarity: float
+
+    @property
+    def product_id(self) -> int | None:
+        return self.instance.pk if isinstance(self.instance, Product) else None
+
+    @property
+    def suggestion_id(self) -> int | None:
+        return self.instance.pk if isinstance(self.instance, SuggestedProduct) else None
+
+
+def find_duplicates(
+    name: str, link: str, threshold: float = SIMILARITY_THRESHOLD, include_suggestions: bool = True
+) -> list[Duplicate]:
+    """
+    Finds the products, and optionally the pending suggestions, which are near-duplicates of a name and link, in a
+    single indexed query.
+
+    Args:
+        name: Name to check.
+        link: Link to check.
+        threshold: Minimum name similarity of near-duplicates without the same link.
+        include_suggestions: Whether to also check the pending suggestions.
+
+    Returns:
+        The duplicates, the ones with the same link first, then by decreasing name similarity.
+    """
+    keys = duplicate_keys(name, link)
+    owners = Q(product__isnull=False)
+    if include_suggestions:
+        owners |= Q(suggestion__status=SuggestedProduct.Status.PENDING)
+    rows = DuplicateKey.objects.filter(owners, key__in=keys).select_related("product", "suggestion")
+
+    normalized, duplicates, seen = normalize_link(link), [], set()
+    for row in rows:
+        instance = row.product or row.suggestion
+        if (type(instance), instance.pk) in seen:
+            continue
+        seen.add((type(instance), instance.pk))
+        duplicate = Duplicate(instance, normalize_link(instance.link) == normalized, similarity(name, instance.name))
+        if duplicate.same_link or duplicate.similarity >= threshold:
+            duplicates.append(duplicate)
+    return sorted(duplicates, key=lambda duplicate: (not duplicate.same_link, -duplicate.similarity))
+
+
+def find_link_matches(links: Iterable[str]) -> dict[str, int]:
+    """
+    Finds the products with the same normalized links as the given links, in a single indexed query.
+
+    Returns:
+        Dictionary mapping each normalized link with a matching product to the id of the oldest one.
+    """
+    normalized = {normalize_link(link) for link in links}
+    rows = (
+        DuplicateKey.objects.filter(key__in=[_hash(f"link:{link}") for link in normalized], product__isnull=False)
+        .order_by("-product_id")
+        .values_list("product_id", "product__link")
+    )
+    # Ordered newest first, so the oldest product of each link is kept.
+    matches = {normalize_link(link): product_id for product_id, link in rows}
+    return {link: product_id for link, product_id in matches.items() if link in normalized}
+
+
+def find_clusters(threshold: float = SIMILARITY_THRESHOLD, chunk_size: int = 2000) -> list[list[Product]]:
+    """
+    Scans the catalog for clusters of duplicate products, products being duplicates when they share a normalized link
+    or have similar names, transitively. Candidates are bucketed by their index keys in memory, so the scan takes a
+    single pass over the products whatever the state of the index.
+
+    Returns:
+        The clusters of two products or more, each ordered by id.
+    """
+    products, buckets = [], {}
+    for product in Product.objects.only("name", "link").order_by("id").iterator(chunk_size):
+        for key in duplicate_keys(product.name, product.link):
+            buckets.setdefault(key, []).append(len(products))
+        products.append(product)
+
+    parents = list(range(len(products)))
+
+    def find(index: int) -> int:
+        while parents[index] != index:
+            parents[index] = parents[parents[index]]
+            index = parents[index]
+        return index
+
+    links = [normalize_link(product.link) for product in products]
+    for members in buckets.values():
+        for i, first in enumerate(members):
+            for second in members[i + 1 :]:
+                if find(first) == find(second):
+                    continue
+                if links[first] == links[second] or (
+                    similarity(products[first].name, products[second].name) >= threshold
+                ):
+                    parents[max(find(first), find(second))] = min(find(first), find(second))
+
+    clusters = {}
+    for index, product in enumerate(products):
+        clusters.setdefault(find(index), []).append(product)
+    return [cluster for cluster in clusters.values() if len(cluster) > 1]
@@ -0,0 +1,161 @@
+"""
+Durable queue (outbox) of the side effects of review writes, see `ProductJob`.
+
+Jobs are enqueued in the transaction of the write that causes them, so they are committed (or rolled back) with it.
+The `process_product_jobs` worker claims the due jobs in batches by leasing them, runs each kind of job for all products
+of a batch at once outside of any transaction, and retries failing jobs with an exponential backoff, up to
+`MAX_ATTEMPTS` times. Every job recomputes its derived data from scratch, so running a job more than once, as when the
+lease of a worker which died expires, is harmless.
+"""
+import logging
+from collections.abc import Callable, Iterable
+from datetime import datetime, timedelta
+from itertools import groupby
+
+from django.conf import settings
+from django.db import transaction
+from django.utils import timezone
+
+from products import search
+from products.aggregates import refresh_review_aggregates
+from products.models import Product, ProductJob
+
+logger = logging.getLogger(__name__)
+
+MAX_RETRY_DELAY = timedelta(hours=1)
+# Jobs failing this many times are dead-lettered, see `ProductJob`.
+MAX_ATTEMPTS = 10
+# How long claimed jobs are hidden from other workers, which must be longer than running a batch takes.
+LEASE = timedelta(minutes=5)
+
+
+def is_deferred() -> bool:
+    """
+    Whether the side effects of review writes are enqueued rather than run inline.
+    """
+    return settings.DEFER_REVIEW_SIDE_EFFECTS
+
+
+def enqueue(kind: ProductJob.Kind, product_ids: Iterable[int]):
+    """
+    Enqueues a job of the given kind for each of the given products, in one statement. Products with a pending job of
+    that kind keep it, with its enqueue time moved forward so a worker already running it will run it again. The job is
+    made due right away with its attempts reset, even if it was waiting for a retry or in the dead letters.
+    """
+    now = timezone.now()
+    ProductJob.objects.bulk_create(
+        [
+            ProductJob(kind=kind, product_id=product_id, enqueued_at=now, run_after=now)
+            for product_id in set(product_ids)
+        ],
+        update_conflicts=True,
+        unique_fields=["kind", "product_id"],
+        update_fields=["enqueued_at", "run_after", "attempts", "failed_at"],
+    )
+
+
+def _refresh_review_aggregates(product_ids: list[int]):
+    # Deleted products have no aggregate to refresh.
+    refresh_review_aggregates(Product.objects.filter(id__in=product_ids).values_list("id", flat=True))
+
+
+HANDLERS: dict[int, Callable[[list[int]], None]] = {
+    ProductJob.Kind.REVIEW_AGGREGATE: _refresh_review_aggregates,
+    ProductJob.Kind.SEARCH_INDEX: search.index_products,
+}
+
+
+def _run(jobs: list[ProductJob]) -> list[tuple[ProductJob, Exception]]:
+    """
+    Runs jobs of the same kind together, or one at a time if that fails, so a single failing product does not hold
+    back the rest of the batch.
+
+    Returns:
+        List of the failed jobs along with their errors.
+    """
+    handler = HANDLERS[jobs[0].kind]
+    try:
+        with transaction.atomic():
+            handler([job.product_id for job in jobs])
+        return []
+    except Exception:  # pylint: disable=W0703
+        if len(jobs) == 1:
+            raise
+    failed = []
+    for job in jobs:
+        try:
+            with transaction.atomic():
+                handler([job.product_id])
+        except Exception as err:  # pylint: disable=W0703
+            failed.append((job, err))
+    return failed
+
+
+def _claim(batch_size: int) -> tuple[list[ProductJob], datetime]:
+    """
+    Claims a batch of due jobs by moving their `run_after` past a lease, in a short transaction. On databases
+    supporting it, the jobs are locked with `SKIP LOCKED` while they are claimed, so several workers can process the
+    queue concurrently.
+
+    Returns:
+        Tuple of the claimed jobs and the time they were claimed at.
+    """
+    with transaction.atomic():
+        claimed_at = timezone.now()
+        jobs = list(
+            ProductJob.objects.select_for_update(skip_locked=True)
+            .filter(run_after__lte=claimed_at, failed_at__isnull=True)
+            .order_by("run_after", "id")[:batch_size]
+        )
+        ProductJob.objects.filter(pk__in=[job.pk for job in jobs]).update(run_after=claimed_at + LEASE)
+    return jobs, claimed_at
+
+
+def process_jobs(batch_size: int = 500) -> tuple[int, int]:
+    """
+    Claims and runs a batch of due jobs. The jobs run outside of the claiming transaction, so no locks are held while
+    they do, and jobs claimed by a worker which dies before finishing them are run again once their lease expires.
+
+    Args:
+        batch_size: Maximum number of jobs to run.
+
+    Returns:
+        Tuple of the number of jobs which succeeded and which failed.
+    """
+    jobs, claimed_at = _claim(batch_size)
+    failed = []
+    for _, group in groupby(sorted(jobs, key=lambda job: job.kind), key=lambda job: job.kind):
+        group = list(group)
+        try:
+            failed += _run(group)
+        except Exception as err:  # pylint: disable=W0703
+            failed.append((group[0], err))
+
+    finished_at = timezone.now()
+    for job, err in failed:
+        job.attempts += 1
+        job.run_after = finished_at + min(timedelta(seconds=2**job.attempts), MAX_RETRY_DELAY)
+        job.last_error = repr(err)
+        if job.attempts >= MAX_ATTEMPTS:
+            job.failed_at = finished_at
+            logger.error(
+                "Product job %s for product %s failed %s times, giving up: %r",
+                job.get_kind_display(),
+                job.product_id,
+                job.attempts,
+                err,
+            )
+        else:
+            logger.error("Product job %s for product %s failed: %r", job.get_kind_display(), job.product_id, err)
+
+    failed_ids = {job.pk for job, _ in failed}
+    succeeded = [job.pk for job in jobs if job.pk not in failed_ids]
+    with transaction.atomic():
+        ProductJob.objects.bulk_update([job for job, _ in failed], ["attempts", "run_after", "last_error", "failed_at"])
+        # Jobs enqueued again after they were claimed may have run before the write that enqueued them, so are kept,
+        # and made due again rather than waiting for their lease to expire. Failed ones get their attempts reset as by
+        # `enqueue`, but still wait for the backoff of the failure.
+        ProductJob.objects.filter(pk__in=succeeded, enqueued_at__lte=claimed_at).delete()
+        ProductJob.objects.filter(pk__in=succeeded).update(run_after=finished_at)
+        ProductJob.objects.filter(pk__in=failed_ids, enqueued_at__gt=claimed_at).update(attempts=0, failed_at=None)
+    return len(succeeded), len(failed)
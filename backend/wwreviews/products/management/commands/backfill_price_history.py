@@ -0,0 +1,19 @@
+from django.core.management.base import BaseCommand
+from django.db import transaction
+
+from products.prices import backfill_price_history
+
+
+class Command(BaseCommand):
+    help = "Builds the price history of products without any from their creation and price update actions."
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            "--rebuild", action="store_true", help="Delete and rebuild the price history of all products."
+        )
+        parser.add_argument("--chunk-size", type=int, default=1000, help="Number of products to backfill per batch.")
+
+    def handle(self, *args, **options):
+        with transaction.atomic():
+            created = backfill_price_history(rebuild=options["rebuild"], chunk_size=options["chunk_size"])
+        self.stdout.write(self.style.SUCCESS(f"Created {created} price history entries."))
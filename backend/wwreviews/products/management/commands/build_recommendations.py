@@ -0,0 +1,21 @@
+import time
+
+from django.core.management.base import BaseCommand
+
+from products.recommendations import NEIGHBORS, build_neighbors
+
+
+class Command(BaseCommand):
+    help = "Rebuilds the most similar products of every product from all ratings, for the recommendation endpoints."
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            "--neighbors", type=int, default=NEIGHBORS, help="Maximum number of similar products stored per product."
+        )
+
+    def handle(self, *args, **options):
+        start = time.perf_counter()
+        count = build_neighbors(options["neighbors"])
+        self.stdout.write(
+            self.style.SUCCESS(f"Stored {count} product neighbor(s) in {time.perf_counter() - start:.2f}s.")
+        )
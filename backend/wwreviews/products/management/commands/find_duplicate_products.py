@@ -0,0 +1,30 @@
+from django.core.management.base import BaseCommand
+from django.db import transaction
+
+from products.duplicates import SIMILARITY_THRESHOLD, find_clusters, rebuild_index
+
+
+class Command(BaseCommand):
+    help = "Scans the catalog for clusters of duplicate products, by normalized link or similar names."
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            "--threshold",
+            type=float,
+            default=SIMILARITY_THRESHOLD,
+            help="Minimum trigram similarity of the names of duplicates.",
+        )
+        parser.add_argument(
+            "--rebuild-index", action="store_true", help="Also rebuild the duplicate detection index from scratch."
+        )
+
+    def handle(self, *args, **options):
+        if options["rebuild_index"]:
+            with transaction.atomic():
+                count = rebuild_index()
+            self.stdout.write(f"Indexed {count} product(s) and suggestion(s).")
+
+        clusters = find_clusters(options["threshold"])
+        for cluster in clusters:
+            self.stdout.write(", ".join(f"{product.pk} ({product.name}, {product.link})" for product in cluster))
+        self.stdout.write(self.style.SUCCESS(f"Found {len(clusters)} cluster(s) of duplicate products."))
@@ -0,0 +1,33 @@
+import time
+
+from django.core.management.base import BaseCommand
+
+from products.jobs import process_jobs
+
+
+class Command(BaseCommand):
+    help = (
+        "Runs the queued product jobs (review aggregate and search index updates) in batches, polling for new jobs "
+        "until interrupted."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument("--batch-size", type=int, default=500, help="Maximum number of jobs to run per batch.")
+        parser.add_argument("--interval", type=float, default=1.0, help="Seconds to wait when the queue is empty.")
+        parser.add_argument("--once", action="store_true", help="Exit once no due jobs are left.")
+
+    def handle(self, *args, **options):
+        total_done, total_failed = 0, 0
+        try:
+            while True:
+                done, failed = process_jobs(options["batch_size"])
+                total_done, total_failed = total_done + done, total_failed + failed
+                if failed:
+                    self.stderr.write(f"{failed} product job(s) failed, see the logs.")
+                if done + failed == 0:
+                    if options["once"]:
+                        break
+                    time.sleep(options["interval"])
+        except KeyboardInterrupt:
+            pass
+        self.stdout.write(self.style.SUCCESS(f"Ran {total_done} product job(s), {total_failed} failed."))
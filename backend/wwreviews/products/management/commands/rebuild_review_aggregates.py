@@ -0,0 +1,31 @@
+from django.core.management.base import BaseCommand, CommandError
+from django.db import transaction
+
+from products.aggregates import find_review_aggregate_drift, refresh_review_aggregates
+
+
+class Command(BaseCommand):
+    help = "Rebuilds the product review aggregates from the ratings and feedback, reporting any drift found."
+
+    def add_arguments(self, parser):
+        parser.add_argument("--check", action="store_true", help="Only report drift, exiting non-zero if any exists.")
+        parser.add_argument("--product", type=int, nargs="*", help="Restrict to these product ids.")
+
+    def handle(self, *args, **options):
+        product_ids = options["product"] or None
+        drift = find_review_aggregate_drift(product_ids)
+        for product_id, fields in drift.items():
+            details = ", ".join(f"{field}: {stored} != {expected}" for field, (stored, expected) in fields.items())
+            self.stdout.write(f"Product {product_id}: {details or 'missing aggregate'}")
+
+        if options["check"]:
+            if drift:
+                raise CommandError(f"Found drift in the review aggregates of {len(drift)} product(s).")
+            self.stdout.write(self.style.SUCCESS("Review aggregates are up to date."))
+            return
+
+        with transaction.atomic():
+            refreshed = refresh_review_aggregates(product_ids)
+        self.stdout.write(
+            self.style.SUCCESS(f"Rebuilt {len(refreshed)} review aggregate(s), {len(drift)} had drifted.")
+        )
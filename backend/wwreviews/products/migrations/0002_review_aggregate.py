@@ -0,0 +1,64 @@
+# Generated by Django 4.1.7 on 2026-10-18 10:16
+
+import django.db.models.deletion
+from django.db import migrations, models
+from django.db.models import Count
+
+
+def build_review_aggregates(apps, schema_editor):
+    Feedback = apps.get_model("products", "Feedback")
+    Product = apps.get_model("products", "Product")
+    Rating = apps.get_model("products", "Rating")
+    ReviewAggregate = apps.get_model("products", "ReviewAggregate")
+
+    aggregates = {
+        product_id: ReviewAggregate(product_id=product_id)
+        for product_id in Product.objects.values_list("id", flat=True)
+    }
+    for row in Rating.objects.values("product_id", "value").annotate(count=Count("id")):
+        aggregate = aggregates[row["product_id"]]
+        aggregate.rating_count += row["count"]
+        aggregate.rating_sum += row["value"] * row["count"]
+        field = f"rating_{row['value']}_count"
+        setattr(aggregate, field, getattr(aggregate, field) + row["count"])
+    for row in Feedback.objects.values("product_id").annotate(count=Count("id")):
+        aggregates[row["product_id"]].feedback_count = row["count"]
+    ReviewAggregate.objects.bulk_create(aggregates.values(), batch_size=500)
+
+
+class Migration(migrations.Migration):
+    dependencies = [
+        ("products", "0001_initial"),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name="ReviewAggregate",
+            fields=[
+                ("updated_at", models.DateTimeField(auto_now=True)),
+                (
+                    "product",
+                    models.OneToOneField(
+                        on_delete=django.db.models.deletion.CASCADE,
+                        primary_key=True,
+                        related_name="review_aggregate",
+                        serialize=False,
+                        to="products.product",
+                    ),
+                ),
+                ("rating_count", models.PositiveIntegerField(default=0)),
+                ("rating_sum", models.PositiveIntegerField(default=0)),
+                ("feedback_count", models.PositiveIntegerField(default=0)),
+                ("rating_0_count", models.PositiveIntegerField(default=0)),
+                ("rating_1_count", models.PositiveIntegerField(default=0)),
+                ("rating_2_count", models.PositiveIntegerField(default=0)),
+                ("rating_3_count", models.PositiveIntegerField(default=0)),
+                ("rating_4_count", models.PositiveIntegerField(default=0)),
+                ("rating_5_count", models.PositiveIntegerField(default=0)),
+            ],
+            options={
+                "abstract": False,
+            },
+        ),
+        migrations.RunPython(build_review_aggregates, migrations.RunPython.noop),
+    ]
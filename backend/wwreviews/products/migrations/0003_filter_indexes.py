@@ -0,0 +1,55 @@
+# Generated by Django 4.1.7 on 2026-10-18 10:18
+
+from django.db import migrations, models
+
+# `name__startswith` compiles to a case-insensitive `LIKE 'x%'` on SQLite and a `LIKE 'x%'` on PostgreSQL, neither of
+# which can use a plain B-tree index, so the prefix index is created with the operator support each backend needs.
+PREFIX_INDEX_SQL = {
+    "sqlite": "CREATE INDEX product_name_prefix_idx ON products_product (name COLLATE NOCASE)",
+    "postgresql": "CREATE INDEX product_name_prefix_idx ON products_product (name text_pattern_ops)",
+}
+
+
+def create_name_prefix_index(apps, schema_editor):
+    sql = PREFIX_INDEX_SQL.get(schema_editor.connection.vendor)
+    if sql is not None:
+        schema_editor.execute(sql)
+
+
+def drop_name_prefix_index(apps, schema_editor):
+    if schema_editor.connection.vendor in PREFIX_INDEX_SQL:
+        schema_editor.execute("DROP INDEX IF EXISTS product_name_prefix_idx")
+
+
+class Migration(migrations.Migration):
+    dependencies = [
+        ("products", "0002_review_aggregate"),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name="product",
+            index=models.Index(fields=["name"], name="product_name_idx"),
+        ),
+        migrations.AddIndex(
+            model_name="product",
+            index=models.Index(fields=["price"], name="product_price_idx"),
+        ),
+        migrations.AddIndex(
+            model_name="product",
+            index=models.Index(fields=["link"], name="product_link_idx"),
+        ),
+        migrations.AddIndex(
+            model_name="productaction",
+            index=models.Index(fields=["product", "created_at"], name="productaction_history_idx"),
+        ),
+        migrations.AddIndex(
+            model_name="productaction",
+            index=models.Index(fields=["product", "action"], name="productaction_action_idx"),
+        ),
+        migrations.AddIndex(
+            model_name="rating",
+            index=models.Index(fields=["product", "value"], name="rating_product_value_idx"),
+        ),
+        migrations.RunPython(create_name_prefix_index, drop_name_prefix_index),
+    ]
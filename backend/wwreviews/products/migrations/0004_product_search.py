@@ -0,0 +1,49 @@
+from django.db import migrations
+
+SEARCH_SQL = {
+    "sqlite": [
+        "CREATE VIRTUAL TABLE products_search USING fts5(name, category, feedback, tokenize='porter unicode61')",
+        "INSERT INTO products_search (rowid, name, category, feedback) "
+        "SELECT p.id, p.name, COALESCE(c.name, ''), COALESCE(GROUP_CONCAT(f.text, char(10)), '') "
+        "FROM products_product p "
+        "LEFT JOIN products_category c ON c.id = p.category_id "
+        "LEFT JOIN products_feedback f ON f.product_id = p.id "
+        "GROUP BY p.id",
+    ],
+    "postgresql": [
+        "CREATE TABLE products_search ("
+        "product_id bigint PRIMARY KEY "
+        "REFERENCES products_product (id) ON DELETE CASCADE DEFERRABLE INITIALLY DEFERRED, "
+        "document tsvector NOT NULL)",
+        "CREATE INDEX products_search_document_idx ON products_search USING GIN (document)",
+        "INSERT INTO products_search (product_id, document) "
+        "SELECT p.id, "
+        "setweight(to_tsvector('english', p.name), 'A') || "
+        "setweight(to_tsvector('english', COALESCE(c.name, '')), 'B') || "
+        "setweight(to_tsvector('english', COALESCE(STRING_AGG(f.text, E'\\n'), '')), 'C') "
+        "FROM products_product p "
+        "LEFT JOIN products_category c ON c.id = p.category_id "
+        "LEFT JOIN products_feedback f ON f.product_id = p.id "
+        "GROUP BY p.id, c.name",
+    ],
+}
+
+
+def create_search_index(apps, schema_editor):
+    for sql in SEARCH_SQL.get(schema_editor.connection.vendor, []):
+        schema_editor.execute(sql)
+
+
+def drop_search_index(apps, schema_editor):
+    if schema_editor.connection.vendor in SEARCH_SQL:
+        schema_editor.execute("DROP TABLE IF EXISTS products_search")
+
+
+class Migration(migrations.Migration):
+    dependencies = [
+        ("products", "0003_filter_indexes"),
+    ]
+
+    operations = [
+        migrations.RunPython(create_search_index, drop_search_index),
+    ]
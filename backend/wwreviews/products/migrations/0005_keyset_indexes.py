@@ -0,0 +1,28 @@
+# Generated by Django 4.1.7 on 2026-10-18 10:21
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+    dependencies = [
+        ("products", "0004_product_search"),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name="feedback",
+            index=models.Index(fields=["created_at", "id"], name="feedback_keyset_idx"),
+        ),
+        migrations.AddIndex(
+            model_name="product",
+            index=models.Index(fields=["created_at", "id"], name="product_keyset_idx"),
+        ),
+        migrations.AddIndex(
+            model_name="productaction",
+            index=models.Index(fields=["created_at", "id"], name="productaction_keyset_idx"),
+        ),
+        migrations.AddIndex(
+            model_name="rating",
+            index=models.Index(fields=["created_at", "id"], name="rating_keyset_idx"),
+        ),
+    ]
@@ -0,0 +1,39 @@
+# Generated by Django 4.1.7 on 2026-10-18 10:23
+
+from django.db import migrations, models
+
+
+def build_category_paths(apps, schema_editor):
+    Category = apps.get_model("products", "Category")
+    categories = {category.pk: category for category in Category.objects.all()}
+
+    def build_path(category) -> str:
+        if not category.path:
+            parent_path = build_path(categories[category.parent_id]) if category.parent_id else "/"
+            category.path = f"{parent_path}{category.pk}/"
+            category.depth = category.path.count("/") - 2
+        return category.path
+
+    for category in categories.values():
+        build_path(category)
+    Category.objects.bulk_update(categories.values(), ["path", "depth"], batch_size=500)
+
+
+class Migration(migrations.Migration):
+    dependencies = [
+        ("products", "0005_keyset_indexes"),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name="category",
+            name="depth",
+            field=models.PositiveSmallIntegerField(default=0, editable=False),
+        ),
+        migrations.AddField(
+            model_name="category",
+            name="path",
+            field=models.TextField(db_index=True, default="", editable=False),
+        ),
+        migrations.RunPython(build_category_paths, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,88 @@
+# Generated by Django 4.1.7 on 2026-10-18 10:36
+
+import math
+from datetime import datetime, timedelta, timezone
+
+from django.db import migrations, models
+
+# Frozen copies of the `products.ranking` defaults and formulas when this migration was written, so later changes to
+# them do not change what it computes. `rebuild_review_aggregates` recomputes the scores with the current ones.
+MAX_RATING = 5
+PRIOR_MEAN = MAX_RATING / 2
+PRIOR_WEIGHT = 5
+WILSON_Z = 1.96
+TRENDING_HALF_LIFE = timedelta(days=7)
+TRENDING_EPOCH = datetime(2023, 1, 1, tzinfo=timezone.utc)
+
+
+def bayesian_score(count, total):
+    if not count:
+        return 0.0
+    return (PRIOR_WEIGHT * PRIOR_MEAN + total) / (PRIOR_WEIGHT + count)
+
+
+def wilson_score(count, total):
+    if not count:
+        return 0.0
+    share = total / (MAX_RATING * count)
+    z_squared = WILSON_Z**2
+    spread = WILSON_Z * math.sqrt(share * (1 - share) / count + z_squared / (4 * count**2))
+    return (share + z_squared / (2 * count) - spread) / (1 + z_squared / count)
+
+
+def trending_weight(value, created_at):
+    return value / MAX_RATING * 2 ** ((created_at - TRENDING_EPOCH) / TRENDING_HALF_LIFE)
+
+
+def compute_ranking_scores(apps, schema_editor):
+    Rating = apps.get_model("products", "Rating")
+    ReviewAggregate = apps.get_model("products", "ReviewAggregate")
+
+    aggregates = {aggregate.product_id: aggregate for aggregate in ReviewAggregate.objects.all()}
+    ratings = Rating.objects.values_list("product_id", "value", "created_at").iterator(chunk_size=10_000)
+    for product_id, value, created_at in ratings:
+        if product_id in aggregates:
+            aggregates[product_id].trending_score += trending_weight(value, created_at)
+    for aggregate in aggregates.values():
+        aggregate.bayesian_score = bayesian_score(aggregate.rating_count, aggregate.rating_sum)
+        aggregate.wilson_score = wilson_score(aggregate.rating_count, aggregate.rating_sum)
+    ReviewAggregate.objects.bulk_update(
+        aggregates.values(), ["bayesian_score", "wilson_score", "trending_score"], batch_size=500
+    )
+
+
+class Migration(migrations.Migration):
+    dependencies = [
+        ("products", "0006_category_path"),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name="reviewaggregate",
+            name="bayesian_score",
+            field=models.FloatField(default=0),
+        ),
+        migrations.AddField(
+            model_name="reviewaggregate",
+            name="trending_score",
+            field=models.FloatField(default=0),
+        ),
+        migrations.AddField(
+            model_name="reviewaggregate",
+            name="wilson_score",
+            field=models.FloatField(default=0),
+        ),
+        migrations.AddIndex(
+            model_name="reviewaggregate",
+            index=models.Index(fields=["bayesian_score", "product"], name="aggregate_bayesian_idx"),
+        ),
+        migrations.AddIndex(
+            model_name="reviewaggregate",
+            index=models.Index(fields=["wilson_score", "product"], name="aggregate_wilson_idx"),
+        ),
+        migrations.AddIndex(
+            model_name="reviewaggregate",
+            index=models.Index(fields=["trending_score", "product"], name="aggregate_trending_idx"),
+        ),
+        migrations.RunPython(compute_ranking_scores, migrations.RunPython.noop),
+    ]
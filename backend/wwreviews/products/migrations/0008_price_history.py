@@ -0,0 +1,45 @@
+# Generated by Django 4.1.7 on 2026-10-18 10:38
+
+from django.db import migrations, models
+import django.db.models.deletion
+import django.utils.timezone
+
+
+class Migration(migrations.Migration):
+    dependencies = [
+        ("products", "0007_ranking_scores"),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name="PriceHistory",
+            fields=[
+                (
+                    "id",
+                    models.BigAutoField(
+                        auto_created=True,
+                        primary_key=True,
+                        serialize=False,
+                        verbose_name="ID",
+                    ),
+                ),
+                ("price", models.FloatField()),
+                ("created_at", models.DateTimeField(default=django.utils.timezone.now)),
+                (
+                    "product",
+                    models.ForeignKey(
+                        on_delete=django.db.models.deletion.CASCADE,
+                        related_name="price_history",
+                        to="products.product",
+                    ),
+                ),
+            ],
+            options={
+                "verbose_name_plural": "price history",
+            },
+        ),
+        migrations.AddIndex(
+            model_name="pricehistory",
+            index=models.Index(fields=["product", "created_at"], name="pricehistory_product_idx"),
+        ),
+    ]
@@ -0,0 +1,47 @@
+# Generated by Django 4.1.7 on 2026-10-18 10:53
+
+from django.db import migrations, models
+import django.utils.timezone
+
+
+class Migration(migrations.Migration):
+    dependencies = [
+        ("products", "0008_price_history"),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name="ProductJob",
+            fields=[
+                (
+                    "id",
+                    models.BigAutoField(
+                        auto_created=True,
+                        primary_key=True,
+                        serialize=False,
+                        verbose_name="ID",
+                    ),
+                ),
+                (
+                    "kind",
+                    models.SmallIntegerField(choices=[(1, "Review Aggregate"), (2, "Search Index")]),
+                ),
+                ("product_id", models.BigIntegerField()),
+                (
+                    "enqueued_at",
+                    models.DateTimeField(default=django.utils.timezone.now),
+                ),
+                ("run_after", models.DateTimeField(default=django.utils.timezone.now)),
+                ("attempts", models.PositiveSmallIntegerField(default=0)),
+                ("last_error", models.TextField(blank=True, default="")),
+            ],
+        ),
+        migrations.AddIndex(
+            model_name="productjob",
+            index=models.Index(fields=["run_after", "id"], name="productjob_run_after_idx"),
+        ),
+        migrations.AddConstraint(
+            model_name="productjob",
+            constraint=models.UniqueConstraint(fields=("kind", "product_id"), name="productjob_unique"),
+        ),
+    ]
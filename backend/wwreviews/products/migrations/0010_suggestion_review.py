@@ -0,0 +1,33 @@
+# Generated by Django 4.1.7 on 2026-10-18 10:56
+
+from django.db import migrations, models
+import django.db.models.deletion
+
+
+class Migration(migrations.Migration):
+    dependencies = [
+        ("products", "0009_product_jobs"),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name="suggestedproduct",
+            name="product",
+            field=models.ForeignKey(
+                blank=True,
+                null=True,
+                on_delete=django.db.models.deletion.SET_NULL,
+                related_name="+",
+                to="products.product",
+            ),
+        ),
+        migrations.AddField(
+            model_name="suggestedproduct",
+            name="status",
+            field=models.SmallIntegerField(choices=[(1, "Pending"), (2, "Approved"), (3, "Rejected")], default=1),
+        ),
+        migrations.AddIndex(
+            model_name="suggestedproduct",
+            index=models.Index(fields=["status", "created_at"], name="suggestedproduct_status_idx"),
+        ),
+    ]
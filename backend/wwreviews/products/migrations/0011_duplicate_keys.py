@@ -0,0 +1,124 @@
+# Generated by Django 4.1.7 on 2026-10-18 10:59
+
+import hashlib
+import random
+from urllib.parse import parse_qsl, urlencode, urlsplit
+
+from django.db import migrations, models
+import django.db.models.deletion
+
+# Frozen copy of the `products.duplicates` keys when this migration was written, so later changes to them do not
+# change what it computes. `find_duplicate_products --rebuild-index` reindexes everything with the current keys.
+SHINGLE_SIZE = 3
+BANDS = 10
+BAND_ROWS = 3
+TRACKING_PARAMS = {"fbclid", "gclid", "msclkid", "mc_cid", "mc_eid", "igshid", "ref", "ref_", "_ga", "psc", "spm"}
+TRACKING_PREFIXES = ("utm_", "pd_rd_", "pf_rd_")
+PRIME = (1 << 61) - 1
+_rng = random.Random(0)
+PERMUTATIONS = [(_rng.randrange(1, PRIME), _rng.randrange(0, PRIME)) for _ in range(BANDS * BAND_ROWS)]
+CHUNK_SIZE = 1000
+
+
+def normalize_link(link):
+    parts = urlsplit(link.strip())
+    host = (parts.hostname or "").removeprefix("www.")
+    if parts.port and parts.port not in (80, 443):
+        host = f"{host}:{parts.port}"
+    params = sorted(
+        (name, value)
+        for name, value in parse_qsl(parts.query, keep_blank_values=True)
+        if name.lower() not in TRACKING_PARAMS and not name.lower().startswith(TRACKING_PREFIXES)
+    )
+    query = f"?{urlencode(params)}" if params else ""
+    return f"{host}{parts.path.rstrip('/')}{query}"
+
+
+def shingles(name):
+    name = " ".join(name.casefold().split())
+    if len(name) <= SHINGLE_SIZE:
+        return {name}
+    return {name[i : i + SHINGLE_SIZE] for i in range(len(name) - SHINGLE_SIZE + 1)}
+
+
+def hash_key(value):
+    return int.from_bytes(hashlib.blake2b(value.encode(), digest_size=8).digest(), "big", signed=True)
+
+
+def duplicate_keys(name, link):
+    hashes = [hash_key(shingle) & PRIME for shingle in shingles(name)]
+    signature = [min((a * value + b) % PRIME for value in hashes) for a, b in PERMUTATIONS]
+    bands = (signature[band * BAND_ROWS : (band + 1) * BAND_ROWS] for band in range(BANDS))
+    return [
+        hash_key(f"link:{normalize_link(link)}"),
+        *(hash_key(f"band:{band}:{','.join(map(str, values))}") for band, values in enumerate(bands)),
+    ]
+
+
+def build_duplicate_keys(apps, schema_editor):
+    DuplicateKey = apps.get_model("products", "DuplicateKey")
+    Product = apps.get_model("products", "Product")
+    SuggestedProduct = apps.get_model("products", "SuggestedProduct")
+
+    # Only the pending suggestions are still checked against.
+    querysets = (
+        ("product_id", Product.objects.all()),
+        ("suggestion_id", SuggestedProduct.objects.filter(status=1)),
+    )
+    for field, queryset in querysets:
+        keys = []
+        for pk, name, link in queryset.order_by("id").values_list("id", "name", "link").iterator(CHUNK_SIZE):
+            keys += [DuplicateKey(key=key, **{field: pk}) for key in duplicate_keys(name, link)]
+            if len(keys) >= CHUNK_SIZE:
+                DuplicateKey.objects.bulk_create(keys)
+                keys = []
+        DuplicateKey.objects.bulk_create(keys)
+
+
+class Migration(migrations.Migration):
+    dependencies = [
+        ("products", "0010_suggestion_review"),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name="DuplicateKey",
+            fields=[
+                (
+                    "id",
+                    models.BigAutoField(
+                        auto_created=True,
+                        primary_key=True,
+                        serialize=False,
+                        verbose_name="ID",
+                    ),
+                ),
+                ("key", models.BigIntegerField()),
+                (
+                    "product",
+                    models.ForeignKey(
+                        blank=True,
+                        null=True,
+                        on_delete=django.db.models.deletion.CASCADE,
+                        related_name="+",
+                        to="products.product",
+                    ),
+                ),
+                (
+                    "suggestion",
+                    models.ForeignKey(
+                        blank=True,
+                        null=True,
+                        on_delete=django.db.models.deletion.CASCADE,
+                        related_name="+",
+                        to="products.suggestedproduct",
+                    ),
+                ),
+            ],
+        ),
+        migrations.AddIndex(
+            model_name="duplicatekey",
+            index=models.Index(fields=["key"], name="duplicatekey_key_idx"),
+        ),
+        migrations.RunPython(build_duplicate_keys, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,48 @@
+# Generated by Django 4.1.7 on 2026-10-18 11:03
+
+from django.db import migrations, models
+import django.db.models.deletion
+
+
+class Migration(migrations.Migration):
+    dependencies = [
+        ("products", "0011_duplicate_keys"),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name="ProductNeighbor",
+            fields=[
+                (
+                    "id",
+                    models.BigAutoField(
+                        auto_created=True,
+                        primary_key=True,
+                        serialize=False,
+                        verbose_name="ID",
+                    ),
+                ),
+                ("score", models.FloatField()),
+                (
+                    "neighbor",
+                    models.ForeignKey(
+                        on_delete=django.db.models.deletion.CASCADE,
+                        related_name="neighbor_of",
+                        to="products.product",
+                    ),
+                ),
+                (
+                    "product",
+                    models.ForeignKey(
+                        on_delete=django.db.models.deletion.CASCADE,
+                        related_name="neighbors",
+                        to="products.product",
+                    ),
+                ),
+            ],
+        ),
+        migrations.AddConstraint(
+            model_name="productneighbor",
+            constraint=models.UniqueConstraint(fields=("product", "neighbor"), name="productneighbor_unique"),
+        ),
+    ]
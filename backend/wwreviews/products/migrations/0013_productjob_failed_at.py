@@ -0,0 +1,17 @@
+# Generated by Django 4.1.7 on 2026-10-18 11:14
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+    dependencies = [
+        ("products", "0012_product_neighbors"),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name="productjob",
+            name="failed_at",
+            field=models.DateTimeField(blank=True, null=True),
+        ),
+    ]
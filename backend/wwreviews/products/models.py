@@ -1,17 +1,75 @@
 from django.contrib.auth.models import User
 from django.core.exceptions import ValidationError
-from django.db import models
+from django.db import models, transaction
+from django.db.models import F, Value
+from django.db.models.functions import Concat, Substr
+from django.utils import timezone
 
-from wwreviews.utils import TrackedMixin
+from wwreviews.utils import LoadedValuesMixin, TrackedMixin, UpdatedAtMixin
 
 
 class Category(models.Model):
+    """
+    A node of the category tree. Besides the `parent` link, each category stores its materialized `path` of ancestor
+    ids (e.g. `/1/4/9/` for category 9 under 4 under 1), so a whole subtree can be selected with a single prefix match
+    on `path`.
+    """
+
+    PATH_SEPARATOR = "/"
+
     name = models.TextField(unique=True)
     parent = models.ForeignKey("Category", on_delete=models.CASCADE, null=True, blank=True)
+    path = models.TextField(editable=False, db_index=True, default="")
+    depth = models.PositiveSmallIntegerField(editable=False, default=0)
 
     def get_children(self) -> list["Category"]:
         return list(Category.objects.filter(parent=self))
 
+    def get_descendants(self, include_self: bool = False) -> models.QuerySet["Category"]:
+        queryset = Category.objects.filter(**Category.subtree_lookup(self.path))
+        return queryset if include_self else queryset.exclude(pk=self.pk)
+
+    @classmethod
+    def subtree_lookup(cls, path: str, prefix: str = "") -> dict[str, str]:
+        """
+        Gets the filter kwargs selecting every category whose path starts with the given path. This is a `LIKE` prefix
+        match, since a range would depend on the collation of `path` sorting the separator directly before the digits.
+        On PostgreSQL it uses the `text_pattern_ops` index Django creates along with the index of `path`.
+
+        Args:
+            path: Path of the root of the subtree.
+            prefix: Lookup prefix to reach the category from the filtered model, e.g. `category__`.
+        """
+        return {f"{prefix}path__startswith": path}
+
+    def clean(self):
+        own_segment = f"{self.PATH_SEPARATOR}{self.pk}{self.PATH_SEPARATOR}"
+        if self.pk is not None and self.parent is not None and own_segment in self.parent.path:
+            raise ValidationError({"parent": "A category cannot be nested under itself or one of its descendants."})
+
+    def save(self, *args, **kwargs):
+        # Atomic so the subtree move and the post-commit tree cache invalidation see the category as one write.
+        with transaction.atomic(using=kwargs.get("using")):
+            old_path = self.path
+            created = self.pk is None
+            if created:
+                super().save(*args, **kwargs)
+            self.clean()
+            parent_path = self.parent.path if self.parent is not None else self.PATH_SEPARATOR
+            self.path = f"{parent_path}{self.pk}{self.PATH_SEPARATOR}"
+            self.depth = self.path.count(self.PATH_SEPARATOR) - 2
+            if created:
+                # The path includes the category's own id, which is only known after the insert.
+                Category.objects.filter(pk=self.pk).update(path=self.path, depth=self.depth)
+                return
+            super().save(*args, **kwargs)
+            if old_path and old_path != self.path:
+                # Move the whole subtree by rewriting the path prefix of every descendant in one statement.
+                Category.objects.filter(**Category.subtree_lookup(old_path)).exclude(pk=self.pk).update(
+                    path=Concat(Value(self.path), Substr("path", len(old_path) + 1)),
+                    depth=F("depth") + (self.depth - (old_path.count(self.PATH_SEPARATOR) - 2)),
+                )
+
 
 class AbstractProduct(TrackedMixin, models.Model):
     name = models.TextField()
@@ -24,13 +82,48 @@ class AbstractProduct(TrackedMixin, models.Model):
 
 
 class SuggestedProduct(AbstractProduct):
+    class Status(models.IntegerChoices):
+        PENDING = 1
+        APPROVED = 2
+        REJECTED = 3
+
     user = models.ForeignKey(User, on_delete=models.CASCADE)
     category = models.TextField(null=True, blank=True)
+    status = models.SmallIntegerField(choices=Status.choices, default=Status.PENDING)
+    # The product an approved suggestion was created as, or matched to.
+    product = models.ForeignKey("Product", on_delete=models.SET_NULL, null=True, blank=True, related_name="+")
+
+    class Meta:
+        indexes = [models.Index(fields=["status", "created_at"], name="suggestedproduct_status_idx")]
 
 
-class Product(AbstractProduct):
+class Product(LoadedValuesMixin, AbstractProduct):
     category = models.ForeignKey(Category, on_delete=models.PROTECT)
 
+    class Meta:
+        # Indexes backing the lookups exposed by `ProductFilter`.
+        indexes = [
+            models.Index(fields=["name"], name="product_name_idx"),
+            models.Index(fields=["price"], name="product_price_idx"),
+            models.Index(fields=["link"], name="product_link_idx"),
+            models.Index(fields=["created_at", "id"], name="product_keyset_idx"),
+        ]
+
+
+class DuplicateKey(models.Model):
+    """
+    A key under which a product or suggestion is found by the duplicate detection index, see `products.duplicates`:
+    the hash of its normalized link, or of one band of the MinHash signature of its name. Exactly one of `product` and
+    `suggestion` is set.
+    """
+
+    key = models.BigIntegerField()
+    product = models.ForeignKey("Product", on_delete=models.CASCADE, null=True, blank=True, related_name="+")
+    suggestion = models.ForeignKey(SuggestedProduct, on_delete=models.CASCADE, null=True, blank=True, related_name="+")
+
+    class Meta:
+        indexes = [models.Index(fields=["key"], name="duplicatekey_key_idx")]
+
 
 class ProductAction(TrackedMixin, models.Model):
     class Action(models.IntegerChoices):
@@ -44,6 +137,62 @@ class ProductAction(TrackedMixin, models.Model):
     action = models.SmallIntegerField(choices=Action.choices)
     details = models.JSONField(blank=True, default=dict)
 
+    # Maps each audited product field to the action recorded when it changes.
+    TRACKED_FIELDS = {
+        "name": Action.NAME_UPDATED,
+        "price": Action.PRICE_UPDATED,
+        "link": Action.LINK_UPDATED,
+        "image_url": Action.IMAGE_UPDATED,
+        "category_id": Action.CATEGORY_UDPATED,
+    }
+
+    @classmethod
+    def snapshot(cls, product: Product) -> dict:
+        """
+        Gets the current values of the audited fields of a product.
+        """
+        return {field: getattr(product, field) for field in cls.TRACKED_FIELDS}
+
+    @classmethod
+    def for_changes(cls, product: Product, previous: dict) -> list["ProductAction"]:
+        """
+        Builds (without saving) the actions recording every audited field that changed since the given snapshot.
+
+        Args:
+            product: The product in its updated state.
+            previous: Snapshot of the product's audited fields before the update, see `ProductAction.snapshot`.
+        """
+        return [
+            cls(product=product, action=action, details={"prev": previous[field], "curr": getattr(product, field)})
+            for field, action in cls.TRACKED_FIELDS.items()
+            if previous[field] != getattr(product, field)
+        ]
+
+    class Meta:
+        indexes = [
+            models.Index(fields=["product", "created_at"], name="productaction_history_idx"),
+            models.Index(fields=["product", "action"], name="productaction_action_idx"),
+            models.Index(fields=["created_at", "id"], name="productaction_keyset_idx"),
+        ]
+
+
+class PriceHistory(models.Model):
+    """
+    A product's price from `created_at` until the product's next price history entry. Unlike the `PRICE_UPDATED`
+    product actions, prices are stored in typed columns, and the product's initial price is recorded too.
+    """
+
+    product = models.ForeignKey(Product, on_delete=models.CASCADE, related_name="price_history")
+    price = models.FloatField()
+    created_at = models.DateTimeField(default=timezone.now)
+
+    class Meta:
+        verbose_name_plural = "price history"
+        indexes = [models.Index(fields=["product", "created_at"], name="pricehistory_product_idx")]
+
+
+RATING_VALUES = range(0, 6)
+
 
 def validate_rating(rating: int):
     """
@@ -52,23 +201,115 @@ def validate_rating(rating: int):
     Args:
          rating: Rating value from Rating model.
     """
-    if not 0 <= rating <= 5:
+    if rating not in RATING_VALUES:
         raise ValidationError(f"Rating must be an integer between 0 and 5, got {rating}.")
 
 
-class Rating(TrackedMixin, models.Model):
+class Rating(LoadedValuesMixin, TrackedMixin, models.Model):
     product = models.ForeignKey(Product, on_delete=models.CASCADE)
     user = models.ForeignKey(User, on_delete=models.SET_NULL, null=True)
     value = models.SmallIntegerField(validators=[validate_rating])
 
     class Meta:
         unique_together = ("product", "user")
+        indexes = [
+            models.Index(fields=["product", "value"], name="rating_product_value_idx"),
+            models.Index(fields=["created_at", "id"], name="rating_keyset_idx"),
+        ]
 
 
-class Feedback(TrackedMixin, models.Model):
+class Feedback(LoadedValuesMixin, TrackedMixin, models.Model):
     product = models.ForeignKey(Product, on_delete=models.CASCADE)
     user = models.ForeignKey(User, on_delete=models.SET_NULL, null=True)
     text = models.TextField()
 
     class Meta:
         unique_together = ("product", "user")
+        indexes = [models.Index(fields=["created_at", "id"], name="feedback_keyset_idx")]
+
+
+class ReviewAggregate(UpdatedAtMixin, models.Model):
+    """
+    Denormalized review statistics for a single product, kept current by the handlers in `products.signals` and
+    rebuilt from scratch by the `rebuild_review_aggregates` management command.
+    """
+
+    product = models.OneToOneField(Product, on_delete=models.CASCADE, primary_key=True, related_name="review_aggregate")
+    rating_count = models.PositiveIntegerField(default=0)
+    rating_sum = models.PositiveIntegerField(default=0)
+    feedback_count = models.PositiveIntegerField(default=0)
+    rating_0_count = models.PositiveIntegerField(default=0)
+    rating_1_count = models.PositiveIntegerField(default=0)
+    rating_2_count = models.PositiveIntegerField(default=0)
+    rating_3_count = models.PositiveIntegerField(default=0)
+    rating_4_count = models.PositiveIntegerField(default=0)
+    rating_5_count = models.PositiveIntegerField(default=0)
+    # Ranking scores, see `products.ranking`.
+    bayesian_score = models.FloatField(default=0)
+    wilson_score = models.FloatField(default=0)
+    trending_score = models.FloatField(default=0)
+
+    class Meta:
+        # Indexes backing the ranking endpoint, which reads the top of one of them.
+        indexes = [
+            models.Index(fields=["bayesian_score", "product"], name="aggregate_bayesian_idx"),
+            models.Index(fields=["wilson_score", "product"], name="aggregate_wilson_idx"),
+            models.Index(fields=["trending_score", "product"], name="aggregate_trending_idx"),
+        ]
+
+    @staticmethod
+    def histogram_field(value: int) -> str:
+        """
+        Gets the name of the histogram column counting ratings of the given value.
+        """
+        return f"rating_{value}_count"
+
+    @property
+    def average_rating(self) -> float | None:
+        return self.rating_sum / self.rating_count if self.rating_count else None
+
+    @property
+    def rating_histogram(self) -> dict[int, int]:
+        return {value: getattr(self, self.histogram_field(value)) for value in RATING_VALUES}
+
+
+class ProductJob(models.Model):
+    """
+    A pending side effect of review writes to a product, enqueued instead of run inline when `DEFER_REVIEW_SIDE_EFFECTS`
+    is on and run by the `process_product_jobs` worker, see `products.jobs`. There is at most one pending job of each
+    kind per product, so repeated writes to a product before the worker gets to it are coalesced into a single run.
+    Jobs which failed `products.jobs.MAX_ATTEMPTS` times are dead-lettered: they are kept with their `failed_at` set but
+    no longer run, until the product is written to again.
+    """
+
+    class Kind(models.IntegerChoices):
+        REVIEW_AGGREGATE = 1
+        SEARCH_INDEX = 2
+
+    kind = models.SmallIntegerField(choices=Kind.choices)
+    # Not a foreign key, so the jobs of a deleted product still run and clean up after it.
+    product_id = models.BigIntegerField()
+    enqueued_at = models.DateTimeField(default=timezone.now)
+    run_after = models.DateTimeField(default=timezone.now)
+    attempts = models.PositiveSmallIntegerField(default=0)
+    last_error = models.TextField(blank=True, default="")
+    failed_at = models.DateTimeField(null=True, blank=True)
+
+    class Meta:
+        constraints = [models.UniqueConstraint(fields=["kind", "product_id"], name="productjob_unique")]
+        indexes = [models.Index(fields=["run_after", "id"], name="productjob_run_after_idx")]
+
+
+class ProductNeighbor(models.Model):
+    """
+    One of the products most similar to a product, by the ratings of the users who rated both, see
+    `products.recommendations`. Rebuilt from scratch by the `build_recommendations` command.
+    """
+
+    product = models.ForeignKey(Product, on_delete=models.CASCADE, related_name="neighbors")
+    neighbor = models.ForeignKey(Product, on_delete=models.CASCADE, related_name="neighbor_of")
+    score = models.FloatField()
+
+    class Meta:
+        # Also the index both recommendation reads join the neighbors of products through.
+        constraints = [models.UniqueConstraint(fields=["product", "neighbor"], name="productneighbor_unique")]
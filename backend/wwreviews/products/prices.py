@@ -0,0 +1,127 @@
+"""
+Recording, backfilling and downsampling of product price history.
+"""
+from collections.abc import Iterable, Iterator
+from datetime import datetime
+from itertools import groupby, islice
+
+from products.models import PriceHistory, Product, ProductAction
+
+
+def price_changes(products: Iterable[Product], actions: Iterable[ProductAction]) -> list[PriceHistory]:
+    """
+    Builds (without saving) the price history entries for the `PRICE_UPDATED` actions among the given actions.
+
+    Args:
+        products: The updated products the actions were recorded for.
+        actions: Unsaved actions recorded for the update, see `ProductAction.for_changes`.
+    """
+    products = {product.pk: product for product in products}
+    return [
+        PriceHistory(
+            product_id=action.product_id,
+            price=action.details["curr"],
+            created_at=products[action.product_id].updated_at,
+        )
+        for action in actions
+        if action.action == ProductAction.Action.PRICE_UPDATED
+    ]
+
+
+def initial_prices(products: Iterable[Product]) -> list[PriceHistory]:
+    """
+    Builds (without saving) the price history entries of newly created products.
+    """
+    return [PriceHistory(product=product, price=product.price, created_at=product.created_at) for product in products]
+
+
+def _backfill_chunk(products: list[Product]) -> list[PriceHistory]:
+    actions = (
+        ProductAction.objects.filter(product__in=products, action=ProductAction.Action.PRICE_UPDATED)
+        .order_by("product_id", "created_at", "id")
+        .values_list("product_id", "created_at", "details")
+    )
+    changes = {product_id: list(rows) for product_id, rows in groupby(actions, key=lambda row: row[0])}
+    entries = []
+    for product in products:
+        rows = changes.get(product.pk, [])
+        # Before its first price change, a product had the price that change started from.
+        first_price = rows[0][2]["prev"] if rows else product.price
+        entries.append(PriceHistory(product=product, price=first_price, created_at=product.created_at))
+        entries += [PriceHistory(product=product, price=details["curr"], created_at=at) for _, at, details in rows]
+    return entries
+
+
+def backfill_price_history(rebuild: bool = False, chunk_size: int = 1000) -> int:
+    """
+    Builds the price history of products without any from their creation and `PRICE_UPDATED` actions.
+
+    Args:
+        rebuild: If true, the existing price history is deleted and rebuilt for all products.
+        chunk_size: Number of products whose history is built per batch of queries.
+
+    Returns:
+        Number of price history entries created.
+    """
+    if rebuild:
+        PriceHistory.objects.all().delete()
+    products = Product.objects.filter(price_history__isnull=True).order_by("id").iterator(chunk_size)
+    created = 0
+    while chunk := list(islice(products, chunk_size)):
+        created += len(PriceHistory.objects.bulk_create(_backfill_chunk(chunk), batch_size=chunk_size))
+    return created
+
+
+def downsample(
+    points: Iterable[tuple[datetime, float]],
+    start: datetime,
+    end: datetime,
+    buckets: int,
+    previous: float | None = None,
+) -> Iterator[dict]:
+    """
+    Downsamples a price series into equally long time buckets. Prices are a step function, so each bucket also covers
+    the price carried over from the previous bucket, and buckets without any price change repeat that price.
+
+    Args:
+        points: `(created_at, price)` tuples ordered by time, all within `[start, end]`.
+        start: Start of the first bucket.
+        end: End of the last bucket.
+        buckets: Number of buckets to split the time range into.
+        previous: Price in effect at `start`, None if there was none yet.
+
+    Returns:
+        Iterator of dictionaries with the `start` of each bucket and the `min`, `max` and `last` price in effect within
+        it, from the first bucket with a price in effect.
+    """
+    width = (end - start) / buckets
+    index_of = (lambda at: min(int((at - start) / width), buckets - 1)) if width else (lambda at: 0)
+    changes = {index: list(group) for index, group in groupby(points, key=lambda point: index_of(point[0]))}
+    price = previous
+    for index in range(buckets):
+        bucket_start = start + width * index
+        group = changes.get(index, [])
+        # The carried price is not in effect at all if it changes right at the start of the bucket.
+        prices = [price] if price is not None and (not group or group[0][0] > bucket_start) else []
+        prices += [changed for _, changed in group]
+        if prices:
+            price = prices[-1]
+            yield {"start": bucket_start, "min": min(prices), "max": max(prices), "last": price}
+
+
+def get_price_series(product: Product, start: datetime, end: datetime, buckets: int) -> dict:
+    """
+    Gets the downsampled price series of a product, in two indexed range scans of its price history.
+
+    Returns:
+        Dictionary with the price in effect at the start of the range as `previous` (None if the product did not
+        exist yet), and the downsampled `buckets`, see `downsample`.
+    """
+    history = PriceHistory.objects.filter(product=product)
+    previous = history.filter(created_at__lt=start).order_by("-created_at").values_list("price", flat=True).first()
+    points = (
+        history.filter(created_at__gte=start, created_at__lte=end)
+        .order_by("created_at", "id")
+        .values_list("created_at", "price")
+    )
+    return {"previous": previous, "buckets": list(downsample(points, start, end, buckets, previous))}
@@ -0,0 +1,80 @@
+"""
+Scores used to rank products by their ratings, stored on `ReviewAggregate` and kept current incrementally.
+
+- The Bayesian average pulls the average rating of products with few ratings towards a prior mean.
+- The Wilson score is the lower bound of the 95% confidence interval of the share of stars a product gets.
+- The trending score is a sum of rating weights decaying with a half-life. To update it incrementally without
+  decaying every stored score as time passes, weights are stored grown by `2 ** (age of the rating at the epoch /
+  half-life)` instead, which scales all scores by the same factor at any given time and keeps their order.
+  Stored scores grow by a factor of two per half-life, so the epoch must be moved forward (and the aggregates rebuilt)
+  long before they overflow, in about 1000 half-lives.
+"""
+import math
+from datetime import datetime, timedelta, timezone
+
+from django.conf import settings
+from django.db.models import Case, FloatField, Value, When
+from django.db.models.expressions import CombinedExpression, ExpressionWrapper
+from django.db.models.functions import Sqrt
+from django.db.models.lookups import GreaterThan
+from django.utils import timezone as django_timezone
+
+from products.models import RATING_VALUES
+
+MAX_RATING = max(RATING_VALUES)
+PRIOR_MEAN = getattr(settings, "RANKING_PRIOR_MEAN", MAX_RATING / 2)
+PRIOR_WEIGHT = getattr(settings, "RANKING_PRIOR_WEIGHT", 5)
+WILSON_Z = 1.96
+TRENDING_HALF_LIFE = getattr(settings, "RANKING_TRENDING_HALF_LIFE", timedelta(days=7))
+TRENDING_EPOCH = getattr(settings, "RANKING_TRENDING_EPOCH", datetime(2023, 1, 1, tzinfo=timezone.utc))
+
+# Maps the name of each ranking to the `ReviewAggregate` field it is ordered by.
+RANKINGS = {"bayesian": "bayesian_score", "wilson": "wilson_score", "trending": "trending_score"}
+SCORE_FIELDS = tuple(RANKINGS.values())
+
+
+def bayesian_score(count: int, total: int) -> float:
+    # Like the Wilson score, products without ratings are not scored at all rather than scored at the prior mean.
+    if not count:
+        return 0.0
+    return (PRIOR_WEIGHT * PRIOR_MEAN + total) / (PRIOR_WEIGHT + count)
+
+
+def wilson_score(count: int, total: int) -> float:
+    if not count:
+        return 0.0
+    share = total / (MAX_RATING * count)
+    z_squared = WILSON_Z**2
+    spread = WILSON_Z * math.sqrt(share * (1 - share) / count + z_squared / (4 * count**2))
+    return (share + z_squared / (2 * count) - spread) / (1 + z_squared / count)
+
+
+def trending_weight(value: int, created_at: datetime) -> float:
+    """
+    Gets the weight a rating adds to the stored trending score of its product.
+    """
+    return value / MAX_RATING * 2 ** ((created_at - TRENDING_EPOCH) / TRENDING_HALF_LIFE)
+
+
+def current_trending_score(stored: float, now: datetime | None = None) -> float:
+    """
+    Converts a stored trending score to the decayed sum of rating weights as of now, for display.
+    """
+    now = django_timezone.now() if now is None else now
+    return stored / 2 ** ((now - TRENDING_EPOCH) / TRENDING_HALF_LIFE)
+
+
+def score_expressions(count: CombinedExpression, total: CombinedExpression) -> dict[str, ExpressionWrapper]:
+    """
+    Builds the database expressions computing the Bayesian and Wilson scores from rating count and sum expressions,
+    so an update can recompute the scores in the same statement that changes the counts.
+    """
+    share = total / (Value(float(MAX_RATING)) * count)
+    z_squared = Value(WILSON_Z**2)
+    spread = Value(WILSON_Z) * Sqrt(share * (Value(1.0) - share) / count + z_squared / (Value(4.0) * count * count))
+    wilson = (share + z_squared / (Value(2.0) * count) - spread) / (Value(1.0) + z_squared / count)
+    bayesian = (Value(PRIOR_WEIGHT * PRIOR_MEAN) + total) / (Value(float(PRIOR_WEIGHT)) + count)
+    return {
+        field: ExpressionWrapper(Case(When(GreaterThan(count, 0), then=score), default=Value(0.0)), FloatField())
+        for field, score in (("bayesian_score", bayesian), ("wilson_score", wilson))
+    }
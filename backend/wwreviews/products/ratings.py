@@ -0,0 +1,44 @@
+"""
+Bulk writes of ratings.
+"""
+from django.contrib.auth.models import User
+from django.db import transaction
+
+from products import jobs
+from products.aggregates import refresh_review_aggregates
+from products.models import ProductJob, Rating
+from wwreviews.caching import invalidate_model
+
+
+def upsert_ratings(user: User, values: dict[int, int]) -> list[Rating]:
+    """
+    Sets a user's ratings of the given products in a single `INSERT ... ON CONFLICT DO UPDATE`, creating the ratings
+    the user has not made yet and updating the others. Ratings set to the value they already had are left untouched.
+
+    The upsert bypasses the `Rating` signals, so the review aggregates of the products whose ratings changed are
+    refreshed in bulk instead of incrementally per rating, or enqueued with `DEFER_REVIEW_SIDE_EFFECTS`.
+
+    Args:
+        user: User rating the products.
+        values: Mapping of product id to rating value. The products must exist.
+
+    Returns:
+        The user's ratings of the given products.
+    """
+    with transaction.atomic():
+        ratings = Rating.objects.filter(user=user, product_id__in=list(values))
+        previous = dict(ratings.select_for_update().values_list("product_id", "value"))
+        changed = [product_id for product_id, value in values.items() if previous.get(product_id) != value]
+        if changed:
+            Rating.objects.bulk_create(
+                [Rating(product_id=product_id, user=user, value=values[product_id]) for product_id in changed],
+                update_conflicts=True,
+                unique_fields=["product", "user"],
+                update_fields=["value", "updated_at"],
+            )
+            if jobs.is_deferred():
+                jobs.enqueue(ProductJob.Kind.REVIEW_AGGREGATE, changed)
+            else:
+                refresh_review_aggregates(changed)
+            invalidate_model(Rating)
+        return list(ratings.order_by("product_id"))
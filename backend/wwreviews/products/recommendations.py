@@ -0,0 +1,121 @@
+"""
+Item-item recommendations from the user-rating matrix.
+
+`build_neighbors` computes the adjusted cosine similarity of every pair of products from all ratings, with sparse
+matrix products over the product x user matrix of mean-centered ratings, and stores the most similar products of each
+product as `ProductNeighbor`s. NumPy and SciPy are only imported there, so the web workers serving recommendations do
+not load them. Recommendations are then served from the stored neighbors with a single indexed query.
+"""
+from django.contrib.auth.models import User
+from django.db import transaction
+from django.db.models import F, QuerySet, Sum
+
+from products.models import Product, ProductNeighbor, Rating
+
+NEIGHBORS = 20
+# Ratings from this value up count as liking the product.
+LIKED_VALUE = 4
+# Number of products whose similarities are computed at once, bounding the memory used to
+# `CHUNK_SIZE * number of products` floats.
+CHUNK_SIZE = 500
+
+
+def compute_neighbors(users, products, values, neighbors: int = NEIGHBORS):
+    """
+    Computes the most similar products of each product, by the adjusted cosine similarity of their ratings: the cosine
+    similarity of the vectors of their ratings by each user, after subtracting each user's mean rating. Products are
+    only neighbors if their similarity is positive.
+
+    Args:
+        users: Array of the users of the ratings.
+        products: Array of the products of the ratings.
+        values: Array of the values of the ratings.
+        neighbors: Maximum number of neighbors per product.
+
+    Returns:
+        Tuple of arrays of the products, their neighbors and the similarities.
+    """
+    import numpy as np  # pylint: disable=C0415
+    from scipy import sparse  # pylint: disable=C0415
+
+    user_ids, user_index = np.unique(users, return_inverse=True)
+    product_ids, product_index = np.unique(products, return_inverse=True)
+    values = np.asarray(values, dtype=np.float64)
+    means = np.bincount(user_index, weights=values) / np.bincount(user_index)
+    matrix = sparse.csr_matrix(
+        (values - means[user_index], (product_index, user_index)), shape=(len(product_ids), len(user_ids))
+    )
+    norms = np.sqrt(np.asarray(matrix.multiply(matrix).sum(axis=1)).ravel())
+    norms[norms == 0] = 1
+    matrix = sparse.csr_matrix(sparse.diags(1 / norms) @ matrix)
+    transposed = sparse.csc_matrix(matrix.T)
+
+    count = min(neighbors, len(product_ids) - 1)
+    sources, targets, scores = [], [], []
+    for start in range(0, len(product_ids) if count > 0 else 0, CHUNK_SIZE):
+        similarities = (matrix[start : start + CHUNK_SIZE] @ transposed).toarray()
+        rows = np.arange(similarities.shape[0])
+        # A product is not its own neighbor.
+        similarities[rows, rows + start] = 0
+        top = np.argpartition(-similarities, count - 1, axis=1)[:, :count]
+        top_scores = np.take_along_axis(similarities, top, axis=1)
+        keep = top_scores > 1e-9
+        sources.append(product_ids[np.repeat(rows + start, count).reshape(-1, count)[keep]])
+        targets.append(product_ids[top[keep]])
+        scores.append(top_scores[keep])
+    if not sources:
+        return np.array([], dtype=np.int64), np.array([], dtype=np.int64), np.array([])
+    return np.concatenate(sources), np.concatenate(targets), np.concatenate(scores)
+
+
+def build_neighbors(neighbors: int = NEIGHBORS) -> int:
+    """
+    Rebuilds the neighbors of every product from all ratings, replacing the previous ones in a single transaction.
+
+    Returns:
+        Number of stored neighbors.
+    """
+    import numpy as np  # pylint: disable=C0415
+
+    ratings = np.array(
+        list(Rating.objects.filter(user__isnull=False).values_list("user_id", "product_id", "value").iterator(10_000)),
+        dtype=np.int64,
+    ).reshape(-1, 3)
+    sources, targets, scores = compute_neighbors(ratings[:, 0], ratings[:, 1], ratings[:, 2], neighbors)
+    with transaction.atomic():
+        ProductNeighbor.objects.all().delete()
+        ProductNeighbor.objects.bulk_create(
+            (
+                ProductNeighbor(product_id=source, neighbor_id=target, score=score)
+                for source, target, score in zip(sources.tolist(), targets.tolist(), scores.tolist())
+            ),
+            batch_size=1000,
+        )
+    return len(scores)
+
+
+def similar_products(product_id: int) -> QuerySet[Product]:
+    """
+    Gets the products most similar to a product, the ones users who liked it also liked, annotated with their
+    `recommendation_score` and ordered by it.
+    """
+    return (
+        Product.objects.filter(neighbor_of__product_id=product_id)
+        .annotate(recommendation_score=F("neighbor_of__score"))
+        .order_by("-recommendation_score", "id")
+    )
+
+
+def recommended_products(user: User) -> QuerySet[Product]:
+    """
+    Gets the products recommended to a user: the neighbors of the products they liked which they have not rated yet,
+    annotated with their `recommendation_score`, their total similarity to the liked products, and ordered by it.
+    """
+    return (
+        Product.objects.filter(
+            neighbor_of__product__rating__user=user, neighbor_of__product__rating__value__gte=LIKED_VALUE
+        )
+        .exclude(rating__user=user)
+        .annotate(recommendation_score=Sum("neighbor_of__score"))
+        .order_by("-recommendation_score", "id")
+    )
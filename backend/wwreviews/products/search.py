@@ -0,0 +1,214 @@
+"""
+Full-text product search over product names, category names and feedback text.
+
+The index lives in a `products_search` table created by the `0004_product_search` migration: an FTS5 virtual table on
+SQLite, ranked with BM25, and a weighted tsvector table with a GIN index on PostgreSQL, ranked with `ts_rank_cd`. Other
+database vendors fall back to an unranked `icontains` scan.
+"""
+import re
+from collections import defaultdict
+from collections.abc import Iterable
+
+from django.db import connection
+
+from products.models import Feedback, Product
+
+SEARCH_TABLE = "products_search"
+SEARCH_CONFIG = "english"
+TOKEN_RE = re.compile(r"\w+", re.UNICODE)
+
+# Relative weights of the name, category and feedback columns.
+SQLITE_BM25_WEIGHTS = (10.0, 4.0, 1.0)
+
+
+def tokenize(query: str) -> list[str]:
+    """
+    Splits a user query into search tokens, dropping any characters that carry meaning in the FTS query syntaxes.
+    """
+    return TOKEN_RE.findall(query.lower())
+
+
+def _documents(product_ids: list[int]) -> list[tuple[int, str, str, str]]:
+    """
+    Builds the `(product_id, name, category, feedback)` documents for the given products.
+    """
+    feedback = defaultdict(list)
+    for product_id, text in Feedback.objects.filter(product_id__in=product_ids).values_list("product_id", "text"):
+        feedback[product_id].append(text)
+    return [
+        (product_id, name, category or "", "\n".join(feedback[product_id]))
+        for product_id, name, category in Product.objects.filter(id__in=product_ids).values_list(
+            "id", "name", "category__name"
+        )
+    ]
+
+
+class SearchBackend:
+    """
+    Fallback search backend for databases without a supported full-text index.
+    """
+
+    def index(self, product_ids: list[int]):
+        """
+        Inserts the search documents of the given products, which must not already be indexed.
+        """
+
+    def remove(self, product_ids: list[int]):
+        """
+        Removes the given products from the index.
+        """
+
+    def count(self, tokens: list[str]) -> int:
+        return self._queryset(tokens).count()
+
+    def search(self, tokens: list[str], offset: int, limit: int) -> list[tuple[int, float]]:
+        return [(product_id, 0.0) for product_id in self._queryset(tokens)[offset : offset + limit]]
+
+    @staticmethod
+    def _queryset(tokens: list[str]):
+        queryset = Product.objects.order_by("id")
+        for token in tokens:
+            queryset = queryset.filter(name__icontains=token)
+        return queryset.values_list("id", flat=True)
+
+
+class SqliteSearchBackend(SearchBackend):
+    def index(self, product_ids: list[int]):
+        with connection.cursor() as cursor:
+            cursor.executemany(
+                f"INSERT INTO {SEARCH_TABLE} (rowid, name, category, feedback) VALUES (%s, %s, %s, %s)",
+                _documents(product_ids),
+            )
+
+    def remove(self, product_ids: list[int]):
+        with connection.cursor() as cursor:
+            cursor.execute(
+                f"DELETE FROM {SEARCH_TABLE} WHERE rowid IN ({', '.join(['%s'] * len(product_ids))})", product_ids
+            )
+
+    @staticmethod
+    def _match(tokens: list[str]) -> str:
+        # Every token must match, the last one as a prefix so results update while the user is typing.
+        return " ".join(f'"{token}"' for token in tokens[:-1]) + f' "{tokens[-1]}"*'
+
+    def count(self, tokens: list[str]) -> int:
+        with connection.cursor() as cursor:
+            cursor.execute(f"SELECT COUNT(*) FROM {SEARCH_TABLE} WHERE {SEARCH_TABLE} MATCH %s", [self._match(tokens)])
+            return cursor.fetchone()[0]
+
+    def search(self, tokens: list[str], offset: int, limit: int) -> list[tuple[int, float]]:
+        weights = ", ".join(str(weight) for weight in SQLITE_BM25_WEIGHTS)
+        with connection.cursor() as cursor:
+            # bm25() scores better matches with more negative numbers, so it is negated to read as a relevance score.
+            cursor.execute(
+                f"SELECT rowid, -bm25({SEARCH_TABLE}, {weights}) AS score FROM {SEARCH_TABLE} "
+                f"WHERE {SEARCH_TABLE} MATCH %s ORDER BY score DESC, rowid LIMIT %s OFFSET %s",
+                [self._match(tokens), limit, offset],
+            )
+            return cursor.fetchall()
+
+
+class PostgresSearchBackend(SearchBackend):
+    def index(self, product_ids: list[int]):
+        with connection.cursor() as cursor:
+            cursor.executemany(
+                f"INSERT INTO {SEARCH_TABLE} (product_id, document) VALUES (%s, "
+                f"setweight(to_tsvector('{SEARCH_CONFIG}', %s), 'A') || "
+                f"setweight(to_tsvector('{SEARCH_CONFIG}', %s), 'B') || "
+                f"setweight(to_tsvector('{SEARCH_CONFIG}', %s), 'C'))",
+                _documents(product_ids),
+            )
+
+    def remove(self, product_ids: list[int]):
+        with connection.cursor() as cursor:
+            cursor.execute(f"DELETE FROM {SEARCH_TABLE} WHERE product_id = ANY(%s)", [list(product_ids)])
+
+    @staticmethod
+    def _tsquery(tokens: list[str]) -> str:
+        return " & ".join(tokens[:-1] + [f"{tokens[-1]}:*"])
+
+    def count(self, tokens: list[str]) -> int:
+        with connection.cursor() as cursor:
+            cursor.execute(
+                f"SELECT COUNT(*) FROM {SEARCH_TABLE} WHERE document @@ to_tsquery('{SEARCH_CONFIG}', %s)",
+                [self._tsquery(tokens)],
+            )
+            return cursor.fetchone()[0]
+
+    def search(self, tokens: list[str], offset: int, limit: int) -> list[tuple[int, float]]:
+        with connection.cursor() as cursor:
+            cursor.execute(
+                f"SELECT product_id, ts_rank_cd(document, query) AS score "
+                f"FROM {SEARCH_TABLE}, to_tsquery('{SEARCH_CONFIG}', %s) query "
+                "WHERE document @@ query ORDER BY score DESC, product_id LIMIT %s OFFSET %s",
+                [self._tsquery(tokens), limit, offset],
+            )
+            return cursor.fetchall()
+
+
+BACKENDS = {"sqlite": SqliteSearchBackend, "postgresql": PostgresSearchBackend}
+
+
+def get_backend() -> SearchBackend:
+    return BACKENDS.get(connection.vendor, SearchBackend)()
+
+
+def index_products(product_ids: Iterable[int]):
+    """
+    (Re)indexes the search documents of the given products. Products that no longer exist are removed from the index.
+    """
+    product_ids = list(set(product_ids))
+    if product_ids:
+        backend = get_backend()
+        backend.remove(product_ids)
+        backend.index(product_ids)
+
+
+def remove_products(product_ids: Iterable[int]):
+    product_ids = list(set(product_ids))
+    if product_ids:
+        get_backend().remove(product_ids)
+
+
+def rebuild_index(batch_size: int = 1000) -> int:
+    """
+    Rebuilds the search index of the whole catalog.
+
+    Returns:
+        Number of indexed products.
+    """
+    with connection.cursor() as cursor:
+        cursor.execute(f"DELETE FROM {SEARCH_TABLE}")
+    product_ids = list(Product.objects.values_list("id", flat=True))
+    for start in range(0, len(product_ids), batch_size):
+        get_backend().index(product_ids[start : start + batch_size])
+    return len(product_ids)
+
+
+class SearchResults:
+    """
+    Lazy, sliceable view of the ranked results of a search, so it can be paginated like a queryset. Slicing returns
+    the matching products in rank order, each annotated with its `search_score`.
+    """
+
+    def __init__(self, query: str):
+        self.tokens = tokenize(query)
+        self.backend = get_backend()
+
+    def count(self) -> int:
+        return self.backend.count(self.tokens) if self.tokens else 0
+
+    def __len__(self) -> int:
+        return self.count()
+
+    def __getitem__(self, item: slice) -> list[Product]:
+        if not self.tokens:
+            return []
+        hits = self.backend.search(self.tokens, item.start or 0, item.stop - (item.start or 0))
+        products = Product.objects.select_related("category").in_bulk([product_id for product_id, _ in hits])
+        results = []
+        for product_id, score in hits:
+            if product_id in products:
+                products[product_id].search_score = score
+                results.append(products[product_id])
+        return results
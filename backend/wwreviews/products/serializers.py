@@ -1,13 +1,58 @@
-from django.db.models import Avg
+from django.db.models import IntegerField, OuterRef, QuerySet, Subquery, Value
 from rest_framework import serializers
 
-from products.models import Category, Feedback, Product, ProductAction, Rating, SuggestedProduct
+from products import duplicates, ranking
+from products.models import (Category, Feedback, Product, ProductAction, Rating, ReviewAggregate, SuggestedProduct,
+                             validate_rating)
 
 
 class SuggestedProductSerializer(serializers.ModelSerializer):
     class Meta:
         model = SuggestedProduct
         fields = "__all__"
+        # Only set by reviewing the suggestion, see `SuggestedProductView.review`.
+        read_only_fields = ("status", "product")
+
+
+class SuggestionQueueQuerySerializer(serializers.Serializer):
+    limit = serializers.IntegerField(min_value=1, max_value=500, default=100)
+
+
+class SuggestionGroupSerializer(serializers.Serializer):
+    """
+    Serializes a group of pending suggestions of the same product, see `products.suggestions.SuggestionGroup`.
+    """
+
+    ids = serializers.ListField(child=serializers.IntegerField(), source="suggestion_ids")
+    suggestion = SuggestedProductSerializer(source="first")
+    category = serializers.IntegerField(source="category_id", allow_null=True)
+    product = serializers.IntegerField(source="product_id", allow_null=True)
+
+
+class SuggestionApprovalSerializer(serializers.Serializer):
+    ids = serializers.ListField(child=serializers.IntegerField(min_value=1), allow_empty=False)
+    category = serializers.IntegerField(min_value=1, required=False)
+
+
+class SuggestionReviewSerializer(serializers.Serializer):
+    """
+    Validates a bulk review of suggestions, a list of groups of suggestion ids to `approve` and of ids to `reject`.
+    """
+
+    MAX_SUGGESTIONS = 1000
+
+    approve = SuggestionApprovalSerializer(many=True, default=list)
+    reject = serializers.ListField(child=serializers.IntegerField(min_value=1), default=list)
+
+    def validate(self, attrs: dict) -> dict:
+        ids = [*(suggestion_id for approval in attrs["approve"] for suggestion_id in approval["ids"]), *attrs["reject"]]
+        if not ids:
+            raise serializers.ValidationError("Approve or reject at least one suggestion.")
+        if len(ids) > self.MAX_SUGGESTIONS:
+            raise serializers.ValidationError(f"At most {self.MAX_SUGGESTIONS} suggestions can be reviewed at once.")
+        if len(set(ids)) < len(ids):
+            raise serializers.ValidationError("Each suggestion can only be reviewed once.")
+        return attrs
 
 
 class ProductSerializer(serializers.ModelSerializer):
@@ -15,6 +60,118 @@ class ProductSerializer(serializers.ModelSerializer):
         model = Product
         fields = "__all__"
 
+    def validate_link(self, link: str) -> str:
+        product_id = duplicates.find_link_matches([link]).get(duplicates.normalize_link(link))
+        if product_id is not None and (self.instance is None or product_id != self.instance.pk):
+            raise serializers.ValidationError(f"Product {product_id} already has this link.")
+        return link
+
+
+class DuplicateQuerySerializer(serializers.Serializer):
+    name = serializers.CharField()
+    link = serializers.URLField()
+
+
+class DuplicateSerializer(serializers.Serializer):
+    """
+    Serializes a near-duplicate product or suggestion, see `products.duplicates.Duplicate`.
+    """
+
+    product = serializers.IntegerField(source="product_id", allow_null=True)
+    suggestion = serializers.IntegerField(source="suggestion_id", allow_null=True)
+    name = serializers.CharField(source="instance.name")
+    link = serializers.CharField(source="instance.link")
+    same_link = serializers.BooleanField()
+    similarity = serializers.FloatField()
+
+
+class ProductSearchResultSerializer(serializers.ModelSerializer):
+    category_name = serializers.CharField(source="category.name", read_only=True)
+    score = serializers.FloatField(source="search_score", read_only=True)
+
+    class Meta:
+        model = Product
+        fields = "__all__"
+
+
+class IdListField(serializers.CharField):
+    """
+    Query parameter field parsing a comma separated list of ids, deduplicated and capped at `max_ids`.
+    """
+
+    def __init__(self, max_ids: int, **kwargs):
+        self.max_ids = max_ids
+        super().__init__(**kwargs)
+
+    def to_internal_value(self, data) -> list[int]:
+        ids = super().to_internal_value(data)
+        try:
+            ids = list(dict.fromkeys(int(id_) for id_ in ids.split(",") if id_.strip()))
+        except ValueError as err:
+            raise serializers.ValidationError("Enter a comma separated list of ids.") from err
+        if not ids or len(ids) > self.max_ids:
+            raise serializers.ValidationError(f"Enter between 1 and {self.max_ids} ids.")
+        return ids
+
+
+class RatingHistogramQuerySerializer(serializers.Serializer):
+    """
+    Validates the query parameters of the rating histogram endpoint.
+    """
+
+    ids = IdListField(max_ids=100)
+    live = serializers.BooleanField(default=False)
+
+
+class ProductBatchQuerySerializer(serializers.Serializer):
+    """
+    Validates the query parameters of the product batch endpoint.
+    """
+
+    ids = IdListField(max_ids=500)
+
+
+class RankingQuerySerializer(serializers.Serializer):
+    """
+    Validates the query parameters of the product ranking endpoint.
+    """
+
+    score = serializers.ChoiceField(choices=list(ranking.RANKINGS), default="bayesian")
+    category = serializers.IntegerField(required=False, min_value=1)
+    min_ratings = serializers.IntegerField(default=1, min_value=0)
+    limit = serializers.IntegerField(default=20, min_value=1, max_value=100)
+    offset = serializers.IntegerField(default=0, min_value=0)
+
+
+class PriceHistoryQuerySerializer(serializers.Serializer):
+    """
+    Validates the query parameters of the product price history endpoint.
+    """
+
+    start = serializers.DateTimeField(required=False)
+    end = serializers.DateTimeField(required=False)
+    buckets = serializers.IntegerField(default=100, min_value=1, max_value=1000)
+
+
+class RankedProductSerializer(serializers.ModelSerializer):
+    """
+    Serializes a product along with its ranking score, read from the product's review aggregate. The name of the
+    ranking is given by the `score` context.
+    """
+
+    category_name = serializers.CharField(source="category.name", read_only=True)
+    rating_count = serializers.IntegerField(source="review_aggregate.rating_count", read_only=True)
+    average_rating = serializers.FloatField(source="review_aggregate.average_rating", read_only=True)
+    score = serializers.SerializerMethodField()
+
+    class Meta:
+        model = Product
+        fields = "__all__"
+
+    def get_score(self, obj: Product) -> float:
+        score = getattr(obj.review_aggregate, ranking.RANKINGS[self.context["score"]])
+        return ranking.current_trending_score(score) if self.context["score"] == "trending" else score
+
 
 class ProductActionSerializer(serializers.ModelSerializer):
     class Meta:
@@ -27,6 +184,11 @@ class CategorySerializer(serializers.ModelSerializer):
         model = Category
         fields = "__all__"
 
+    def validate_parent(self, parent: Category | None) -> Category | None:
+        if self.instance is not None and parent is not None and parent.path.startswith(self.instance.path):
+            raise serializers.ValidationError("A category cannot be nested under itself or one of its descendants.")
+        return parent
+
 
 class RatingSerializer(serializers.ModelSerializer):
     class Meta:
@@ -34,6 +196,31 @@ class RatingSerializer(serializers.ModelSerializer):
         fields = "__all__"
 
 
+class RatingValueSerializer(serializers.Serializer):
+    product = serializers.IntegerField(min_value=1)
+    value = serializers.IntegerField(validators=[validate_rating])
+
+
+class RatingUpsertSerializer(serializers.ListSerializer):
+    """
+    Validates the ratings set by the rating upsert endpoint, a list of `{"product": id, "value": value}` objects.
+    """
+
+    MAX_RATINGS = 500
+
+    def __init__(self, *args, **kwargs):
+        super().__init__(*args, child=RatingValueSerializer(), allow_empty=False, max_length=self.MAX_RATINGS, **kwargs)
+
+    def validate(self, attrs: list[dict]) -> dict[int, int]:
+        values = {rating["product"]: rating["value"] for rating in attrs}
+        if len(values) < len(attrs):
+            raise serializers.ValidationError("Each product can only be rated once.")
+        missing = set(values) - set(Product.objects.filter(id__in=list(values)).values_list("id", flat=True))
+        if missing:
+            raise serializers.ValidationError(f"Products {sorted(missing)} do not exist.")
+        return values
+
+
 class FeedbackSerializer(serializers.ModelSerializer):
     username = serializers.SerializerMethodField()
     rating = serializers.SerializerMethodField()
@@ -44,25 +231,94 @@ class FeedbackSerializer(serializers.ModelSerializer):
 
     def get_username(self, obj: Feedback) -> str:
         return obj.user.username if obj.user else "[deleted]"
-    
-    def get_rating(self, obj: Feedback) -> int:
-        return Rating.objects.get(user=obj.user, product=obj.product).value
+
+    def get_rating(self, obj: Feedback) -> int | None:
+        """
+        Gets the rating the feedback's author gave the product, or None if they have not rated it. Uses the
+        `rating_value` annotation from `FeedbackSerializer.annotate_queryset` when available to avoid a query per row.
+        """
+        if hasattr(obj, "rating_value"):
+            return obj.rating_value
+        if obj.user_id is None:
+            return None
+        return (
+            Rating.objects.filter(user_id=obj.user_id, product_id=obj.product_id)
+            .values_list("value", flat=True)
+            .first()
+        )
+
+    @staticmethod
+    def annotate_queryset(queryset: QuerySet[Feedback]) -> QuerySet[Feedback]:
+        """
+        Prepares a feedback queryset for serialization, resolving the users and their ratings for all rows in the same
+        query.
+        """
+        rating = Rating.objects.filter(product=OuterRef("product"), user=OuterRef("user")).values("value")[:1]
+        return queryset.select_related("user").annotate(rating_value=Subquery(rating))
 
 
 class BasicProductReviewSerializer(serializers.ModelSerializer):
+    """
+    Serializes the review aggregates of a product. Expects the product's `review_aggregate` to be selected with the
+    queryset, products without an aggregate row are serialized as having no reviews.
+    """
+
     feedback_count = serializers.SerializerMethodField()
     average_rating = serializers.SerializerMethodField()
     rating_count = serializers.SerializerMethodField()
+    rating_histogram = serializers.SerializerMethodField()
 
     class Meta:
         model = Product
-        fields = ("id", "feedback_count", "average_rating", "rating_count")
+        fields = ("id", "feedback_count", "average_rating", "rating_count", "rating_histogram")
+
+    @staticmethod
+    def _aggregate(obj: Product) -> ReviewAggregate:
+        return getattr(obj, "review_aggregate", None) or ReviewAggregate(product=obj)
+
+    def get_feedback_count(self, obj: Product) -> int:
+        return self._aggregate(obj).feedback_count
+
+    def get_average_rating(self, obj: Product) -> float | None:
+        return self._aggregate(obj).average_rating
+
+    def get_rating_count(self, obj: Product) -> int:
+        return self._aggregate(obj).rating_count
+
+    def get_rating_histogram(self, obj: Product) -> dict[int, int]:
+        return self._aggregate(obj).rating_histogram
+
+
+class ProductCardSerializer(ProductSerializer):
+    """
+    Serializes a product with everything a product card shows: its category name, review aggregates and the rating
+    the requesting user gave it. Expects the queryset to be prepared with `ProductCardSerializer.prepare_queryset`.
+    """
+
+    category_name = serializers.CharField(source="category.name", read_only=True)
+    reviews = BasicProductReviewSerializer(source="*", read_only=True)
+    own_rating = serializers.IntegerField(read_only=True, allow_null=True)
+
+    @staticmethod
+    def prepare_queryset(queryset: QuerySet[Product], user) -> QuerySet[Product]:
+        """
+        Selects the categories and review aggregates of the products and annotates the user's ratings, so all rows
+        are serialized from a single query.
+        """
+        queryset = queryset.select_related("category", "review_aggregate")
+        if not user.is_authenticated:
+            return queryset.annotate(own_rating=Value(None, output_field=IntegerField()))
+        rating = Rating.objects.filter(product=OuterRef("pk"), user=user).values("value")[:1]
+        return queryset.annotate(own_rating=Subquery(rating))
+
+
+class RecommendationQuerySerializer(serializers.Serializer):
+    limit = serializers.IntegerField(min_value=1, max_value=100, default=20)
 
-    def get_feedback_count(self, obj):
-        return obj.feedback_set.count()
 
-    def get_average_rating(self, obj):
-        return obj.rating_set.aggregate(avg_rating=Avg("value"))["avg_rating"]
+class RecommendedProductSerializer(ProductCardSerializer):
+    """
+    Serializes a recommended product card with its `score`, see `products.recommendations`.
+    """
 
-    def get_rating_count(self, obj):
-        return obj.rating_set.count()
+    score = serializers.FloatField(source="recommendation_score", read_only=True)
@@ -0,0 +1,150 @@
+"""
+Signal handlers keeping derived product data in sync with writes to the models it is derived from.
+
+With `DEFER_REVIEW_SIDE_EFFECTS`, rating and feedback writes enqueue their updates as `ProductJob`s instead, see
+`products.jobs`.
+"""
+from django.db import transaction
+from django.db.models.signals import post_delete, post_save, pre_save
+from django.dispatch import receiver
+
+from products import aggregates, categories, duplicates, jobs, search
+from products.models import Category, Feedback, Product, ProductJob, Rating, ReviewAggregate, SuggestedProduct
+
+
+@receiver(post_save, sender=Product)
+def create_review_aggregate(sender, instance: Product, created: bool, raw: bool = False, **kwargs):
+    if created and not raw:
+        ReviewAggregate.objects.get_or_create(product=instance)
+
+
+@receiver(post_save, sender=Product)
+def index_product(sender, instance: Product, created: bool, raw: bool = False, **kwargs):
+    if raw:
+        return
+    # Only the name and category are part of the search document, so e.g. price updates skip the reindex.
+    if created or instance.has_changed(["name", "category_id"]):
+        search.index_products([instance.pk])
+    # Likewise, only the name and link are part of the duplicate detection keys.
+    if created or instance.has_changed(["name", "link"]):
+        duplicates.index_products([instance])
+    instance.remember_loaded_values(["name", "category_id", "link"])
+
+
+@receiver(post_save, sender=SuggestedProduct)
+def index_suggestion(sender, instance: SuggestedProduct, raw: bool = False, **kwargs):
+    if not raw:
+        duplicates.index_suggestions([instance])
+
+
+@receiver(post_delete, sender=Product)
+def unindex_product(sender, instance: Product, **kwargs):
+    search.remove_products([instance.pk])
+
+
+@receiver(post_save, sender=Category)
+@receiver(post_delete, sender=Category)
+def invalidate_category_tree(sender, instance: Category, **kwargs):
+    transaction.on_commit(categories.invalidate_category_tree)
+
+
+@receiver(post_save, sender=Category)
+def index_category_products(sender, instance: Category, created: bool, raw: bool = False, **kwargs):
+    if not created and not raw:
+        search.index_products(Product.objects.filter(category=instance).values_list("id", flat=True))
+
+
+@receiver(post_save, sender=Rating)
+def update_rating_aggregate(sender, instance: Rating, created: bool, raw: bool = False, **kwargs):
+    if raw:
+        return
+    loaded = getattr(instance, "_loaded_values", None)
+    if jobs.is_deferred():
+        previous = [loaded["product_id"]] if loaded else []
+        jobs.enqueue(ProductJob.Kind.REVIEW_AGGREGATE, [instance.product_id, *previous])
+    elif created:
+        aggregates.add_rating(instance.product_id, instance.value, instance.created_at)
+    elif loaded is None:
+        # The previous values are unknown, so the delta cannot be applied incrementally.
+        aggregates.refresh_review_aggregates([instance.product_id])
+    elif (loaded["product_id"], loaded["value"], loaded["created_at"]) != (
+        instance.product_id,
+        instance.value,
+        instance.created_at,
+    ):
+        aggregates.add_rating(loaded["product_id"], loaded["value"], loaded["created_at"], sign=-1)
+        aggregates.add_rating(instance.product_id, instance.value, instance.created_at)
+    instance._loaded_values = {
+        "product_id": instance.product_id,
+        "value": instance.value,
+        "created_at": instance.created_at,
+    }
+
+
+@receiver(post_delete, sender=Rating)
+def delete_rating_aggregate(sender, instance: Rating, **kwargs):
+    loaded = getattr(
+        instance,
+        "_loaded_values",
+        {"product_id": instance.product_id, "value": instance.value, "created_at": instance.created_at},
+    )
+    if jobs.is_deferred():
+        jobs.enqueue(ProductJob.Kind.REVIEW_AGGREGATE, [loaded["product_id"]])
+    else:
+        aggregates.add_rating(
+            loaded["product_id"], loaded["value"], loaded["created_at"], sign=-1, create_missing=False
+        )
+
+
+@receiver(post_save, sender=Feedback)
+def update_feedback_aggregate(sender, instance: Feedback, created: bool, raw: bool = False, **kwargs):
+    if raw:
+        return
+    loaded = getattr(instance, "_loaded_values", None)
+    if jobs.is_deferred():
+        previous = [loaded["product_id"]] if loaded else []
+        jobs.enqueue(ProductJob.Kind.REVIEW_AGGREGATE, [instance.product_id, *previous])
+    elif created:
+        aggregates.add_feedback(instance.product_id)
+    elif loaded is None:
+        aggregates.refresh_review_aggregates([instance.product_id])
+    elif loaded["product_id"] != instance.product_id:
+        aggregates.add_feedback(loaded["product_id"], sign=-1)
+        aggregates.add_feedback(instance.product_id)
+    instance._loaded_values = {"product_id": instance.product_id}
+
+
+@receiver(post_delete, sender=Feedback)
+def delete_feedback_aggregate(sender, instance: Feedback, **kwargs):
+    loaded = getattr(instance, "_loaded_values", {"product_id": instance.product_id})
+    if jobs.is_deferred():
+        jobs.enqueue(ProductJob.Kind.REVIEW_AGGREGATE, [loaded["product_id"]])
+    else:
+        aggregates.add_feedback(loaded["product_id"], sign=-1, create_missing=False)
+
+
+@receiver(pre_save, sender=Feedback)
+def index_feedback_previous_product(sender, instance: Feedback, raw: bool = False, **kwargs):
+    # Feedback moved to another product must also be dropped from the previous product's search document.
+    loaded = getattr(instance, "_loaded_values", None)
+    if not raw and loaded is not None and loaded["product_id"] != instance.product_id:
+        instance._reindex_product_ids = [loaded["product_id"]]
+
+
+@receiver(post_save, sender=Feedback)
+def index_feedback(sender, instance: Feedback, raw: bool = False, **kwargs):
+    if not raw:
+        product_ids = [instance.product_id, *getattr(instance, "_reindex_product_ids", [])]
+        if jobs.is_deferred():
+            jobs.enqueue(ProductJob.Kind.SEARCH_INDEX, product_ids)
+        else:
+            search.index_products(product_ids)
+        instance._reindex_product_ids = []
+
+
+@receiver(post_delete, sender=Feedback)
+def unindex_feedback(sender, instance: Feedback, **kwargs):
+    if jobs.is_deferred():
+        jobs.enqueue(ProductJob.Kind.SEARCH_INDEX, [instance.product_id])
+    else:
+        search.index_products([instance.product_id])
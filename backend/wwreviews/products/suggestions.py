@@ -0,0 +1,229 @@
+"""
+Moderation of product suggestions.
+
+Pending suggestions of the same product, by link or by name, are grouped so moderators review each product once. The
+free-text category of a suggestion is resolved against the category names, and suggestions are approved (creating
+their products) or rejected in bulk, in a constant number of queries however many are reviewed.
+"""
+from collections.abc import Iterable
+from dataclasses import dataclass, field
+
+from django.db import transaction
+from django.db.models.functions import Lower
+from django.utils import timezone
+
+from products import duplicates, prices, search
+from products.duplicates import normalize_link, normalize_name
+from products.models import Category, PriceHistory, Product, ReviewAggregate, SuggestedProduct
+from wwreviews.caching import invalidate_model
+
+
+def _age(suggestion: SuggestedProduct) -> tuple:
+    return suggestion.created_at, suggestion.pk
+
+
+@dataclass
+class SuggestionGroup:
+    """
+    Pending suggestions of the same product, oldest first.
+    """
+
+    suggestions: list[SuggestedProduct]
+    category_id: int | None = None
+    # Existing product with the link of one of the suggestions.
+    product_id: int | None = None
+
+    @property
+    def first(self) -> SuggestedProduct:
+        return self.suggestions[0]
+
+    @property
+    def suggestion_ids(self) -> list[int]:
+        return [suggestion.pk for suggestion in self.suggestions]
+
+
+def group_suggestions(suggestions: Iterable[SuggestedProduct]) -> list[SuggestionGroup]:
+    """
+    Groups suggestions sharing a normalized link or name, transitively, ordered by their oldest suggestion.
+    """
+    suggestions = sorted(suggestions, key=_age)
+    # Union-find over the suggestions, joined through the keys they share.
+    parents = list(range(len(suggestions)))
+
+    def find(index: int) -> int:
+        while parents[index] != index:
+            parents[index] = parents[parents[index]]
+            index = parents[index]
+        return index
+
+    owners = {}
+    for index, suggestion in enumerate(suggestions):
+        for key in (("link", normalize_link(suggestion.link)), ("name", normalize_name(suggestion.name))):
+            if key in owners:
+                # The oldest suggestion stays the root, so groups keep the order of their oldest suggestion.
+                root, other = sorted((find(owners[key]), find(index)))
+                parents[other] = root
+            else:
+                owners[key] = index
+
+    groups = {}
+    for index, suggestion in enumerate(suggestions):
+        groups.setdefault(find(index), []).append(suggestion)
+    return [SuggestionGroup(members) for members in groups.values()]
+
+
+def resolve_categories(names: Iterable[str | None]) -> dict[str, int]:
+    """
+    Resolves free-text category names against the categories, ignoring case, in a single query.
+
+    Returns:
+        Dictionary mapping each normalized name which matches a category to the category's id.
+    """
+    names = {normalize_name(name) for name in names if name and name.strip()}
+    if not names:
+        return {}
+    categories = Category.objects.annotate(lower_name=Lower("name")).filter(lower_name__in=names)
+    return {normalize_name(name): category_id for category_id, name in categories.values_list("id", "name")}
+
+
+def _resolve_groups(groups: list[SuggestionGroup]):
+    """
+    Sets the category and the existing product of the groups, in one query each.
+    """
+    suggestions = [suggestion for group in groups for suggestion in group.suggestions]
+    categories = resolve_categories(suggestion.category for suggestion in suggestions)
+    products = duplicates.find_link_matches(suggestion.link for suggestion in suggestions)
+    for group in groups:
+        group.category_id = next(
+            (
+                categories[normalize_name(suggestion.category)]
+                for suggestion in group.suggestions
+                if suggestion.category and normalize_name(suggestion.category) in categories
+            ),
+            None,
+        )
+        group.product_id = next(
+            (
+                products[normalize_link(suggestion.link)]
+                for suggestion in group.suggestions
+                if normalize_link(suggestion.link) in products
+            ),
+            None,
+        )
+
+
+def review_queue(limit: int = 100) -> list[SuggestionGroup]:
+    """
+    Gets the pending suggestions grouped by product, oldest first, with their resolved category and existing product.
+
+    Args:
+        limit: Maximum number of groups to return.
+    """
+    pending = SuggestedProduct.objects.filter(status=SuggestedProduct.Status.PENDING)
+    groups = group_suggestions(pending)[:limit]
+    _resolve_groups(groups)
+    return groups
+
+
+@dataclass
+class ReviewResult:
+    approved: int = 0
+    rejected: int = 0
+    # Product of each approved group, in the order of the approvals.
+    products: list[int] = field(default_factory=list)
+    created: int = 0
+    errors: list[dict] = field(default_factory=list)
+
+    def as_dict(self) -> dict:
+        return {
+            "approved": self.approved,
+            "rejected": self.rejected,
+            "created": self.created,
+            "products": self.products,
+            "errors": self.errors,
+        }
+
+
+def review_suggestions(approve: list[dict], reject: list[int]) -> ReviewResult:
+    """
+    Approves and rejects pending suggestions in a single transaction. Each approval is a group of suggestions of the
+    same product, which are approved as the product with their link if it exists, or as a new product made from the
+    group's oldest suggestion otherwise. If any suggestion is not pending or any new product has no category, nothing
+    is written and the result lists the errors.
+
+    Args:
+        approve: Approvals, each a dict of the `ids` of the suggestions to approve together and optionally the id of
+            the `category` of the product, which is otherwise resolved from the suggestions' category names.
+        reject: Ids of the suggestions to reject.
+    """
+    result = ReviewResult()
+    ids = [*(suggestion_id for approval in approve for suggestion_id in approval["ids"]), *reject]
+    with transaction.atomic():
+        pending = SuggestedProduct.objects.select_for_update().filter(status=SuggestedProduct.Status.PENDING)
+        suggestions = pending.in_bulk(ids)
+        missing = [suggestion_id for suggestion_id in ids if suggestion_id not in suggestions]
+        if missing:
+            result.errors.append({"ids": [f"Suggestions {missing} do not exist or are not pending."]})
+            return result
+
+        groups = [
+            SuggestionGroup(sorted((suggestions[suggestion_id] for suggestion_id in approval["ids"]), key=_age))
+            for approval in approve
+        ]
+        _resolve_groups(groups)
+        given = {approval["category"] for approval in approve if "category" in approval}
+        categories = set(Category.objects.filter(id__in=given).values_list("id", flat=True)) if given else set()
+
+        now, created, approved = timezone.now(), [], []
+        for index, (approval, group) in enumerate(zip(approve, groups)):
+            if "category" in approval:
+                if approval["category"] not in categories:
+                    result.errors.append(
+                        {"approve": index, "errors": {"category": [f"Category {approval['category']} does not exist."]}}
+                    )
+                    continue
+                group.category_id = approval["category"]
+            product = Product(pk=group.product_id)
+            if group.product_id is None:
+                if group.category_id is None:
+                    result.errors.append(
+                        {"approve": index, "errors": {"category": ["The category could not be resolved, give one."]}}
+                    )
+                    continue
+                first = group.first
+                product = Product(
+                    name=first.name,
+                    price=first.price,
+                    link=first.link,
+                    image_url=first.image_url,
+                    category_id=group.category_id,
+                )
+                created.append(product)
+            for suggestion in group.suggestions:
+                suggestion.status = SuggestedProduct.Status.APPROVED
+                suggestion.product = product
+                suggestion.updated_at = now
+                approved.append(suggestion)
+            result.products.append(product)
+        if result.errors:
+            result.products = []
+            return result
+
+        Product.objects.bulk_create(created)
+        # Bulk creates send no signals, so the aggregates, price history and search documents are created here.
+        ReviewAggregate.objects.bulk_create([ReviewAggregate(product=product) for product in created])
+        PriceHistory.objects.bulk_create(prices.initial_prices(created))
+        search.index_products([product.pk for product in created])
+        duplicates.index_products(created)
+        SuggestedProduct.objects.bulk_update(approved, ["status", "product", "updated_at"])
+        result.rejected = SuggestedProduct.objects.filter(id__in=reject).update(
+            status=SuggestedProduct.Status.REJECTED, updated_at=now
+        )
+        if created:
+            invalidate_model(Product)
+            invalidate_model(ReviewAggregate)
+
+    result.approved = len(approved)
+    result.created = len(created)
+    result.products = [product.pk for product in result.products]
+    return result
@@ -1,3 +1,1171 @@
-from django.test import TestCase
+import json
+import math
+import random
+from datetime import timedelta
+from io import StringIO
+from unittest import mock
 
-# Create your tests here.
+from asgiref.sync import sync_to_async
+from django.contrib.auth.models import User
+from django.core.management import call_command
+from django.http import QueryDict
+from django.test import TestCase, override_settings
+from django.utils import timezone
+from rest_framework.authtoken.models import Token
+from rest_framework.test import APIClient
+
+from accounts.models import Member
+
+from products import duplicates, jobs, recommendations
+from products.aggregates import find_review_aggregate_drift, refresh_review_aggregates
+from products.models import (Category, Feedback, PriceHistory, Product, ProductAction, ProductJob, Rating,
+                             ReviewAggregate, SuggestedProduct)
+from products.prices import downsample
+from products.serializers import CategorySerializer
+from products.views import BasicProductReviewView, FeedbackView, ProductView
+from wwreviews.caching import get_model_state
+
+
+def create_moderator(username: str = "moderator") -> APIClient:
+    """
+    Creates a moderator and returns an API client authenticated with their token.
+    """
+    user = User.objects.create(username=username)
+    Member.objects.create(user=user, role=Member.Role.MODERATOR, reddit_username=username)
+    client = APIClient()
+    client.credentials(HTTP_AUTHORIZATION=f"Token {Token.objects.create(user=user).key}")
+    return client
+
+
+def warm_model_states(view):
+    """
+    Computes the cached model states a view's responses are fingerprinted from, so query counts only cover the view.
+    """
+    for model in view.cache_models:
+        get_model_state(model)
+
+
+def create_product(category: Category, index: int = 0) -> Product:
+    return Product.objects.create(
+        name=f"Product {index}",
+        price=10.0 + index,
+        link=f"https://example.com/product-{index}",
+        image_url=f"https://example.com/product-{index}.png",
+        category=category,
+    )
+
+
+class ReviewAggregateTests(TestCase):
+    def setUp(self):
+        self.category = Category.objects.create(name="Power Tools")
+        self.product = create_product(self.category)
+        self.users = [User.objects.create(username=f"user-{i}") for i in range(3)]
+
+    def test_aggregate_tracks_rating_and_feedback_writes(self):
+        ratings = [
+            Rating.objects.create(product=self.product, user=user, value=value)
+            for user, value in zip(self.users, (5, 4, 4))
+        ]
+        Feedback.objects.create(product=self.product, user=self.users[0], text="Great saw.")
+
+        aggregate = ReviewAggregate.objects.get(product=self.product)
+        self.assertEqual((aggregate.rating_count, aggregate.rating_sum, aggregate.feedback_count), (3, 13, 1))
+        self.assertEqual(aggregate.rating_histogram, {0: 0, 1: 0, 2: 0, 3: 0, 4: 2, 5: 1})
+
+        rating = Rating.objects.get(pk=ratings[1].pk)
+        rating.value = 1
+        rating.save()
+        Rating.objects.get(pk=ratings[2].pk).delete()
+        Feedback.objects.get(product=self.product).delete()
+
+        aggregate.refresh_from_db()
+        self.assertEqual((aggregate.rating_count, aggregate.rating_sum, aggregate.feedback_count), (2, 6, 0))
+        self.assertEqual(aggregate.average_rating, 3)
+        self.assertEqual(find_review_aggregate_drift(), {})
+
+    def test_rebuild_command_repairs_drift(self):
+        Rating.objects.create(product=self.product, user=self.users[0], value=3)
+        ReviewAggregate.objects.filter(product=self.product).update(rating_count=7)
+        self.assertIn(self.product.pk, find_review_aggregate_drift())
+
+        call_command("rebuild_review_aggregates", stdout=StringIO())
+        self.assertEqual(find_review_aggregate_drift(), {})
+
+    def test_basic_product_review_reads_aggregates_in_one_query(self):
+        products = [create_product(self.category, i) for i in range(1, 11)]
+        for product in products:
+            Rating.objects.create(product=product, user=self.users[0], value=2)
+
+        ids = ",".join(str(product.pk) for product in products)
+        warm_model_states(BasicProductReviewView)
+        with self.assertNumQueries(1):
+            response = APIClient().get(f"/v1/products/basic-product-review/?ids={ids}")
+        self.assertEqual(len(response.data), 10)
+        self.assertEqual(response.data[0]["average_rating"], 2)
+
+
+class FeedbackViewTests(TestCase):
+    def setUp(self):
+        self.product = create_product(Category.objects.create(name="Hand Tools"))
+
+    def add_reviews(self, count: int, start: int = 0):
+        for i in range(start, start + count):
+            user = User.objects.create(username=f"reviewer-{i}")
+            Rating.objects.create(product=self.product, user=user, value=i % 6)
+            Feedback.objects.create(product=self.product, user=user, text=f"Review {i}")
+
+    def test_list_query_count_does_not_grow_with_page_size(self):
+        # One query validates the product filter, the other fetches the feedback with its users and ratings.
+        self.add_reviews(2)
+        warm_model_states(FeedbackView)
+        with self.assertNumQueries(2):
+            response = APIClient().get(f"/v1/products/feedback/?product={self.product.pk}")
+        self.assertEqual(len(response.data), 2)
+
+        self.add_reviews(20, start=2)
+        warm_model_states(FeedbackView)
+        with self.assertNumQueries(2):
+            response = APIClient().get(f"/v1/products/feedback/?product={self.product.pk}")
+        self.assertEqual(len(response.data), 22)
+        self.assertEqual({row["rating"] for row in response.data}, set(range(6)))
+        self.assertEqual(response.data[0]["username"], "reviewer-0")
+
+    def test_feedback_without_rating_serializes_as_none(self):
+        user = User.objects.create(username="unrated")
+        Feedback.objects.create(product=self.product, user=user, text="Haven't rated it yet.")
+        response = APIClient().get(f"/v1/products/feedback/?product={self.product.pk}")
+        self.assertIsNone(response.data[0]["rating"])
+
+
+class ProductSearchTests(TestCase):
+    def setUp(self):
+        self.category = Category.objects.create(name="Hand Planes")
+        self.plane = Product.objects.create(
+            name="Veritas Low Angle Jack Plane",
+            price=300,
+            link="https://example.com/jack",
+            image_url="https://a.b/c",
+            category=self.category,
+        )
+        self.chisel = Product.objects.create(
+            name="Narex Bench Chisel",
+            price=40,
+            link="https://example.com/chisel",
+            image_url="https://a.b/c",
+            category=Category.objects.create(name="Chisels"),
+        )
+
+    def search(self, query: str) -> list[int]:
+        response = APIClient().get("/v1/products/search/", {"q": query})
+        self.assertEqual(response.status_code, 200)
+        return [result["id"] for result in response.data["results"]]
+
+    def test_search_matches_name_category_and_feedback(self):
+        self.assertEqual(self.search("jack"), [self.plane.pk])
+        self.assertEqual(self.search("plan"), [self.plane.pk])
+        self.assertEqual(self.search("chisels"), [self.chisel.pk])
+
+        Feedback.objects.create(product=self.chisel, user=User.objects.create(username="u"), text="Pairs with a plane")
+        self.assertEqual(self.search("plane"), [self.plane.pk, self.chisel.pk])
+
+    def test_index_follows_updates_and_deletes(self):
+        self.chisel.name = "Narex Mortise Chisel"
+        self.chisel.save()
+        self.assertEqual(self.search("mortise"), [self.chisel.pk])
+
+        self.chisel.delete()
+        self.assertEqual(self.search("narex"), [])
+
+    def test_saving_partially_loaded_products(self):
+        Product.objects.only("price").get(pk=self.chisel.pk).save()
+        self.assertEqual(self.search("chisel"), [self.chisel.pk])
+
+        chisel = Product.objects.only("price").get(pk=self.chisel.pk)
+        chisel.name = "Narex Mortise Chisel"
+        chisel.save()
+        self.assertEqual(self.search("mortise"), [self.chisel.pk])
+
+    def test_search_requires_query(self):
+        self.assertEqual(APIClient().get("/v1/products/search/").status_code, 400)
+
+
+class KeysetPaginationTests(TestCase):
+    def setUp(self):
+        category = Category.objects.create(name="Clamps")
+        self.products = [create_product(category, i) for i in range(7)]
+
+    def get(self, url: str, **params):
+        response = APIClient().get(url, params)
+        self.assertEqual(response.status_code, 200)
+        return response.data
+
+    def test_pages_are_stable_under_inserts(self):
+        page = self.get("/v1/products/product/", page_size=3)
+        self.assertIsNone(page["previous"])
+        seen = [row["id"] for row in page["results"]]
+
+        create_product(self.products[0].category, 100)
+        while page["next"]:
+            page = self.get(page["next"])
+            seen += [row["id"] for row in page["results"]]
+        self.assertEqual(seen, [product.pk for product in reversed(self.products)])
+
+        previous = self.get(page["previous"])
+        self.assertEqual([row["id"] for row in previous["results"]], seen[3:6])
+
+    def test_offset_and_unpaginated_requests_are_unchanged(self):
+        self.assertEqual(len(self.get("/v1/products/product/")), 7)
+        page = self.get("/v1/products/product/", limit=2, offset=2)
+        self.assertEqual((page["count"], len(page["results"])), (7, 2))
+
+    def test_invalid_cursor_is_not_found(self):
+        self.assertEqual(APIClient().get("/v1/products/rating/", {"cursor": "garbage"}).status_code, 404)
+
+
+class CategoryTreeTests(TestCase):
+    def setUp(self):
+        with self.captureOnCommitCallbacks(execute=True):
+            self.tools = Category.objects.create(name="Tools")
+            self.power = Category.objects.create(name="Power Tools", parent=self.tools)
+            self.saws = Category.objects.create(name="Saws", parent=self.power)
+            self.hand = Category.objects.create(name="Hand Tools", parent=self.tools)
+        self.saw = create_product(self.saws, 1)
+        self.chisel = create_product(self.hand, 2)
+
+    def test_paths_follow_moves(self):
+        self.assertEqual(self.saws.path, f"/{self.tools.pk}/{self.power.pk}/{self.saws.pk}/")
+        with self.captureOnCommitCallbacks(execute=True):
+            self.power.parent = self.hand
+            self.power.save()
+        self.saws.refresh_from_db()
+        self.assertEqual(self.saws.path, f"/{self.tools.pk}/{self.hand.pk}/{self.power.pk}/{self.saws.pk}/")
+        self.assertEqual(self.saws.depth, 3)
+        self.assertEqual(set(self.hand.get_descendants()), {self.power, self.saws})
+
+    def test_tree_endpoint(self):
+        response = APIClient().get("/v1/products/category/tree/")
+        self.assertEqual(response.status_code, 200)
+        [root] = response.data
+        self.assertEqual([child["name"] for child in root["children"]], ["Hand Tools", "Power Tools"])
+        self.assertEqual(root["children"][1]["children"][0]["id"], self.saws.pk)
+
+    @override_settings(CACHE_SHARED=True)
+    def test_filter_products_by_ancestor_in_one_query(self):
+        client = APIClient()
+        client.get("/v1/products/category/tree/")
+        warm_model_states(ProductView)
+        with self.assertNumQueries(1):
+            response = client.get("/v1/products/product/", {"category_ancestor": self.power.pk})
+        self.assertEqual([row["id"] for row in response.data], [self.saw.pk])
+        response = client.get("/v1/products/product/", {"category_ancestor": self.tools.pk})
+        self.assertEqual({row["id"] for row in response.data}, {self.saw.pk, self.chisel.pk})
+
+    def test_tree_sees_writes_of_other_processes_without_shared_cache(self):
+        client = APIClient()
+        client.get("/v1/products/category/tree/")
+        # Written without signals, as another process would with a cache of its own.
+        Category.objects.filter(pk=self.hand.pk).update(name="Chisels")
+        [root] = client.get("/v1/products/category/tree/").data
+        self.assertEqual([child["name"] for child in root["children"]], ["Chisels", "Power Tools"])
+
+    def test_cannot_nest_category_under_descendant(self):
+        serializer = CategorySerializer(self.tools, data={"parent": self.saws.pk}, partial=True)
+        self.assertFalse(serializer.is_valid())
+
+
+class ProductUpdateTests(TestCase):
+    def setUp(self):
+        self.client = create_moderator()
+        self.category = Category.objects.create(name="Routers")
+        self.product = create_product(self.category)
+
+    def patch(self, data: dict):
+        response = self.client.patch(f"/v1/products/product/{self.product.pk}/", data, format="json")
+        self.assertEqual(response.status_code, 200, response.data)
+        return response
+
+    def test_records_one_action_per_changed_field(self):
+        other = Category.objects.create(name="Trimmers")
+        self.patch({"price": 99.5, "category": other.pk, "image_url": "https://example.com/new.png"})
+
+        actions = {action.action: action.details for action in ProductAction.objects.filter(product=self.product)}
+        self.assertEqual(
+            actions,
+            {
+                ProductAction.Action.PRICE_UPDATED: {"prev": 10.0, "curr": 99.5},
+                ProductAction.Action.CATEGORY_UDPATED: {"prev": self.category.pk, "curr": other.pk},
+                ProductAction.Action.IMAGE_UPDATED: {
+                    "prev": "https://example.com/product-0.png",
+                    "curr": "https://example.com/new.png",
+                },
+            },
+        )
+
+    def test_unchanged_fields_record_nothing(self):
+        self.patch({"price": self.product.price})
+        self.assertFalse(ProductAction.objects.exists())
+
+    def test_query_count_per_patch(self):
+        # Token lookup with the member, the product fetch, the duplicate link check, savepoint, product update,
+        # duplicate key reindex (lookup, delete and insert), audit insert, price history insert and savepoint release.
+        with self.assertNumQueries(11):
+            self.patch({"price": 12, "link": "https://example.com/a"})
+        with self.assertNumQueries(11):
+            self.patch({"price": 13, "link": "https://example.com/b", "image_url": "https://example.com/b.png"})
+
+
+class CatalogImportExportTests(TestCase):
+    def setUp(self):
+        self.client = create_moderator()
+        self.category = Category.objects.create(name="Drills")
+        self.product = create_product(self.category)
+
+    def import_catalog(self, body: str | bytes, content_type: str = "application/x-ndjson"):
+        return self.client.generic("POST", "/v1/products/product/import/", body, content_type=content_type)
+
+    def test_ndjson_import_creates_and_updates_in_bulk(self):
+        rows = [
+            {
+                "id": self.product.pk,
+                "name": "Renamed",
+                "price": self.product.price,
+                "link": self.product.link,
+                "image_url": self.product.image_url,
+                "category": self.category.pk,
+            },
+            *(
+                {
+                    "name": f"Drill {i}",
+                    "price": i,
+                    "link": f"https://example.com/drill-{i}",
+                    "image_url": "https://example.com/drill.png",
+                    "category": self.category.pk,
+                }
+                for i in range(20)
+            ),
+        ]
+        # Auth, one lookup each for categories, ids and links, the bulk writes (price history included) and the search
+        # and duplicate key reindexes, whatever the size of the import.
+        with self.assertNumQueries(17):
+            response = self.import_catalog("\n".join(json.dumps(row) for row in rows))
+        self.assertEqual(response.data, {"created": 20, "updated": 1, "unchanged": 0, "errors": []})
+        self.assertEqual(
+            list(ProductAction.objects.values_list("action", "details")),
+            [(ProductAction.Action.NAME_UPDATED, {"prev": "Product 0", "curr": "Renamed"})],
+        )
+        self.assertEqual(APIClient().get("/v1/products/search/", {"q": "drill"}).data["count"], 21)
+
+    def test_invalid_rows_roll_back_the_whole_import(self):
+        body = (
+            "name,price,link,image_url,category\n"
+            f"Good,1,https://example.com/good,https://example.com/a.png,{self.category.pk}\n"
+            f"Bad,free,https://example.com/bad,https://example.com/a.png,{self.category.pk}\n"
+            "Orphan,1,https://example.com/orphan,https://example.com/a.png,999\n"
+        )
+        response = self.import_catalog(body, content_type="text/csv")
+        self.assertEqual(response.status_code, 400)
+        self.assertEqual([error["row"] for error in response.data["errors"]], [2, 3])
+        self.assertEqual(Product.objects.count(), 1)
+
+    def test_unparsable_rows_are_reported(self):
+        row = json.dumps(
+            {
+                "name": "Good",
+                "price": 1,
+                "link": "https://example.com/good",
+                "image_url": "https://example.com/a.png",
+                "category": self.category.pk,
+            }
+        )
+        body = b"\n".join([row.encode(), b"[1, 2]", b"{", b'{"name": "\xff"}', b"42"])
+        response = self.import_catalog(body)
+        self.assertEqual(response.status_code, 400)
+        self.assertEqual(
+            [(error["row"], error["errors"]) for error in response.data["errors"]],
+            [
+                (2, "Rows must be JSON objects."),
+                (3, "Invalid JSON: Expecting property name enclosed in double quotes."),
+                (4, "Invalid UTF-8."),
+                (5, "Rows must be JSON objects."),
+            ],
+        )
+
+        body = (
+            "name,price,link,image_url,category\n"
+            f'"Multi\nline",1,https://example.com/a,https://example.com/a.png,{self.category.pk}\n'
+            f"Caf\xe9,1,https://example.com/b,https://example.com/b.png,{self.category.pk}\n"
+        ).encode("latin-1")
+        response = self.import_catalog(body, content_type="text/csv")
+        self.assertEqual(response.status_code, 400)
+        self.assertEqual(response.data["errors"], [{"row": 2, "errors": "Invalid UTF-8."}])
+        self.assertEqual(Product.objects.count(), 1)
+
+    def test_exported_csv_imports_back_unchanged(self):
+        Rating.objects.create(product=self.product, user=User.objects.create(username="rater"), value=4)
+        response = APIClient().get("/v1/products/product/export/", {"type": "csv"})
+        body = b"".join(response.streaming_content).decode()
+        self.assertTrue(body.splitlines()[1].endswith(",Drills,1,4.0,0"))
+
+        response = self.import_catalog(body, content_type="text/csv")
+        self.assertEqual(response.data, {"created": 0, "updated": 0, "unchanged": 1, "errors": []})
+
+    def test_ndjson_export_streams_every_product(self):
+        create_product(self.category, 1)
+        response = APIClient().get("/v1/products/product/export/")
+        rows = [json.loads(line) for line in b"".join(response.streaming_content).splitlines()]
+        self.assertEqual([row["name"] for row in rows], ["Product 0", "Product 1"])
+
+
+@override_settings(CACHE_SHARED=True)
+class ConditionalReadTests(TestCase):
+    def setUp(self):
+        self.category = Category.objects.create(name="Clamps")
+        self.product = create_product(self.category)
+        self.client = APIClient()
+
+    def test_unchanged_list_is_not_modified(self):
+        response = self.client.get("/v1/products/product/")
+        self.assertEqual(response.status_code, 200)
+        etag = response["ETag"]
+        self.assertIn("Last-Modified", response)
+
+        with self.assertNumQueries(0):
+            response = self.client.get("/v1/products/product/", HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, 304)
+        self.assertEqual(response["ETag"], etag)
+
+        response = self.client.get("/v1/products/product/", {"name": "Product 0"}, HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, 200)
+
+    def test_cached_response_is_served_without_queries(self):
+        expected = self.client.get(f"/v1/products/product/{self.product.pk}/").data
+        with self.assertNumQueries(0):
+            response = self.client.get(f"/v1/products/product/{self.product.pk}/")
+        self.assertEqual(response.data, expected)
+
+    def test_writes_invalidate_cached_responses(self):
+        etag = self.client.get("/v1/products/product/")["ETag"]
+        create_moderator().patch(f"/v1/products/product/{self.product.pk}/", {"name": "Renamed"})
+        response = self.client.get("/v1/products/product/", HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.data[0]["name"], "Renamed")
+
+        self.product.delete()
+        self.assertEqual(self.client.get("/v1/products/product/").data, [])
+
+    def test_bulk_aggregate_updates_invalidate_reviews(self):
+        url = f"/v1/products/basic-product-review/?ids={self.product.pk}"
+        etag = self.client.get(url)["ETag"]
+        Rating.objects.create(product=self.product, user=User.objects.create(username="rater"), value=3)
+        response = self.client.get(url, HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.data[0]["rating_count"], 1)
+
+
+class ProductRankingTests(TestCase):
+    def setUp(self):
+        with self.captureOnCommitCallbacks(execute=True):
+            self.tools = Category.objects.create(name="Tools")
+            self.saws = Category.objects.create(name="Saws", parent=self.tools)
+            self.clamps = Category.objects.create(name="Clamps")
+        self.users = [User.objects.create(username=f"rater-{i}") for i in range(20)]
+        # A single perfect rating, many good ratings, many mediocre ratings and no ratings at all.
+        self.lucky, self.good, self.mediocre, self.unrated = (create_product(self.saws, i) for i in range(4))
+        Rating.objects.create(product=self.lucky, user=self.users[0], value=5)
+        for user in self.users:
+            Rating.objects.create(product=self.good, user=user, value=4)
+            Rating.objects.create(product=self.mediocre, user=user, value=2)
+
+    def rank(self, **params) -> list[int]:
+        response = APIClient().get("/v1/products/ranking/", params)
+        self.assertEqual(response.status_code, 200)
+        return [row["id"] for row in response.data]
+
+    def test_scores_are_kept_in_sync_incrementally(self):
+        Rating.objects.filter(product=self.good).first().delete()
+        rating = Rating.objects.get(product=self.lucky)
+        rating.value = 3
+        rating.save()
+        self.assertEqual(find_review_aggregate_drift(), {})
+
+    def test_few_ratings_do_not_outrank_many_good_ones(self):
+        self.assertEqual(self.rank(), [self.good.pk, self.lucky.pk, self.mediocre.pk])
+        self.assertEqual(self.rank(score="wilson"), [self.good.pk, self.mediocre.pk, self.lucky.pk])
+        self.assertEqual(self.rank(min_ratings=0, limit=1, offset=3), [self.unrated.pk])
+
+    def test_trending_favours_recent_ratings(self):
+        Rating.objects.filter(product=self.good).update(created_at=timezone.now() - timedelta(days=60))
+        refresh_review_aggregates()
+        self.assertEqual(self.rank(score="trending")[0], self.mediocre.pk)
+        response = APIClient().get("/v1/products/ranking/", {"score": "trending", "limit": 1})
+        self.assertAlmostEqual(response.data[0]["score"], 20 * 2 / 5, places=3)
+
+    @override_settings(CACHE_SHARED=True)
+    def test_ranking_within_category_in_one_query(self):
+        client = APIClient()
+        client.get("/v1/products/category/tree/")
+        with self.assertNumQueries(1):
+            response = client.get("/v1/products/ranking/", {"category": self.tools.pk})
+        self.assertEqual(response.data[0]["rating_count"], 20)
+        self.assertEqual(self.rank(category=self.clamps.pk), [])
+        self.assertEqual(APIClient().get("/v1/products/ranking/", {"score": "best"}).status_code, 400)
+
+
+class PriceHistoryTests(TestCase):
+    def setUp(self):
+        self.category = Category.objects.create(name="Planes")
+        self.moderator = create_moderator()
+        response = self.moderator.post(
+            "/v1/products/product/",
+            {
+                "name": "Block Plane",
+                "price": 100,
+                "link": "https://example.com/plane",
+                "image_url": "https://example.com/plane.png",
+                "category": self.category.pk,
+            },
+        )
+        self.product = Product.objects.get(pk=response.data["id"])
+        for price in (90, 120, 80):
+            self.moderator.patch(f"/v1/products/product/{self.product.pk}/", {"price": price})
+
+    def history(self) -> list[tuple[float]]:
+        return list(PriceHistory.objects.filter(product=self.product).order_by("created_at").values_list("price"))
+
+    def test_creates_and_updates_record_prices(self):
+        self.moderator.patch(f"/v1/products/product/{self.product.pk}/", {"name": "Low Angle Block Plane"})
+        self.assertEqual(self.history(), [(100,), (90,), (120,), (80,)])
+
+    def test_backfill_matches_recorded_history(self):
+        recorded = self.history()
+        PriceHistory.objects.all().delete()
+        call_command("backfill_price_history", stdout=StringIO())
+        self.assertEqual(self.history(), recorded)
+        call_command("backfill_price_history", stdout=StringIO())
+        self.assertEqual(self.history(), recorded)
+
+    def test_downsampled_series(self):
+        url = f"/v1/products/product/{self.product.pk}/price-history/"
+        response = APIClient().get(url, {"buckets": 1})
+        self.assertIsNone(response.data["previous"])
+        self.assertEqual(
+            [(bucket["min"], bucket["max"], bucket["last"]) for bucket in response.data["buckets"]], [(80, 120, 80)]
+        )
+
+        # Only the last price change falls into the range, the price before it is returned as the previous one.
+        last_change = PriceHistory.objects.order_by("created_at").last().created_at
+        with self.assertNumQueries(3):
+            response = APIClient().get(url, {"start": last_change.isoformat()})
+        self.assertEqual(response.data["previous"], 120)
+        # The last price is carried over into every later bucket.
+        self.assertEqual([bucket["last"] for bucket in response.data["buckets"]], [80] * 100)
+        self.assertEqual(APIClient().get(url, {"buckets": 0}).status_code, 400)
+
+    def test_downsampling_carries_prices_over(self):
+        start = timezone.now()
+        hour = timedelta(hours=1)
+        points = [(start + hour / 2, 90), (start + hour * 3.5, 120)]
+        buckets = downsample(points, start, start + hour * 4, 4, previous=100)
+        self.assertEqual(
+            [(bucket["min"], bucket["max"], bucket["last"]) for bucket in buckets],
+            [(90, 100, 90), (90, 90, 90), (90, 90, 90), (90, 120, 120)],
+        )
+        # No bucket before the first price, and the price replaced right at the start of a bucket is not in it.
+        points = [(start + hour / 2, 90), (start + hour * 2, 120)]
+        self.assertEqual(
+            [(bucket["min"], bucket["max"]) for bucket in downsample(points, start - hour, start + hour * 3, 4)],
+            [(90, 90), (90, 90), (120, 120)],
+        )
+
+
+class RatingHistogramTests(TestCase):
+    def setUp(self):
+        category = Category.objects.create(name="Chisels")
+        self.products = [create_product(category, i) for i in range(100)]
+        users = [User.objects.create(username=f"rater-{i}") for i in range(6)]
+        for product in self.products[:10]:
+            for value, user in enumerate(users):
+                Rating.objects.create(product=product, user=user, value=value if value % 2 else 5)
+
+    def get(self, **params):
+        return APIClient().get("/v1/products/rating/histogram/", params)
+
+    def test_category_page_of_histograms_in_one_query(self):
+        ids = ",".join(str(product.pk) for product in self.products)
+        for live in (False, True):
+            with self.subTest(live=live), self.assertNumQueries(1):
+                response = self.get(ids=ids, live=live)
+            self.assertEqual(len(response.data), 100)
+            self.assertEqual(response.data[self.products[0].pk], {0: 0, 1: 1, 2: 0, 3: 1, 4: 0, 5: 4})
+            self.assertEqual(response.data[self.products[-1].pk], dict.fromkeys(range(6), 0))
+
+    def test_invalid_ids(self):
+        self.assertEqual(self.get(ids=f"{self.products[0].pk},9999").data.keys(), {self.products[0].pk})
+        self.assertEqual(self.get(ids="1,two").status_code, 400)
+        self.assertEqual(self.get(ids=",".join(map(str, range(1, 102)))).status_code, 400)
+        self.assertEqual(self.get().status_code, 400)
+
+
+class ProductBatchTests(TestCase):
+    def setUp(self):
+        self.category = Category.objects.create(name="Planes")
+        self.products = [create_product(self.category, i) for i in range(60)]
+        self.user = User.objects.create(username="rater")
+        self.token = Token.objects.create(user=self.user)
+        for product in self.products[::2]:
+            Rating.objects.create(product=product, user=self.user, value=4)
+        Feedback.objects.create(product=self.products[0], user=self.user, text="Sharp out of the box.")
+
+    def get(self, ids: list[int], client: APIClient | None = None):
+        client = client or APIClient()
+        return client.get("/v1/products/product/batch/", {"ids": ",".join(map(str, ids))})
+
+    def test_constant_queries_and_ids_order(self):
+        client = APIClient()
+        client.credentials(HTTP_AUTHORIZATION=f"Token {self.token.key}")
+        for count in (5, 60):
+            ids = [product.pk for product in reversed(self.products[:count])]
+            # Token lookup with the member and the products with their cards.
+            with self.subTest(count=count), self.assertNumQueries(2):
+                response = self.get(ids, client)
+            self.assertEqual([card["id"] for card in response.data], ids)
+
+        card = response.data[-1]
+        self.assertEqual((card["name"], card["category_name"], card["own_rating"]), ("Product 0", "Planes", 4))
+        self.assertEqual(card["reviews"]["rating_count"], 1)
+        self.assertEqual(card["reviews"]["feedback_count"], 1)
+        self.assertIsNone(response.data[-2]["own_rating"])
+
+    def test_anonymous_and_invalid_ids(self):
+        with self.assertNumQueries(1):
+            response = self.get([self.products[1].pk, 9999])
+        self.assertEqual(len(response.data), 1)
+        self.assertIsNone(response.data[0]["own_rating"])
+        self.assertEqual(response.data[0]["reviews"]["rating_count"], 0)
+        self.assertEqual(self.get(list(range(1, 502))).status_code, 400)
+        self.assertEqual(APIClient().get("/v1/products/product/batch/", {"ids": "1,a"}).status_code, 400)
+
+
+class AsyncCatalogTests(TestCase):
+    def setUp(self):
+        self.category = Category.objects.create(name="Lathes")
+        Category.objects.create(name="Mini lathes", parent=self.category)
+        self.products = [create_product(self.category, i) for i in range(5)]
+        user = User.objects.create(username="rater")
+        Rating.objects.create(product=self.products[0], user=user, value=5)
+
+    async def assertSameAsSync(self, path: str, params: dict | None = None):
+        sync_response = await sync_to_async(APIClient().get)(f"/v1/products/{path}", params)
+        response = await self.async_client.get(f"/v1/products/async/{path}", params)
+        self.assertEqual(response.status_code, sync_response.status_code)
+        # Pagination links point back to the endpoint that served the page.
+        self.assertEqual(
+            json.loads(response.content.decode().replace("/async/", "/")), json.loads(sync_response.content)
+        )
+        return response.json()
+
+    async def test_reads_match_sync_endpoints(self):
+        await self.assertSameAsSync(f"product/{self.products[0].pk}/")
+        await self.assertSameAsSync("product/9999/")
+        await self.assertSameAsSync(f"category/{self.category.pk}/")
+        await self.assertSameAsSync("category/", {"page_size": 10, "no_parent": True})
+        await self.assertSameAsSync("product/", {"page_size": 10, "category_ancestor": self.category.pk})
+        await self.assertSameAsSync(f"basic-product-review/{self.products[0].pk}/")
+        # Unlike the sync endpoint, the async one is always paginated.
+        params = {"ids": f"{self.products[0].pk},{self.products[1].pk}"}
+        sync_reviews = (await sync_to_async(APIClient().get)("/v1/products/basic-product-review/", params)).json()
+        reviews = (await self.async_client.get("/v1/products/async/basic-product-review/", params)).json()
+        self.assertEqual(reviews["results"], sorted(sync_reviews, key=lambda review: -review["id"]))
+        self.assertEqual(reviews["results"][1]["rating_count"], 1)
+
+        page = await self.assertSameAsSync("product/", {"page_size": 2})
+        while page["next"]:
+            page = await self.assertSameAsSync("product/", QueryDict(page["next"].split("?", 1)[1]).dict())
+
+    async def test_invalid_requests(self):
+        self.assertEqual((await self.async_client.get("/v1/products/async/product/", {"price": "x"})).status_code, 400)
+        response = await self.async_client.get("/v1/products/async/product/", {"cursor": "x"})
+        self.assertEqual(response.status_code, 404)
+        self.assertEqual((await self.async_client.post("/v1/products/async/product/")).status_code, 405)
+
+
+class RatingUpsertTests(TestCase):
+    def setUp(self):
+        category = Category.objects.create(name="Drills")
+        self.products = [create_product(category, i) for i in range(50)]
+        self.user = User.objects.create(username="rater")
+        self.client = APIClient()
+        self.client.credentials(HTTP_AUTHORIZATION=f"Token {Token.objects.create(user=self.user).key}")
+        self.rating = Rating.objects.create(product=self.products[0], user=self.user, value=1)
+
+    def upsert(self, data):
+        return self.client.put("/v1/products/rating/upsert/", data, format="json")
+
+    def test_upsert_creates_and_updates_with_consistent_aggregates(self):
+        data = [{"product": product.pk, "value": 4} for product in self.products]
+        # Token lookup, product check, savepoint, previous ratings, upsert, aggregate refresh (grouped ratings,
+        # feedback, trending weights and aggregate upsert), reading back the ratings and releasing the savepoint.
+        with self.assertNumQueries(11):
+            response = self.upsert(data)
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual([rating["product"] for rating in response.data], [product.pk for product in self.products])
+        self.assertEqual(response.data[0]["id"], self.rating.pk)
+        self.assertEqual(Rating.objects.filter(user=self.user, value=4).count(), 50)
+        self.assertEqual(find_review_aggregate_drift(), {})
+        self.assertEqual(ReviewAggregate.objects.get(product=self.products[0]).rating_histogram[4], 1)
+
+        # Repeating the request writes nothing.
+        with self.assertNumQueries(6):
+            self.assertEqual(self.upsert(data).data, response.data)
+
+        response = self.upsert({"product": self.products[1].pk, "value": 2})
+        self.assertEqual([rating["value"] for rating in response.data], [2])
+        self.assertEqual(find_review_aggregate_drift(), {})
+
+    def test_invalid_upserts(self):
+        self.assertEqual(APIClient().put("/v1/products/rating/upsert/", [], format="json").status_code, 401)
+        self.assertEqual(self.upsert([]).status_code, 400)
+        self.assertEqual(self.upsert([{"product": self.products[0].pk, "value": 6}]).status_code, 400)
+        self.assertEqual(self.upsert([{"product": 9999, "value": 3}]).status_code, 400)
+        duplicated = [{"product": self.products[0].pk, "value": 3}, {"product": self.products[0].pk, "value": 4}]
+        self.assertEqual(self.upsert(duplicated).status_code, 400)
+        self.assertEqual(self.upsert([{"product": 1, "value": 1}] * 501).status_code, 400)
+        self.assertEqual(Rating.objects.get(pk=self.rating.pk).value, 1)
+
+
+@override_settings(DEFER_REVIEW_SIDE_EFFECTS=True)
+class ProductJobTests(TestCase):
+    def setUp(self):
+        self.category = Category.objects.create(name="Drills")
+        self.products = [create_product(self.category, i) for i in range(3)]
+        self.user = User.objects.create(username="reviewer")
+        self.client = APIClient()
+        self.client.credentials(HTTP_AUTHORIZATION=f"Token {Token.objects.create(user=self.user).key}")
+
+    def queued(self) -> set[tuple[int, int]]:
+        return set(ProductJob.objects.values_list("kind", "product_id"))
+
+    def test_writes_enqueue_coalesced_jobs(self):
+        product = self.products[0]
+        response = self.client.post("/v1/products/rating/", {"product": product.pk, "value": 4})
+        self.assertEqual(response.status_code, 201)
+        self.client.patch(f"/v1/products/rating/{response.data['id']}/", {"value": 2})
+        self.client.post("/v1/products/feedback/", {"product": product.pk, "text": "Sturdy drill"})
+        self.assertEqual(
+            self.queued(),
+            {(ProductJob.Kind.REVIEW_AGGREGATE, product.pk), (ProductJob.Kind.SEARCH_INDEX, product.pk)},
+        )
+        # Nothing is updated until the jobs run.
+        self.assertEqual(ReviewAggregate.objects.get(product=product).rating_count, 0)
+        self.assertNotEqual(find_review_aggregate_drift(), {})
+
+        self.assertEqual(jobs.process_jobs(), (2, 0))
+        self.assertEqual(self.queued(), set())
+        self.assertEqual(find_review_aggregate_drift(), {})
+        self.assertEqual(APIClient().get("/v1/products/search/", {"q": "sturdy"}).data["count"], 1)
+
+    def test_bulk_writes_and_deletes_enqueue_jobs(self):
+        response = self.client.put(
+            "/v1/products/rating/upsert/",
+            [{"product": product.pk, "value": 3} for product in self.products],
+            format="json",
+        )
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(self.queued(), {(ProductJob.Kind.REVIEW_AGGREGATE, product.pk) for product in self.products})
+        self.assertEqual(jobs.process_jobs(batch_size=2), (2, 0))
+        self.assertEqual(jobs.process_jobs(batch_size=2), (1, 0))
+
+        deleted_ids = [self.products[0].pk, self.products[1].pk]
+        self.products[0].delete()
+        Rating.objects.filter(product=self.products[1]).delete()
+        self.assertEqual(self.queued(), {(ProductJob.Kind.REVIEW_AGGREGATE, product_id) for product_id in deleted_ids})
+        self.assertEqual(jobs.process_jobs(), (2, 0))
+        self.assertEqual(find_review_aggregate_drift(), {})
+
+    def test_failed_jobs_are_retried_with_backoff(self):
+        Rating.objects.bulk_create([Rating(product=product, user=self.user, value=5) for product in self.products])
+        jobs.enqueue(ProductJob.Kind.REVIEW_AGGREGATE, [product.pk for product in self.products])
+        failing = self.products[1].pk
+
+        def refresh(product_ids):
+            if failing in product_ids:
+                raise ValueError("Refresh failed")
+            refresh_review_aggregates(product_ids)
+
+        with mock.patch.dict(jobs.HANDLERS, {ProductJob.Kind.REVIEW_AGGREGATE: refresh}), self.assertLogs(
+            "products.jobs", "ERROR"
+        ):
+            self.assertEqual(jobs.process_jobs(), (2, 1))
+        job = ProductJob.objects.get()
+        self.assertEqual((job.product_id, job.attempts), (failing, 1))
+        self.assertIn("Refresh failed", job.last_error)
+        self.assertGreater(job.run_after, timezone.now())
+        self.assertEqual(list(find_review_aggregate_drift()), [failing])
+
+        # The job is not due again until its backoff has passed, or a new write to the product.
+        self.assertEqual(jobs.process_jobs(), (0, 0))
+        Rating.objects.create(product_id=failing, user=User.objects.create(username="other"), value=4)
+        self.assertEqual(ProductJob.objects.get().attempts, 0)
+        self.assertEqual(jobs.process_jobs(), (1, 0))
+        self.assertEqual(find_review_aggregate_drift(), {})
+
+    def test_jobs_failing_too_often_are_dead_lettered(self):
+        product = self.products[0]
+        jobs.enqueue(ProductJob.Kind.REVIEW_AGGREGATE, [product.pk])
+        ProductJob.objects.update(attempts=jobs.MAX_ATTEMPTS - 1)
+
+        def refresh(product_ids):
+            raise ValueError("Refresh failed")
+
+        with mock.patch.dict(jobs.HANDLERS, {ProductJob.Kind.REVIEW_AGGREGATE: refresh}), self.assertLogs(
+            "products.jobs", "ERROR"
+        ) as logs:
+            self.assertEqual(jobs.process_jobs(), (0, 1))
+        self.assertIn("giving up", logs.output[0])
+        self.assertIsNotNone(ProductJob.objects.get().failed_at)
+        ProductJob.objects.update(run_after=timezone.now())
+        self.assertEqual(jobs.process_jobs(), (0, 0))
+
+        # A new write to the product gives the job all its attempts again.
+        Rating.objects.create(product=product, user=self.user, value=4)
+        job = ProductJob.objects.get(kind=ProductJob.Kind.REVIEW_AGGREGATE)
+        self.assertEqual((job.attempts, job.failed_at), (0, None))
+        with mock.patch.dict(jobs.HANDLERS, {ProductJob.Kind.REVIEW_AGGREGATE: refresh}), self.assertLogs(
+            "products.jobs", "ERROR"
+        ) as logs:
+            self.assertEqual(jobs.process_jobs(), (0, 1))
+        self.assertNotIn("giving up", logs.output[0])
+        ProductJob.objects.update(run_after=timezone.now())
+        self.assertEqual(jobs.process_jobs(), (1, 0))
+        self.assertEqual(find_review_aggregate_drift(), {})
+
+    def test_claimed_jobs_are_leased(self):
+        Rating.objects.create(product=self.products[0], user=self.user, value=4)
+        claimed, _ = jobs._claim(10)  # pylint: disable=W0212
+        self.assertEqual(len(claimed), 1)
+        # A worker died with the jobs claimed: they are not run again until their lease expires.
+        self.assertEqual(jobs.process_jobs(), (0, 0))
+        with mock.patch("django.utils.timezone.now", return_value=timezone.now() + jobs.LEASE):
+            self.assertEqual(jobs.process_jobs(), (1, 0))
+        self.assertEqual(find_review_aggregate_drift(), {})
+
+    def test_jobs_enqueued_while_running_are_kept_due(self):
+        product = self.products[0]
+        jobs.enqueue(ProductJob.Kind.REVIEW_AGGREGATE, [product.pk])
+
+        def refresh(product_ids):
+            refresh_review_aggregates(product_ids)
+            Rating.objects.create(product=product, user=self.user, value=4)
+
+        with mock.patch.dict(jobs.HANDLERS, {ProductJob.Kind.REVIEW_AGGREGATE: refresh}):
+            self.assertEqual(jobs.process_jobs(), (1, 0))
+        self.assertLessEqual(ProductJob.objects.get(kind=ProductJob.Kind.REVIEW_AGGREGATE).run_after, timezone.now())
+        self.assertEqual(jobs.process_jobs(), (1, 0))
+        self.assertEqual(find_review_aggregate_drift(), {})
+
+    def test_worker_command(self):
+        Feedback.objects.create(product=self.products[2], user=self.user, text="Loud")
+        out = StringIO()
+        call_command("process_product_jobs", "--once", stdout=out)
+        self.assertIn("Ran 2 product job(s), 0 failed.", out.getvalue())
+        self.assertFalse(ProductJob.objects.exists())
+        self.assertEqual(ReviewAggregate.objects.get(product=self.products[2]).feedback_count, 1)
+
+
+class SuggestionReviewTests(TestCase):
+    def setUp(self):
+        self.client = create_moderator()
+        self.drills = Category.objects.create(name="Drills")
+        self.saws = Category.objects.create(name="Saws")
+        self.existing = create_product(self.drills)
+        self.user = User.objects.create(username="suggester")
+
+    def suggest(self, name: str, link: str, category: str | None = None) -> SuggestedProduct:
+        return SuggestedProduct.objects.create(
+            name=name,
+            price=10,
+            link=link,
+            image_url="https://example.com/image.png",
+            user=self.user,
+            category=category,
+        )
+
+    def review(self, data: dict):
+        return self.client.post("/v1/products/suggested-product/review/", data, format="json")
+
+    def test_queue_groups_duplicates_and_resolves_categories(self):
+        first = self.suggest("Track Saw", "https://www.example.com/saw/", " saws ")
+        same_link = self.suggest("Plunge saw", "http://example.com/saw#reviews")
+        same_name = self.suggest("track  saw", "https://example.com/other-saw")
+        existing = self.suggest("Drill", self.existing.link, "Unknown")
+        with self.assertNumQueries(4):
+            response = self.client.get("/v1/products/suggested-product/queue/")
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(
+            [(group["ids"], group["category"], group["product"]) for group in response.data],
+            [([first.pk, same_link.pk, same_name.pk], self.saws.pk, None), ([existing.pk], None, self.existing.pk)],
+        )
+        self.assertEqual(response.data[0]["suggestion"]["name"], "Track Saw")
+        self.assertEqual(len(self.client.get("/v1/products/suggested-product/queue/", {"limit": 1}).data), 1)
+
+    def test_bulk_review_creates_products_in_constant_queries(self):
+        saws = [self.suggest(f"Saw {i}", f"https://example.com/saw-{i}", "Saws") for i in range(100)]
+        drills = [self.suggest(f"Drill {i}", f"https://example.com/drill-{i}") for i in range(100)]
+        existing = self.suggest("Drill", self.existing.link)
+        rejected = [self.suggest(f"Spam {i}", f"https://example.com/spam-{i}") for i in range(50)]
+        data = {
+            "approve": [
+                *({"ids": [suggestion.pk]} for suggestion in saws),
+                *({"ids": [suggestion.pk], "category": self.drills.pk} for suggestion in drills),
+                {"ids": [existing.pk]},
+            ],
+            "reject": [suggestion.pk for suggestion in rejected],
+        }
+        # Auth, savepoint, locking the suggestions, categories by name and by id, products by link, the product,
+        # aggregate and price history inserts, the search and duplicate key reindexes, suggestion updates and
+        # rejections, and release. On SQLite, the product, aggregate, duplicate key and suggestion writes are split into
+        # batches by the query parameter limit.
+        with self.assertNumQueries(28):
+            response = self.review(data)
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(
+            {key: response.data[key] for key in ("approved", "rejected", "created", "errors")},
+            {"approved": 201, "rejected": 50, "created": 200, "errors": []},
+        )
+        self.assertEqual(response.data["products"][-1], self.existing.pk)
+        saw = Product.objects.get(pk=response.data["products"][0])
+        self.assertEqual((saw.name, saw.category_id, saw.link), ("Saw 0", self.saws.pk, "https://example.com/saw-0"))
+        self.assertEqual(Product.objects.filter(category=self.drills).count(), 101)
+        self.assertEqual(PriceHistory.objects.filter(product=saw).count(), 1)
+        self.assertEqual(find_review_aggregate_drift(), {})
+        self.assertEqual(APIClient().get("/v1/products/search/", {"q": "saw"}).data["count"], 100)
+        self.assertEqual(SuggestedProduct.objects.get(pk=existing.pk).product_id, self.existing.pk)
+        self.assertEqual(SuggestedProduct.objects.filter(status=SuggestedProduct.Status.REJECTED).count(), 50)
+        self.assertEqual(self.client.get("/v1/products/suggested-product/queue/").data, [])
+
+    def test_invalid_reviews_write_nothing(self):
+        unresolved = self.suggest("Chisel", "https://example.com/chisel", "Chisels")
+        resolved = self.suggest("Saw", "https://example.com/saw", "Saws")
+        response = self.review({"approve": [{"ids": [resolved.pk]}, {"ids": [unresolved.pk]}]})
+        self.assertEqual(response.status_code, 400)
+        self.assertEqual(response.data["errors"][0]["approve"], 1)
+        self.assertEqual(self.review({"approve": [{"ids": [resolved.pk], "category": 9999}]}).status_code, 400)
+        self.assertEqual(self.review({"reject": [resolved.pk, resolved.pk]}).status_code, 400)
+        self.assertEqual(self.review({}).status_code, 400)
+        self.assertEqual(self.review({"reject": [9999]}).status_code, 400)
+        self.assertEqual(Product.objects.count(), 1)
+        self.assertFalse(SuggestedProduct.objects.exclude(status=SuggestedProduct.Status.PENDING).exists())
+
+        self.assertEqual(self.review({"reject": [resolved.pk]}).data["rejected"], 1)
+        self.assertEqual(self.review({"reject": [resolved.pk]}).status_code, 400)
+
+    def test_only_moderators_review(self):
+        client = APIClient()
+        client.credentials(HTTP_AUTHORIZATION=f"Token {Token.objects.create(user=self.user).key}")
+        self.assertEqual(client.get("/v1/products/suggested-product/queue/").status_code, 401)
+        self.assertEqual(client.post("/v1/products/suggested-product/review/", {}, format="json").status_code, 401)
+        response = client.post(
+            "/v1/products/suggested-product/",
+            {
+                "name": "Saw",
+                "price": 1,
+                "link": "https://example.com/saw",
+                "image_url": "https://example.com/saw.png",
+                "status": SuggestedProduct.Status.APPROVED,
+            },
+        )
+        self.assertEqual(response.data["status"], SuggestedProduct.Status.PENDING)
+
+
+class DuplicateDetectionTests(TestCase):
+    def setUp(self):
+        self.client = create_moderator()
+        self.category = Category.objects.create(name="Drills")
+        self.drill = Product.objects.create(
+            name="DeWalt DCD771 Cordless Drill",
+            price=99,
+            link="https://www.example.com/drills/dcd771/?utm_source=reddit&color=yellow",
+            image_url="https://example.com/drill.png",
+            category=self.category,
+        )
+        self.saw = Product.objects.create(
+            name="Festool TS 55 Track Saw",
+            price=599,
+            link="https://example.com/saws/ts55",
+            image_url="https://example.com/saw.png",
+            category=self.category,
+        )
+
+    def find(self, name: str, link: str) -> list[dict]:
+        return APIClient().get("/v1/products/product/duplicates/", {"name": name, "link": link}).data
+
+    def test_normalize_link(self):
+        self.assertEqual(
+            duplicates.normalize_link("HTTPS://WWW.Example.com:443/a/b/?utm_medium=x&b=2&a=1&fbclid=y#reviews"),
+            "example.com/a/b?a=1&b=2",
+        )
+        self.assertEqual(duplicates.normalize_link("http://example.com/a"), "example.com/a")
+        self.assertNotEqual(duplicates.normalize_link("http://example.com/a?id=1"), "example.com/a?id=2")
+
+    def test_finds_same_links_and_similar_names(self):
+        with self.assertNumQueries(1):
+            found = self.find("Cordless drill", "http://example.com/drills/dcd771?color=yellow&fbclid=abc")
+        self.assertEqual(
+            [(duplicate["product"], duplicate["same_link"]) for duplicate in found], [(self.drill.pk, True)]
+        )
+
+        found = self.find("Dewalt DCD771 cordless drill kit", "https://example.com/other")
+        self.assertEqual([duplicate["product"] for duplicate in found], [self.drill.pk])
+        self.assertGreater(found[0]["similarity"], 0.7)
+        self.assertFalse(found[0]["same_link"])
+        self.assertEqual(self.find("Veritas Low Angle Jack Plane", "https://example.com/plane"), [])
+        self.assertEqual(APIClient().get("/v1/products/product/duplicates/", {"name": "x"}).status_code, 400)
+
+        # Renamed products are reindexed.
+        self.saw.name = "Makita Router"
+        self.saw.save()
+        self.assertEqual(self.find("Festool TS 55 Track Saw", "https://example.com/saw"), [])
+        self.assertEqual(self.find("Makita router", "https://example.com/router")[0]["product"], self.saw.pk)
+
+    def test_saving_partially_loaded_products(self):
+        Product.objects.only("price").get(pk=self.saw.pk).save()
+        self.assertEqual(self.find("Festool TS 55 Track Saw", "https://example.com/saw")[0]["product"], self.saw.pk)
+
+        saw = Product.objects.only("price").get(pk=self.saw.pk)
+        saw.name = "Makita Router"
+        saw.save()
+        self.assertEqual(self.find("Makita router", "https://example.com/router")[0]["product"], self.saw.pk)
+
+    def test_creating_a_product_with_a_duplicate_link_fails(self):
+        data = {
+            "name": "Drill",
+            "price": 90,
+            "link": "http://example.com/drills/dcd771?color=yellow",
+            "image_url": "https://example.com/drill.png",
+            "category": self.category.pk,
+        }
+        response = self.client.post("/v1/products/product/", data)
+        self.assertEqual(response.status_code, 400)
+        self.assertIn(str(self.drill.pk), str(response.data["link"]))
+        response = self.client.patch(f"/v1/products/product/{self.drill.pk}/", {"link": data["link"]})
+        self.assertEqual(response.status_code, 200)
+
+    def test_suggestions_are_created_with_their_duplicates(self):
+        user = User.objects.create(username="suggester")
+        client = APIClient()
+        client.credentials(HTTP_AUTHORIZATION=f"Token {Token.objects.create(user=user).key}")
+        data = {
+            "name": "Festool TS-55 track saw",
+            "price": 1,
+            "link": "https://example.com/ts55",
+            "image_url": "https://example.com/a.png",
+        }
+        first = client.post("/v1/products/suggested-product/", data)
+        self.assertEqual(first.status_code, 201)
+        self.assertEqual([duplicate["product"] for duplicate in first.data["duplicates"]], [self.saw.pk])
+        second = client.post("/v1/products/suggested-product/", {**data, "name": "Saw"})
+        self.assertEqual(
+            [(duplicate["suggestion"], duplicate["same_link"]) for duplicate in second.data["duplicates"]],
+            [(first.data["id"], True)],
+        )
+
+    def test_command_finds_duplicate_clusters(self):
+        for name, link in (
+            ("DeWalt DCD771 cordless drill", "https://example.com/drills/dcd771-b"),
+            ("Stanley No. 4 Plane", "http://example.com/drills/dcd771-b/"),
+            ("Veritas Low Angle Jack Plane", "https://example.com/planes/jack"),
+        ):
+            Product.objects.create(
+                name=name, price=1, link=link, image_url="https://example.com/a.png", category=self.category
+            )
+        out = StringIO()
+        call_command("find_duplicate_products", "--rebuild-index", stdout=out)
+        self.assertIn("Found 1 cluster(s) of duplicate products.", out.getvalue())
+        clusters = duplicates.find_clusters()
+        self.assertEqual(
+            [[product.name for product in cluster] for cluster in clusters],
+            [["DeWalt DCD771 Cordless Drill", "DeWalt DCD771 cordless drill", "Stanley No. 4 Plane"]],
+        )
+
+
+class RecommendationTests(TestCase):
+    def setUp(self):
+        category = Category.objects.create(name="Planes")
+        self.products = [create_product(category, i) for i in range(5)]
+        ratings = {
+            "alice": (5, 5, 1, None, None),
+            "bob": (4, 5, 0, 4, None),
+            "carol": (1, 0, 5, None, 3),
+            "dave": (5, None, None, None, None),
+        }
+        for username, values in ratings.items():
+            user = User.objects.create(username=username)
+            for product, value in zip(self.products, values):
+                if value is not None:
+                    Rating.objects.create(product=product, user=user, value=value)
+        self.dave = User.objects.get(username="dave")
+        self.client = APIClient()
+        self.client.credentials(HTTP_AUTHORIZATION=f"Token {Token.objects.create(user=self.dave).key}")
+
+    def test_neighbors_match_adjusted_cosine(self):
+        rng = random.Random(0)
+        ratings = {(user, product): rng.randint(0, 5) for user in range(30) for product in rng.sample(range(12), 6)}
+        users, products, values = zip(*((user, product, value) for (user, product), value in ratings.items()))
+        sources, targets, scores = recommendations.compute_neighbors(users, products, values, neighbors=3)
+
+        means = {user: sum(v for (u, _), v in ratings.items() if u == user) / 6 for user in range(30)}
+        vectors = {
+            product: {user: value - means[user] for (user, p), value in ratings.items() if p == product}
+            for product in range(12)
+        }
+
+        def cosine(first: dict, second: dict) -> float:
+            dot = sum(value * second.get(user, 0) for user, value in first.items())
+            norms = math.sqrt(sum(v * v for v in first.values())) * math.sqrt(sum(v * v for v in second.values()))
+            return dot / norms
+
+        for product in range(12):
+            expected = sorted(
+                (score, other)
+                for other in range(12)
+                if other != product and (score := cosine(vectors[product], vectors[other])) > 1e-9
+            )[-3:]
+            found = sorted(
+                (score, target) for source, target, score in zip(sources, targets, scores) if source == product
+            )
+            self.assertEqual([other for _, other in found], [other for _, other in expected])
+            for (score, _), (expected_score, _) in zip(found, expected):
+                self.assertAlmostEqual(score, expected_score)
+
+    def test_similar_and_recommended_products(self):
+        out = StringIO()
+        call_command("build_recommendations", stdout=out)
+        self.assertIn("Stored", out.getvalue())
+        first, second, disliked = self.products[:3]
+
+        with self.assertNumQueries(1):
+            response = APIClient().get(f"/v1/products/product/{first.pk}/similar/")
+        self.assertEqual(response.status_code, 200)
+        similar = [product["id"] for product in response.data]
+        self.assertEqual(similar[0], second.pk)
+        self.assertNotIn(disliked.pk, similar)
+        self.assertNotIn(first.pk, similar)
+        self.assertGreater(response.data[0]["score"], 0)
+        self.assertEqual(response.data[0]["category_name"], "Planes")
+        self.assertEqual(APIClient().get("/v1/products/product/abc/similar/").status_code, 404)
+
+        # Token lookup and the recommendations.
+        with self.assertNumQueries(2):
+            response = self.client.get("/v1/products/product/recommended/", {"limit": 2})
+        recommended = [product["id"] for product in response.data]
+        self.assertEqual(recommended[0], second.pk)
+        self.assertNotIn(first.pk, recommended)
+        self.assertLessEqual(len(recommended), 2)
+
+        self.assertEqual(APIClient().get("/v1/products/product/recommended/").status_code, 401)
+        self.assertEqual(self.client.get("/v1/products/product/recommended/", {"limit": 0}).status_code, 400)
+
+        # Rebuilding replaces the previous neighbors.
+        Rating.objects.all().delete()
+        call_command("build_recommendations", stdout=StringIO())
+        self.assertEqual(APIClient().get(f"/v1/products/product/{first.pk}/similar/").data, [])
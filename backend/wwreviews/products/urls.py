@@ -1,8 +1,9 @@
 from django.urls import include, path
 from rest_framework.routers import DefaultRouter
 
-from products.views import (BasicProductReviewView, CategoryView, FeedbackView, ProductActionView, ProductView,
-                            RatingView, SuggestedProductView)
+from products.async_views import AsyncBasicProductReviewView, AsyncCategoryView, AsyncProductView
+from products.views import (BasicProductReviewView, CategoryView, FeedbackView, ProductActionView,
+                            ProductRankingView, ProductSearchView, ProductView, RatingView, SuggestedProductView)
 
 router = DefaultRouter()
 router.register("product", ProductView)
@@ -12,7 +13,15 @@ router.register("category", CategoryView)
 router.register("rating", RatingView)
 router.register("feedback", FeedbackView)
 router.register("basic-product-review", BasicProductReviewView)
+router.register("search", ProductSearchView, basename="search")
+router.register("ranking", ProductRankingView, basename="ranking")
 
 urlpatterns = [
     path("", include(router.urls)),
+    path("async/product/", AsyncProductView.as_view()),
+    path("async/product/<int:pk>/", AsyncProductView.as_view()),
+    path("async/category/", AsyncCategoryView.as_view()),
+    path("async/category/<int:pk>/", AsyncCategoryView.as_view()),
+    path("async/basic-product-review/", AsyncBasicProductReviewView.as_view()),
+    path("async/basic-product-review/<int:pk>/", AsyncBasicProductReviewView.as_view()),
 ]
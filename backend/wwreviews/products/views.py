@@ -1,17 +1,35 @@
-from django_filters import BaseInFilter, BooleanFilter, FilterSet
+from django.contrib.auth.models import User
+from django.db import transaction
+from django.http import StreamingHttpResponse
+from django.utils import timezone
+from django_filters import BaseInFilter, BooleanFilter, FilterSet, NumberFilter
 from django_filters.rest_framework import DjangoFilterBackend
 from rest_framework import status
+from rest_framework.decorators import action
+from rest_framework.exceptions import NotFound
 from rest_framework.pagination import LimitOffsetPagination
+from rest_framework.permissions import AllowAny
 from rest_framework.response import Response
-from rest_framework.viewsets import ModelViewSet, ReadOnlyModelViewSet
-
-from accounts.models import Member
-from products.models import Category, Feedback, Product, ProductAction, Rating, SuggestedProduct
-from products.serializers import (BasicProductReviewSerializer, CategorySerializer, FeedbackSerializer,
-                                  ProductActionSerializer, ProductSerializer, RatingSerializer,
-                                  SuggestedProductSerializer)
-from wwreviews.utils import (READ_ACTIONS, CreateUserFieldMixin, DisablePutMixin, IsAuthenticatedView,
-                             UnauthenticatedReadMixin)
+from rest_framework.viewsets import GenericViewSet, ModelViewSet, ReadOnlyModelViewSet
+
+from accounts.permissions import is_moderator
+from products import aggregates, catalog, duplicates, prices, ranking, ratings, recommendations, suggestions
+from products.categories import get_category_tree
+from products.models import (Category, Feedback, PriceHistory, Product, ProductAction, Rating, ReviewAggregate,
+                             SuggestedProduct)
+from products.search import SearchResults
+from products.serializers import (BasicProductReviewSerializer, CategorySerializer, DuplicateQuerySerializer,
+                                  DuplicateSerializer, FeedbackSerializer, PriceHistoryQuerySerializer,
+                                  ProductActionSerializer, ProductBatchQuerySerializer, ProductCardSerializer,
+                                  ProductSearchResultSerializer, ProductSerializer, RankedProductSerializer,
+                                  RankingQuerySerializer, RatingHistogramQuerySerializer, RatingSerializer,
+                                  RatingUpsertSerializer, RecommendationQuerySerializer, RecommendedProductSerializer,
+                                  SuggestedProductSerializer, SuggestionGroupSerializer, SuggestionQueueQuerySerializer,
+                                  SuggestionReviewSerializer)
+from wwreviews.caching import ConditionalReadMixin
+from wwreviews.pagination import IdKeysetPagination, KeysetPagination
+from wwreviews.utils import (READ_ACTIONS, AtomicWriteMixin, CreateUserFieldMixin, DisablePutMixin,
+                             IsAuthenticatedView, UnauthenticatedReadMixin)
 
 
 class SuggestedProductView(CreateUserFieldMixin, IsAuthenticatedView):
@@ -19,19 +37,71 @@ class SuggestedProductView(CreateUserFieldMixin, IsAuthenticatedView):
     serializer_class = SuggestedProductSerializer
     filter_backends = [DjangoFilterBackend]
     filterset_fields = []
+    pagination_class = KeysetPagination
 
     def get_queryset(self):
         if self.request is None or self.request.user is None:
             return self.queryset.none()
-        if self.request.user.member.role == Member.Role.MODERATOR:
-            return self.queryset
+        if is_moderator(self.request):
+            # Cloned, since no filter does it here and the class-level queryset would cache its results otherwise.
+            return self.queryset.all()
         return self.queryset.filter(user=self.request.user)
 
     def retrieve(self, request, *args, **kwargs):
         return super().retrieve(request, *args, **kwargs)
 
+    def create(self, request, *args, **kwargs):
+        """
+        Creates the suggestion, and returns it with its near-duplicate products and pending suggestions in `duplicates`
+        so the suggester can be warned about them.
+        """
+        response = super().create(request, *args, **kwargs)
+        if response.status_code == status.HTTP_201_CREATED:
+            found = duplicates.find_duplicates(response.data["name"], response.data["link"])
+            found = [duplicate for duplicate in found if duplicate.suggestion_id != response.data["id"]]
+            response.data["duplicates"] = DuplicateSerializer(found, many=True).data
+        return response
+
+    @action(detail=False, methods=["get"], url_path="queue")
+    def queue(self, request):
+        """
+        Gets up to `limit` groups of pending suggestions of the same product (by link or name), oldest first, with the
+        id of the category resolved from their category names and of the existing product with their link, if any.
+        """
+        if not is_moderator(request):
+            return Response(
+                {"message": "You are not authorized to review 'SuggestedProduct' resources."},
+                status=status.HTTP_401_UNAUTHORIZED,
+            )
+        params = SuggestionQueueQuerySerializer(data=request.query_params)
+        if not params.is_valid():
+            return Response(params.errors, status=status.HTTP_400_BAD_REQUEST)
+        groups = suggestions.review_queue(params.validated_data["limit"])
+        return Response(SuggestionGroupSerializer(groups, many=True).data, status=status.HTTP_200_OK)
+
+    @action(detail=False, methods=["post"], url_path="review")
+    def review(self, request):
+        """
+        Approves and rejects up to 1000 pending suggestions at once, given as `{"approve": [{"ids": [1, 2],
+        "category": 3}], "reject": [4]}`. Each approval creates one product (unless one with the same link exists) from
+        the given suggestions, in the given category or the one resolved from the suggestions. The review is all or
+        nothing: if any suggestion cannot be reviewed, nothing is written and the errors are returned.
+        """
+        if not is_moderator(request):
+            return Response(
+                {"message": "You are not authorized to review 'SuggestedProduct' resources."},
+                status=status.HTTP_401_UNAUTHORIZED,
+            )
+        serializer = SuggestionReviewSerializer(data=request.data)
+        if not serializer.is_valid():
+            return Response(serializer.errors, status=status.HTTP_400_BAD_REQUEST)
+        result = suggestions.review_suggestions(**serializer.validated_data)
+        return Response(result.as_dict(), status=status.HTTP_400_BAD_REQUEST if result.errors else status.HTTP_200_OK)
+
 
 class ProductFilter(FilterSet):
+    category_ancestor = NumberFilter(method="filter_category_ancestor")
+
     class Meta:
         model = Product
         fields = {
@@ -40,25 +110,36 @@ class ProductFilter(FilterSet):
             "link": ["exact"],
         }
 
+    def filter_category_ancestor(self, queryset, name, value):
+        """
+        Filters the products in the given category or any of its descendant categories.
+        """
+        node = get_category_tree().get(int(value))
+        if node is None:
+            return queryset.none()
+        return queryset.filter(**Category.subtree_lookup(node.path, prefix="category__"))
 
-class ProductView(UnauthenticatedReadMixin, DisablePutMixin, ModelViewSet):
+
+class ProductView(ConditionalReadMixin, UnauthenticatedReadMixin, DisablePutMixin, ModelViewSet):
     queryset = Product.objects.all()
+    cache_models = (Product, Category)
     serializer_class = ProductSerializer
     filter_backends = [DjangoFilterBackend]
     filterset_class = ProductFilter
-    pagination_class = LimitOffsetPagination
+    pagination_class = KeysetPagination
+    read_actions = READ_ACTIONS | {"export_catalog", "price_history", "batch", "find_duplicates", "similar"}
 
     def get_queryset(self):
         if self.request is None:
             return self.queryset.none()
-        if self.action in READ_ACTIONS:
+        if self.action in self.read_actions:
             return self.queryset
-        if self.request.user is not None and self.request.user.member.role == Member.Role.MODERATOR:
+        if is_moderator(self.request):
             return self.queryset
         return self.queryset.none()
 
     def create(self, request, *args, **kwargs):
-        if self.request.user is None or self.request.user.member.role != Member.Role.MODERATOR:
+        if not is_moderator(request):
             return Response(
                 {"message": "You are not authorized to create a 'Product' resource."},
                 status=status.HTTP_401_UNAUTHORIZED,
@@ -66,41 +147,186 @@ class ProductView(UnauthenticatedReadMixin, DisablePutMixin, ModelViewSet):
         return super().create(request, *args, **kwargs)
 
     def perform_update(self, serializer, *args, **kwargs):
-        instance = serializer.save()
-        if serializer.partial:
-            if serializer.instance.name != instance.name:
-                ProductAction.objects.create(
-                    product=instance,
-                    action=ProductAction.Action.NAME_UPDATED,
-                    details={"prev": serializer.instance.name, "curr": instance.name},
-                )
-            if serializer.instance.price != instance.price:
-                ProductAction.objects.create(
-                    product=instance,
-                    action=ProductAction.Action.PRICE_UPDATED,
-                    details={"prev": serializer.instance.price, "curr": instance.price},
-                )
-            if serializer.instance.link != instance.link:
-                ProductAction.objects.create(
-                    product=instance,
-                    action=ProductAction.Action.LINK_UPDATED,
-                    details={"prev": serializer.instance.link, "curr": instance.link},
-                )
-            if serializer.instance.image_url != instance.image_url:
-                ProductAction.objects.create(
-                    product=instance,
-                    action=ProductAction.Action.IMAGE_UPDATED,
-                    details={"prev": serializer.instance.link, "curr": instance.link},
-                )
-
-        return super().perform_update(serializer, *args, **kwargs)
+        """
+        Saves the product and records a `ProductAction` for every audited field the update changed, along with its
+        price history, in one transaction.
+        """
+        previous = ProductAction.snapshot(serializer.instance)
+        with transaction.atomic():
+            instance = serializer.save()
+            actions = ProductAction.objects.bulk_create(ProductAction.for_changes(instance, previous))
+            PriceHistory.objects.bulk_create(prices.price_changes([instance], actions))
+
+    def perform_create(self, serializer):
+        with transaction.atomic():
+            PriceHistory.objects.bulk_create(prices.initial_prices([serializer.save()]))
+
+    @action(detail=False, methods=["post"], url_path="import")
+    def import_catalog(self, request):
+        """
+        Imports products from an NDJSON (`application/x-ndjson`) or CSV (`text/csv`) request body. Rows with an `id`
+        update that product, other rows update the product with the same `link` or create a new one. The import is
+        all or nothing: if any row is invalid, nothing is written and the errors of every invalid row are returned.
+        """
+        if not is_moderator(request):
+            return Response(
+                {"message": "You are not authorized to import 'Product' resources."},
+                status=status.HTTP_401_UNAUTHORIZED,
+            )
+        import_format = "csv" if request.content_type.startswith("text/csv") else "ndjson"
+        result = catalog.import_products(catalog.parse_rows(request.stream or [], import_format))
+        return Response(result.as_dict(), status=status.HTTP_400_BAD_REQUEST if result.errors else status.HTTP_200_OK)
+
+    @action(detail=False, methods=["get"], url_path="export")
+    def export_catalog(self, request):
+        """
+        Streams the whole (filtered) catalog with its review aggregates, as NDJSON by default or as CSV with
+        `?type=csv`.
+        """
+        rows = catalog.export_rows(self.filter_queryset(self.get_queryset()))
+        if request.query_params.get("type") == "csv":
+            response = StreamingHttpResponse(catalog.export_csv(rows), content_type="text/csv")
+            response["Content-Disposition"] = 'attachment; filename="products.csv"'
+            return response
+        return StreamingHttpResponse(catalog.export_ndjson(rows), content_type="application/x-ndjson")
+
+    @action(detail=False, methods=["get"], url_path="batch")
+    def batch(self, request):
+        """
+        Gets up to 500 products given as `?ids=1,2,3` as product cards, with their category name, review aggregates
+        and the requesting user's own rating, in a single query however many ids are given. Products are returned in
+        the order of the ids, ids of products which do not exist are left out.
+        """
+        params = ProductBatchQuerySerializer(data=request.query_params)
+        if not params.is_valid():
+            return Response(params.errors, status=status.HTTP_400_BAD_REQUEST)
+        ids = params.validated_data["ids"]
+        queryset = ProductCardSerializer.prepare_queryset(self.get_queryset().filter(id__in=ids), request.user)
+        products = {product.pk: product for product in queryset}
+        cards = [products[product_id] for product_id in ids if product_id in products]
+        return Response(ProductCardSerializer(cards, many=True).data, status=status.HTTP_200_OK)
+
+    @action(detail=False, methods=["get"], url_path="duplicates")
+    def find_duplicates(self, request):
+        """
+        Gets the products and pending suggestions which are near-duplicates of a product given as `?name=...&link=...`:
+        those with the same link once normalized, then those with similar names, in a single indexed query.
+        """
+        params = DuplicateQuerySerializer(data=request.query_params)
+        if not params.is_valid():
+            return Response(params.errors, status=status.HTTP_400_BAD_REQUEST)
+        found = duplicates.find_duplicates(params.validated_data["name"], params.validated_data["link"])
+        return Response(DuplicateSerializer(found, many=True).data, status=status.HTTP_200_OK)
+
+    @action(detail=True, methods=["get"], url_path="similar")
+    def similar(self, request, pk=None):
+        """
+        Gets up to `limit` products users who liked the product also liked, most similar first, as product cards with
+        their similarity as `score`, in a single query. Neighbors are rebuilt by the `build_recommendations` command.
+        """
+        try:
+            product_id = int(pk)
+        except ValueError as err:
+            raise NotFound from err
+        params = RecommendationQuerySerializer(data=request.query_params)
+        if not params.is_valid():
+            return Response(params.errors, status=status.HTTP_400_BAD_REQUEST)
+        queryset = RecommendedProductSerializer.prepare_queryset(
+            recommendations.similar_products(product_id), request.user
+        )
+        products = queryset[: params.validated_data["limit"]]
+        return Response(RecommendedProductSerializer(products, many=True).data, status=status.HTTP_200_OK)
+
+    @action(detail=False, methods=["get"], url_path="recommended")
+    def recommended(self, request):
+        """
+        Gets up to `limit` products recommended to the requesting user from the products they liked, best first, as
+        product cards with their recommendation `score`, in a single query. Products the user rated are left out.
+        """
+        params = RecommendationQuerySerializer(data=request.query_params)
+        if not params.is_valid():
+            return Response(params.errors, status=status.HTTP_400_BAD_REQUEST)
+        queryset = RecommendedProductSerializer.prepare_queryset(
+            recommendations.recommended_products(request.user), request.user
+        )
+        products = queryset[: params.validated_data["limit"]]
+        return Response(RecommendedProductSerializer(products, many=True).data, status=status.HTTP_200_OK)
+
+    @action(detail=True, methods=["get"], url_path="price-history")
+    def price_history(self, request, pk=None):
+        """
+        Gets the product's price history between `start` (by default, when the product was created) and `end` (by
+        default, now), downsampled to the min, max and last price in effect in each of `buckets` equally long time
+        buckets, from the first one the product had a price in.
+        """
+        product = self.get_object()
+        params = PriceHistoryQuerySerializer(data=request.query_params)
+        if not params.is_valid():
+            return Response(params.errors, status=status.HTTP_400_BAD_REQUEST)
+        start = params.validated_data.get("start", product.created_at)
+        end = params.validated_data.get("end") or timezone.now()
+        if end < start:
+            return Response({"end": ["end must not be before start."]}, status=status.HTTP_400_BAD_REQUEST)
+        series = prices.get_price_series(product, start, end, params.validated_data["buckets"])
+        return Response({"start": start, "end": end, **series}, status=status.HTTP_200_OK)
+
+
+class SearchPagination(LimitOffsetPagination):
+    default_limit = 20
+    max_limit = 100
+
+
+class ProductSearchView(GenericViewSet):
+    """
+    Full-text search over product names, category names and feedback, returning products ordered by relevance.
+    """
+
+    serializer_class = ProductSearchResultSerializer
+    pagination_class = SearchPagination
+    permission_classes = [AllowAny]
+
+    def list(self, request, *args, **kwargs):
+        query = request.query_params.get("q", "").strip()
+        if not query:
+            return Response({"q": ["This query parameter is required."]}, status=status.HTTP_400_BAD_REQUEST)
+        page = self.paginate_queryset(SearchResults(query))
+        return self.get_paginated_response(self.get_serializer(page, many=True).data)
+
+
+class ProductRankingView(GenericViewSet):
+    """
+    Top products by a ranking score, optionally within a category and its subcategories. The scores are precomputed on
+    the review aggregates, so ranking reads the top of a score index instead of aggregating ratings.
+    """
+
+    serializer_class = RankedProductSerializer
+    permission_classes = [AllowAny]
+
+    def list(self, request, *args, **kwargs):
+        params = RankingQuerySerializer(data=request.query_params)
+        if not params.is_valid():
+            return Response(params.errors, status=status.HTTP_400_BAD_REQUEST)
+        params = params.validated_data
+
+        score_field = ranking.RANKINGS[params["score"]]
+        aggregates = ReviewAggregate.objects.filter(rating_count__gte=params["min_ratings"])
+        if "category" in params:
+            category_ids = get_category_tree().descendant_ids(params["category"])
+            aggregates = aggregates.filter(product__category_id__in=category_ids)
+        aggregates = aggregates.select_related("product__category").order_by(f"-{score_field}", "-product_id")
+        start = params["offset"]
+        products = [aggregate.product for aggregate in aggregates[start : start + params["limit"]]]
+        context = {**self.get_serializer_context(), "score": params["score"]}
+        serializer = self.get_serializer(products, many=True, context=context)
+        return Response(serializer.data, status=status.HTTP_200_OK)
 
 
 class ProductActionView(UnauthenticatedReadMixin, ModelViewSet):
     queryset = ProductAction.objects.all()
     serializer_class = ProductActionSerializer
     filter_backends = [DjangoFilterBackend]
-    filterset_fields = ["product", "action", "link"]
+    filterset_fields = ["product", "action"]
+    pagination_class = KeysetPagination
 
     def get_queryset(self):
         if self.request is None:
@@ -124,58 +350,101 @@ class CategoryFilter(FilterSet):
         fields = ("name", "parent", "no_parent")
 
 
-class CategoryView(UnauthenticatedReadMixin, ModelViewSet):
+class CategoryView(ConditionalReadMixin, UnauthenticatedReadMixin, ModelViewSet):
     queryset = Category.objects.all()
+    cache_models = (Category,)
     serializer_class = CategorySerializer
     filter_backends = [DjangoFilterBackend]
     filterset_class = CategoryFilter
+    pagination_class = IdKeysetPagination
+    read_actions = READ_ACTIONS | {"tree"}
 
     def get_queryset(self):
         if self.request is None:
             return self.queryset.none()
         if self.action in READ_ACTIONS:
             return self.queryset
-        if self.request.user is not None and self.request.user.member.role == Member.Role.MODERATOR:
+        if is_moderator(self.request):
             return self.queryset
         return self.queryset.none()
 
     def create(self, request, *args, **kwargs):
-        if self.request.user is None or self.request.user.member.role != Member.Role.MODERATOR:
+        if not is_moderator(request):
             return Response(
                 {"message": "You are not authorized to create a 'Category' resource."},
                 status=status.HTTP_401_UNAUTHORIZED,
             )
         return super().create(request, *args, **kwargs)
 
+    @action(detail=False, methods=["get"], url_path="tree")
+    def tree(self, request):
+        """
+        Gets the whole category tree as nested nodes, served from the in-memory category tree cache.
+        """
+        return Response(get_category_tree().as_list(), status=status.HTTP_200_OK)
+
 
-class RatingView(CreateUserFieldMixin, UnauthenticatedReadMixin, ModelViewSet):
+class RatingView(AtomicWriteMixin, ConditionalReadMixin, CreateUserFieldMixin, UnauthenticatedReadMixin, ModelViewSet):
     queryset = Rating.objects.all()
+    cache_models = (Rating,)
     serializer_class = RatingSerializer
     filter_backends = [DjangoFilterBackend]
     filterset_fields = ["product", "user", "value"]
+    pagination_class = KeysetPagination
+    read_actions = READ_ACTIONS | {"histogram"}
 
     def get_queryset(self):
         if self.request is None:
             return self.queryset.none()
         if self.action in READ_ACTIONS:
             return self.queryset
-        if self.request.user is not None and self.request.user.member.role == Member.Role.MODERATOR:
+        if is_moderator(self.request):
             return self.queryset
         return self.queryset.filter(user=self.request.user)
 
-
-class FeedbackView(CreateUserFieldMixin, UnauthenticatedReadMixin, ModelViewSet):
-    queryset = Feedback.objects.all()
+    @action(detail=False, methods=["put"], url_path="upsert")
+    def upsert(self, request):
+        """
+        Sets the requesting user's ratings of up to 500 products in one statement, given as a list of (or a single)
+        `{"product": id, "value": value}` objects, creating or updating each rating. Idempotent, so repeating a request
+        changes nothing.
+        """
+        data = request.data if isinstance(request.data, list) else [request.data]
+        serializer = RatingUpsertSerializer(data=data)
+        if not serializer.is_valid():
+            return Response(serializer.errors, status=status.HTTP_400_BAD_REQUEST)
+        result = ratings.upsert_ratings(request.user, serializer.validated_data)
+        return Response(RatingSerializer(result, many=True).data, status=status.HTTP_200_OK)
+
+    @action(detail=False, methods=["get"], url_path="histogram")
+    def histogram(self, request):
+        """
+        Gets the number of ratings of each value for up to 100 products given as `?ids=1,2,3`, in a single query.
+        Histograms are read from the review aggregates, or counted from the ratings with `?live=true`.
+        """
+        params = RatingHistogramQuerySerializer(data=request.query_params)
+        if not params.is_valid():
+            return Response(params.errors, status=status.HTTP_400_BAD_REQUEST)
+        histograms = aggregates.rating_histograms(params.validated_data["ids"], live=params.validated_data["live"])
+        return Response(histograms, status=status.HTTP_200_OK)
+
+
+class FeedbackView(
+    AtomicWriteMixin, ConditionalReadMixin, CreateUserFieldMixin, UnauthenticatedReadMixin, ModelViewSet
+):
+    queryset = FeedbackSerializer.annotate_queryset(Feedback.objects.all())
+    cache_models = (Feedback, Rating, User)
     serializer_class = FeedbackSerializer
     filter_backends = [DjangoFilterBackend]
     filterset_fields = ["product", "user", "text"]
+    pagination_class = KeysetPagination
 
     def get_queryset(self):
         if self.request is None:
             return self.queryset.none()
         if self.action in READ_ACTIONS:
             return self.queryset
-        if self.request.user is not None and self.request.user.member.role == Member.Role.MODERATOR:
+        if is_moderator(self.request):
             return self.queryset
         return self.queryset.filter(user=self.request.user)
 
@@ -188,8 +457,9 @@ class BasicProductReviewFilter(FilterSet):
         fields = ("ids",)
 
 
-class BasicProductReviewView(ReadOnlyModelViewSet):
-    queryset = Product.objects.all()
+class BasicProductReviewView(ConditionalReadMixin, ReadOnlyModelViewSet):
+    queryset = Product.objects.select_related("review_aggregate")
+    cache_models = (Product, ReviewAggregate)
     serializer_class = BasicProductReviewSerializer
     filter_backends = [DjangoFilterBackend]
     filterset_class = BasicProductReviewFilter
@@ -0,0 +1,8 @@
+from django.apps import AppConfig
+
+
+class WwreviewsConfig(AppConfig):
+    name = "wwreviews"
+
+    def ready(self):
+        from wwreviews import caching, db  # noqa: F401 pylint: disable=C0415,W0611
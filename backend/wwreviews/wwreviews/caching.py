@@ -0,0 +1,155 @@
+"""
+Conditional GET support and a server-side response cache for read-only API actions.
+
+Each model gets a cached state made of a generation token and its row count and latest `updated_at` (or highest id for
+models without one). Any write to a model replaces its generation, so the state is recomputed with one aggregate query
+on the next read. Responses are fingerprinted from the states of the models they depend on, which gives the ETag and
+Last-Modified headers and the key under which the response data itself is cached.
+
+The states must be kept in a cache shared by all the processes serving the API for each to see the writes of the
+others, so the response cache and ETags are only used when `CACHE_SHARED` is on, see the settings.
+"""
+import hashlib
+import time
+import uuid
+from datetime import datetime
+
+from django.apps import apps
+from django.conf import settings
+from django.core.cache import cache
+from django.db import transaction
+from django.db.models import Count, Max
+from django.db.models.signals import post_delete, post_save
+from django.dispatch import receiver
+from django.utils.cache import get_conditional_response
+from django.utils.http import http_date
+from rest_framework import status
+from rest_framework.response import Response
+
+from wwreviews.utils import READ_ACTIONS
+
+RESPONSE_CACHE_TIMEOUT = getattr(settings, "RESPONSE_CACHE_TIMEOUT", 300)
+# Statistics are keyed by generation, so only stop being used when they expire or the model is written.
+MODEL_STATS_TIMEOUT = 24 * 60 * 60
+
+
+def is_enabled() -> bool:
+    """
+    Whether read responses are cached and get ETags, which needs a cache shared by all the processes serving the API.
+    """
+    return settings.CACHE_SHARED
+
+
+def _model_key(model) -> str:
+    return f"model-state:{model._meta.label_lower}"
+
+
+def _new_generation() -> dict:
+    return {"generation": uuid.uuid4().hex, "invalidated_at": time.time()}
+
+
+def get_model_state(model) -> dict:
+    """
+    Gets the cached state of a model, computing its statistics with one query if they are not cached.
+
+    Returns:
+        Dictionary with the model's `generation`, row `count`, `latest` value of its `updated_at` or primary key and
+        `modified` POSIX timestamp. Deletes do not move the latest `updated_at`, so `modified` is also never earlier
+        than the last invalidation.
+    """
+    key = _model_key(model)
+    state = cache.get(key)
+    if state is None:
+        # No write since the cache was emptied: the first process to get here picks the generation all others use.
+        cache.add(key, _new_generation(), None)
+        state = cache.get(key) or _new_generation()
+    # Stored apart from the generation, so statistics computed before a write cannot overwrite the generation it set.
+    stats_key = f"{key}:{state['generation']}"
+    stats = cache.get(stats_key)
+    if stats is None:
+        field = "updated_at" if any(field.name == "updated_at" for field in model._meta.fields) else "pk"
+        stats = model.objects.order_by().aggregate(count=Count("pk"), latest=Max(field))
+        latest, modified = stats["latest"], state["invalidated_at"]
+        if isinstance(latest, datetime):
+            modified = max(modified, latest.timestamp())
+        stats = {"count": stats["count"], "latest": str(latest), "modified": modified}
+        cache.set(stats_key, stats, MODEL_STATS_TIMEOUT)
+    return {**state, **stats}
+
+
+def invalidate_model(model):
+    """
+    Invalidates the cached state of a model, and with it the cached responses depending on it. Runs once immediately
+    and again once the current transaction commits, so a read racing the write cannot cache the uncommitted state.
+    """
+
+    def invalidate():
+        cache.set(_model_key(model), _new_generation(), None)
+
+    invalidate()
+    transaction.on_commit(invalidate)
+
+
+@receiver(post_save)
+@receiver(post_delete)
+def invalidate_instance_model(sender, raw: bool = False, **kwargs):
+    # Writes to the migration history and historical models are made by `migrate`, before a cache table may exist.
+    if not raw and sender._meta.apps is apps:
+        invalidate_model(sender)
+
+
+class ConditionalReadMixin:
+    """
+    Mixin for viewsets adding ETag/Last-Modified validators and a server-side response cache to their read actions.
+
+    Views list the models their read responses are built from in `cache_models`. Read responses must not depend on
+    the requesting user. Read actions run uncached when the cache is not shared, see `is_enabled`.
+    """
+
+    cache_models = ()
+    cached_actions = READ_ACTIONS
+
+    def get_response_fingerprint(self, request) -> tuple[str, int]:
+        """
+        Gets the ETag and Last-Modified timestamp of the response to the request.
+        """
+        states = [get_model_state(model) for model in self.cache_models]
+        digest = hashlib.sha1(usedforsecurity=False)
+        for part in (request.build_absolute_uri(), request.META.get("HTTP_ACCEPT", ""), *map(repr, states)):
+            digest.update(part.encode())
+        return f'"{digest.hexdigest()}"', int(max(state["modified"] for state in states))
+
+    def finalize_response(self, request, response, *args, **kwargs):
+        response = super().finalize_response(request, response, *args, **kwargs)
+        etag = getattr(request, "_response_etag", None)
+        if etag is not None and response.status_code in (status.HTTP_200_OK, status.HTTP_304_NOT_MODIFIED):
+            response["ETag"] = etag
+            response["Cache-Control"] = "no-cache"
+        return response
+
+    def cached_read(self, handler, request, *args, **kwargs):
+        etag, modified = self.get_response_fingerprint(request)
+        request._response_etag = etag
+        if get_conditional_response(request, etag=etag, last_modified=modified) is not None:
+            return Response(status=status.HTTP_304_NOT_MODIFIED)
+
+        cache_key = f"response:{etag}"
+        data = cache.get(cache_key)
+        if data is not None:
+            response = Response(data)
+        else:
+            response = handler(request, *args, **kwargs)
+            if response.status_code == status.HTTP_200_OK:
+                cache.set(cache_key, response.data, RESPONSE_CACHE_TIMEOUT)
+        response["Last-Modified"] = http_date(modified)
+        return response
+
+    def list(self, request, *args, **kwargs):
+        if "list" not in self.cached_actions or not is_enabled():
+            return super().list(request, *args, **kwargs)
+        return self.cached_read(super().list, request, *args, **kwargs)
+
+    def retrieve(self, request, *args, **kwargs):
+        if "retrieve" not in self.cached_actions or not is_enabled():
+            return super().retrieve(request, *args, **kwargs)
+        return self.cached_read(super().retrieve, request, *args, **kwargs)
@@ -0,0 +1,19 @@
+"""
+Per-connection database setup.
+"""
+from django.conf import settings
+from django.db.backends.signals import connection_created
+from django.dispatch import receiver
+
+
+@receiver(connection_created)
+def set_sqlite_pragmas(sender, connection, **kwargs):
+    """
+    Applies `SQLITE_PRAGMAS` to new SQLite connections. The journal mode is persistent, but is set on every connection
+    so databases created before it was configured are converted too.
+    """
+    if connection.vendor != "sqlite":
+        return
+    # Run on the raw connection, so the pragmas are not counted as queries of the request opening the connection.
+    for pragma, value in settings.SQLITE_PRAGMAS.items():
+        connection.connection.execute(f"PRAGMA {pragma} = {value}")
@@ -0,0 +1,331 @@
+"""
+Per-view request instrumentation: query count, database time, serialization time, response rendering time and total
+latency.
+
+`RequestMetricsMiddleware` times every request, adds the timings to its `Server-Timing` header and records them per
+view in the in-process `REGISTRY`, which `metrics_view` exposes in the Prometheus text format to staff, scrapers with
+the `METRICS_TOKEN` and clients of the `METRICS_ALLOWED_NETWORKS`. Metrics are per process, so with several workers
+each one is scraped (or aggregated) separately. Requests slower than `SLOW_REQUEST_MS` are logged along with their SQL.
+
+The timer of the current request is kept in a context variable, which follows the request into the threads running
+its synchronous code under ASGI. Queries are timed by an execute wrapper added to every database connection, and
+serializers by wrapping `BaseSerializer.data`. Both hooks are only installed, and the middleware only used, when
+`REQUEST_METRICS` is on, so it costs nothing when disabled.
+"""
+import asyncio
+import bisect
+import ipaddress
+import logging
+import threading
+import time
+from collections import defaultdict
+from contextvars import ContextVar
+from dataclasses import dataclass, field, replace
+
+from django.conf import settings
+from django.core.exceptions import MiddlewareNotUsed, PermissionDenied
+from django.db import connections
+from django.db.backends.signals import connection_created
+from django.http import Http404, HttpResponse
+from django.utils.crypto import constant_time_compare
+from rest_framework.serializers import BaseSerializer
+
+logger = logging.getLogger(__name__)
+
+# Upper bounds in seconds of the request latency histogram buckets.
+LATENCY_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+MAX_LOGGED_QUERIES = 50
+
+
+_current_timer: ContextVar["RequestTimer | None"] = ContextVar("request_timer", default=None)
+
+
+class RequestTimer:
+    """
+    Context manager timing the queries and serializers run in the current context, and collecting the SQL of the
+    queries if asked to. Needs the hooks of `install_hooks`.
+    """
+
+    def __init__(self, capture_sql: bool = False):
+        self.capture_sql = capture_sql
+        self.queries = 0
+        self.db_time = 0.0
+        self.serialize_time = 0.0
+        self.render_time = 0.0
+        self.sql: list[tuple[float, str]] = []
+        self.serializing = False
+        self._render_start = None
+
+    def __call__(self, execute, sql, params, many, context):
+        start = time.perf_counter()
+        try:
+            return execute(sql, params, many, context)
+        finally:
+            duration = time.perf_counter() - start
+            self.queries += 1
+            self.db_time += duration
+            if self.capture_sql:
+                self.sql.append((duration, sql))
+
+    def __enter__(self):
+        self.start = time.perf_counter()
+        # Connections opened before the hooks were installed, as in tests, are only wrapped once used by a request.
+        for alias in connections:
+            _add_execute_wrapper(connections[alias])
+        self._token = _current_timer.set(self)
+        return self
+
+    def __exit__(self, *exc_info):
+        _current_timer.reset(self._token)
+        self.total_time = time.perf_counter() - self.start
+
+    def render_started(self):
+        self._render_start = time.perf_counter()
+
+    def render_finished(self, response):
+        if self._render_start is not None:
+            self.render_time += time.perf_counter() - self._render_start
+
+
+def _execute_wrapper(execute, sql, params, many, context):
+    timer = _current_timer.get()
+    if timer is None:
+        return execute(sql, params, many, context)
+    return timer(execute, sql, params, many, context)
+
+
+def _add_execute_wrapper(connection, **kwargs):
+    if _execute_wrapper not in connection.execute_wrappers:
+        connection.execute_wrappers.append(_execute_wrapper)
+
+
+def _timed_data(data: property) -> property:
+    """
+    Wraps the `data` property of serializers to add the time spent serializing outside of queries to the timer of the
+    current request. Nested serializers run within their parent's time.
+    """
+
+    def timed(serializer):
+        timer = _current_timer.get()
+        if timer is None or timer.serializing:
+            return data.fget(serializer)
+        timer.serializing = True
+        start, db_time = time.perf_counter(), timer.db_time
+        try:
+            return data.fget(serializer)
+        finally:
+            timer.serializing = False
+            timer.serialize_time += time.perf_counter() - start - (timer.db_time - db_time)
+
+    timed.timed = True
+    return property(timed, doc=data.__doc__)
+
+
+def install_hooks():
+    """
+    Installs the execute wrapper of new database connections and the serializer timing, once.
+    """
+    connection_created.connect(_add_execute_wrapper, dispatch_uid="wwreviews.metrics")
+    if not getattr(BaseSerializer.data.fget, "timed", False):
+        BaseSerializer.data = _timed_data(BaseSerializer.data)
+
+
+@dataclass
+class ViewStats:
+    requests: int = 0
+    queries: int = 0
+    db_time: float = 0.0
+    serialize_time: float = 0.0
+    render_time: float = 0.0
+    total_time: float = 0.0
+    buckets: list[int] = field(default_factory=lambda: [0] * (len(LATENCY_BUCKETS) + 1))
+
+
+class MetricsRegistry:
+    """
+    Thread-safe in-process store of the request metrics of each view, keyed by HTTP method and view name.
+    """
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._views: dict[tuple[str, str], ViewStats] = defaultdict(ViewStats)
+        self._responses: dict[tuple[str, str, int], int] = defaultdict(int)
+
+    def record(self, method: str, view: str, status: int, timer: RequestTimer):
+        with self._lock:
+            stats = self._views[method, view]
+            stats.requests += 1
+            stats.queries += timer.queries
+            stats.db_time += timer.db_time
+            stats.serialize_time += timer.serialize_time
+            stats.render_time += timer.render_time
+            stats.total_time += timer.total_time
+            stats.buckets[bisect.bisect_left(LATENCY_BUCKETS, timer.total_time)] += 1
+            self._responses[method, view, status] += 1
+
+    def clear(self):
+        with self._lock:
+            self._views.clear()
+            self._responses.clear()
+
+    def snapshot(self) -> dict[tuple[str, str], ViewStats]:
+        """
+        Gets a copy of the metrics of each view, keyed by HTTP method and view name.
+        """
+        with self._lock:
+            return {key: replace(stats, buckets=list(stats.buckets)) for key, stats in self._views.items()}
+
+    def render(self) -> str:
+        """
+        Renders the metrics in the Prometheus text exposition format.
+        """
+        views = self.snapshot()
+        with self._lock:
+            responses = dict(self._responses)
+
+        lines = [
+            "# HELP wwreviews_requests_total Requests handled, by view and response status.",
+            "# TYPE wwreviews_requests_total counter",
+        ]
+        for (method, view, status), count in sorted(responses.items()):
+            lines.append(f'wwreviews_requests_total{{method="{method}",view="{view}",status="{status}"}} {count}')
+
+        lines += [
+            "# HELP wwreviews_request_duration_seconds Total request latency, by view.",
+            "# TYPE wwreviews_request_duration_seconds histogram",
+        ]
+        for (method, view), stats in sorted(views.items()):
+            labels = f'method="{method}",view="{view}"'
+            cumulative = 0
+            for bound, count in zip((*map(str, LATENCY_BUCKETS), "+Inf"), stats.buckets):
+                cumulative += count
+                lines.append(f'wwreviews_request_duration_seconds_bucket{{{labels},le="{bound}"}} {cumulative}')
+            lines.append(f"wwreviews_request_duration_seconds_sum{{{labels}}} {stats.total_time}")
+            lines.append(f"wwreviews_request_duration_seconds_count{{{labels}}} {stats.requests}")
+
+        for name, attr, description in (
+            ("wwreviews_request_queries_total", "queries", "Database queries run while handling requests"),
+            ("wwreviews_request_db_seconds_total", "db_time", "Time spent in database queries"),
+            ("wwreviews_request_serialize_seconds_total", "serialize_time", "Time spent in serializers"),
+            ("wwreviews_request_render_seconds_total", "render_time", "Time spent rendering response bodies"),
+        ):
+            lines += [f"# HELP {name} {description}, by view.", f"# TYPE {name} counter"]
+            for (method, view), stats in sorted(views.items()):
+                lines.append(f'{name}{{method="{method}",view="{view}"}} {getattr(stats, attr)}')
+        return "\n".join(lines) + "\n"
+
+
+REGISTRY = MetricsRegistry()
+
+
+def server_timing(timer: RequestTimer) -> str:
+    """
+    Formats the timings of a request as a `Server-Timing` header value, in milliseconds.
+    """
+    app_time = timer.total_time - timer.db_time - timer.serialize_time - timer.render_time
+    return ", ".join(
+        (
+            f'db;dur={timer.db_time * 1000:.1f};desc="{timer.queries} queries"',
+            f"serialize;dur={timer.serialize_time * 1000:.1f}",
+            f"render;dur={timer.render_time * 1000:.1f}",
+            f"app;dur={app_time * 1000:.1f}",
+            f"total;dur={timer.total_time * 1000:.1f}",
+        )
+    )
+
+
+class RequestMetricsMiddleware:
+    """
+    Middleware recording the query count, database time, serialization time, rendering time and latency of every
+    request. Serialization covers getting the `data` of serializers, rendering covers encoding the response data.
+    Supports both sync and async requests, so it does not make Django adapt async views to run in threads.
+    """
+
+    sync_capable = True
+    async_capable = True
+
+    def __init__(self, get_response):
+        if not settings.REQUEST_METRICS:
+            raise MiddlewareNotUsed
+        self.get_response = get_response
+        self.slow_request_ms = settings.SLOW_REQUEST_MS
+        install_hooks()
+        self.is_async = asyncio.iscoroutinefunction(get_response)
+        if self.is_async:
+            # Marks the instance as a coroutine function for Django, as `django.utils.deprecation.MiddlewareMixin` does.
+            self._is_coroutine = asyncio.coroutines._is_coroutine  # pylint: disable=W0212
+
+    def __call__(self, request):
+        if self.is_async:
+            return self.__acall__(request)
+        with RequestTimer(capture_sql=bool(self.slow_request_ms)) as timer:
+            request._request_timer = timer
+            response = self.get_response(request)
+        return self.record(request, response, timer)
+
+    async def __acall__(self, request):
+        with RequestTimer(capture_sql=bool(self.slow_request_ms)) as timer:
+            request._request_timer = timer
+            response = await self.get_response(request)
+        return self.record(request, response, timer)
+
+    def record(self, request, response, timer: RequestTimer):
+        match = request.resolver_match
+        view = match.view_name if match is not None else "unmatched"
+        REGISTRY.record(request.method, view, response.status_code, timer)
+        response["Server-Timing"] = server_timing(timer)
+        if self.slow_request_ms and timer.total_time * 1000 >= self.slow_request_ms:
+            self.log_slow_request(request, view, timer)
+        return response
+
+    def process_template_response(self, request, response):
+        timer = request._request_timer
+        timer.render_started()
+        response.add_post_render_callback(timer.render_finished)
+        return response
+
+    def log_slow_request(self, request, view: str, timer: RequestTimer):
+        queries = [f"  {duration * 1000:8.1f}ms  {sql}" for duration, sql in timer.sql[:MAX_LOGGED_QUERIES]]
+        if len(timer.sql) > MAX_LOGGED_QUERIES:
+            queries.append(f"  ... {len(timer.sql) - MAX_LOGGED_QUERIES} more queries")
+        logger.warning(
+            "Slow request %s %s (%s) took %.1fms with %d queries taking %.1fms:\n%s",
+            request.method,
+            request.get_full_path(),
+            view,
+            timer.total_time * 1000,
+            timer.queries,
+            timer.db_time * 1000,
+            "\n".join(queries),
+        )
+
+
+def can_read_metrics(request) -> bool:
+    """
+    Whether a request may read the metrics: from a staff user, with the `METRICS_TOKEN` as a bearer token, or from an
+    address in one of the `METRICS_ALLOWED_NETWORKS`.
+    """
+    user = getattr(request, "user", None)
+    if user is not None and user.is_staff:
+        return True
+    if settings.METRICS_TOKEN and constant_time_compare(
+        request.headers.get("Authorization", ""), f"Bearer {settings.METRICS_TOKEN}"
+    ):
+        return True
+    try:
+        address = ipaddress.ip_address(request.META.get("REMOTE_ADDR", ""))
+    except ValueError:
+        return False
+    return any(address in ipaddress.ip_network(network) for network in settings.METRICS_ALLOWED_NETWORKS)
+
+
+def metrics_view(request):
+    """
+    Serves the request metrics of this process in the Prometheus text format, 404 if they are not recorded, or 403 if
+    the request may not read them.
+    """
+    if not settings.REQUEST_METRICS:
+        raise Http404
+    if not can_read_metrics(request):
+        raise PermissionDenied
+    return HttpResponse(REGISTRY.render(), content_type="text/plain; version=0.0.4; charset=utf-8")
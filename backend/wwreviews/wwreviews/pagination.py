@@ -0,0 +1,172 @@
+"""
+Pagination classes shared by the API views.
+"""
+import base64
+import binascii
+import json
+from collections import OrderedDict
+
+from django.core.exceptions import ValidationError
+from django.db.models import Q
+from rest_framework.exceptions import NotFound
+from rest_framework.pagination import BasePagination, LimitOffsetPagination
+from rest_framework.response import Response
+from rest_framework.utils.urls import replace_query_param
+
+
+class KeysetPagination(BasePagination):
+    """
+    Keyset (cursor) pagination over a unique ordering, `(created_at, id)` by default.
+
+    Each page is fetched with a `WHERE (created_at, id) < (...)` seek from the previous page's boundary row rather than
+    an `OFFSET`, so deep pages cost the same as the first one and rows inserted while paging never shift or duplicate
+    results. The ordering must end with a unique field so every row has a distinct position.
+
+    Pagination is opt-in to keep the existing responses unchanged: requests passing `limit`/`offset` are paginated with
+    `LimitOffsetPagination`, requests passing `cursor` or `page_size` are paginated by keyset, and all other requests
+    are not paginated.
+    """
+
+    ordering = ("-created_at", "-id")
+    page_size = 50
+    max_page_size = 500
+    cursor_query_param = "cursor"
+    page_size_query_param = "page_size"
+    offset_pagination_class = LimitOffsetPagination
+    invalid_cursor_message = "Invalid cursor."
+
+    def __init__(self):
+        self.offset_paginator = None
+        self.next_position = None
+        self.previous_position = None
+
+    def paginate_queryset(self, queryset, request, view=None):
+        self.request = request
+        offset_paginator = self.offset_pagination_class()
+        params = request.query_params
+        if offset_paginator.limit_query_param in params or offset_paginator.offset_query_param in params:
+            self.offset_paginator = offset_paginator
+            return offset_paginator.paginate_queryset(queryset, request, view)
+        if self.cursor_query_param not in params and self.page_size_query_param not in params:
+            return None
+        return self.paginate_rows(list(self.page_queryset(queryset, request)))
+
+    async def apaginate_queryset(self, queryset, request) -> list:
+        """
+        Async version of `paginate_queryset` for async views, always paginating by keyset.
+        """
+        self.request = request
+        return self.paginate_rows([row async for row in self.page_queryset(queryset, request)])
+
+    def page_queryset(self, queryset, request):
+        """
+        Orders and seeks the queryset to the requested page, with one extra row to know whether there is another page
+        in this direction.
+        """
+        self.current_page_size = self.get_page_size(request)
+        self.position, self.reverse = self.decode_cursor(request)
+        ordering = [field if not self.reverse else self._invert(field) for field in self.ordering]
+        queryset = queryset.order_by(*ordering)
+        if self.position is not None:
+            try:
+                queryset = queryset.filter(self.seek_filter(ordering, self.position))
+            except (ValidationError, ValueError) as err:
+                raise NotFound(self.invalid_cursor_message) from err
+        return queryset[: self.current_page_size + 1]
+
+    def paginate_rows(self, results: list) -> list:
+        """
+        Trims the rows fetched by `page_queryset` to the page, and sets the positions of the adjacent pages.
+        """
+        has_more = len(results) > self.current_page_size
+        results = results[: self.current_page_size]
+        if self.reverse:
+            results.reverse()
+
+        first, last = (self.get_position(results[0]), self.get_position(results[-1])) if results else (None, None)
+        if self.reverse:
+            self.previous_position = first if has_more else None
+            self.next_position = last or self.position
+        else:
+            self.previous_position = first if self.position is not None else None
+            self.next_position = last if has_more else None
+        return results
+
+    def get_paginated_response(self, data):
+        if self.offset_paginator is not None:
+            return self.offset_paginator.get_paginated_response(data)
+        return Response(
+            OrderedDict([("next", self.get_next_link()), ("previous", self.get_previous_link()), ("results", data)])
+        )
+
+    def get_page_size(self, request) -> int:
+        try:
+            page_size = int(request.query_params.get(self.page_size_query_param, self.page_size))
+        except ValueError:
+            page_size = self.page_size
+        return max(1, min(page_size, self.max_page_size))
+
+    @staticmethod
+    def _invert(field: str) -> str:
+        return field[1:] if field.startswith("-") else f"-{field}"
+
+    def get_position(self, instance) -> list[str]:
+        return [str(getattr(instance, field.lstrip("-"))) for field in self.ordering]
+
+    @staticmethod
+    def seek_filter(ordering: list[str], position: list[str]) -> Q:
+        """
+        Builds the filter selecting the rows after the given position in the given ordering, i.e. the lexicographic
+        tuple comparison `(a, b, c) > (x, y, z)` expanded as `a > x OR (a = x AND (b > y OR (b = y AND c > z)))`.
+
+        The redundant leading `a >= x` bound lets the database seek into an index on the ordering instead of scanning
+        it from the start, which it cannot do from the disjunction alone.
+        """
+        condition = None
+        for field, value in reversed(list(zip(ordering, position))):
+            name = field.lstrip("-")
+            after = Q(**{f"{name}__{'lt' if field.startswith('-') else 'gt'}": value})
+            condition = after if condition is None else after | (Q(**{name: value}) & condition)
+        first, value = ordering[0], position[0]
+        return Q(**{f"{first.lstrip('-')}__{'lte' if first.startswith('-') else 'gte'}": value}) & condition
+
+    def decode_cursor(self, request) -> tuple[list[str] | None, bool]:
+        encoded = request.query_params.get(self.cursor_query_param)
+        if not encoded:
+            return None, False
+        try:
+            cursor = json.loads(base64.urlsafe_b64decode(encoded.encode("ascii")))
+            position, reverse = cursor["p"], bool(cursor.get("r", False))
+        except (binascii.Error, UnicodeError, ValueError, TypeError, KeyError) as err:
+            raise NotFound(self.invalid_cursor_message) from err
+        if not isinstance(position, list) or len(position) != len(self.ordering):
+            raise NotFound(self.invalid_cursor_message)
+        return position, reverse
+
+    @staticmethod
+    def encode_position(position: list[str], reverse: bool = False) -> str:
+        """
+        Encodes a position into an opaque cursor token.
+        """
+        cursor = {"p": position, "r": 1} if reverse else {"p": position}
+        return base64.urlsafe_b64encode(json.dumps(cursor, separators=(",", ":")).encode("ascii")).decode("ascii")
+
+    def encode_cursor(self, position: list[str], reverse: bool) -> str:
+        encoded = self.encode_position(position, reverse)
+        return replace_query_param(self.request.build_absolute_uri(), self.cursor_query_param, encoded)
+
+    def get_next_link(self) -> str | None:
+        return None if self.next_position is None else self.encode_cursor(self.next_position, reverse=False)
+
+    def get_previous_link(self) -> str | None:
+        if self.previous_position is None:
+            return None
+        return self.encode_cursor(self.previous_position, reverse=True)
+
+
+class IdKeysetPagination(KeysetPagination):
+    """
+    Keyset pagination for models without a `created_at` timestamp.
+    """
+
+    ordering = ("id",)
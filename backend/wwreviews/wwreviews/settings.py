@@ -12,7 +12,6 @@ https://docs.djangoproject.com/en/4.0/ref/settings/
 import os
 from pathlib import Path
 
-import praw
 from dotenv import load_dotenv
 
 # Build paths inside the project like this: BASE_DIR / 'subdir'.
@@ -26,12 +25,63 @@ else:
     DEBUG = True
     FE_URL = "http://localhost:3000/"
 
-DATABASES = {
+# SQLite by default, set DATABASE_ENGINE=postgresql and the other DATABASE_* variables to use PostgreSQL.
+DATABASE_ENGINE = os.environ.get("DATABASE_ENGINE", "sqlite")
+if DATABASE_ENGINE == "postgresql":
+    # With pgbouncer in transaction pooling mode, connections are pooled by pgbouncer rather than kept open by Django,
+    # and server-side cursors cannot be used since consecutive transactions may run on different server connections.
+    DATABASE_PGBOUNCER = os.environ.get("DATABASE_PGBOUNCER", "").lower() in ("1", "true")
+    DATABASES = {
+        "default": {
+            "ENGINE": "django.db.backends.postgresql",
+            "NAME": os.environ.get("DATABASE_NAME", "wwreviews"),
+            "USER": os.environ.get("DATABASE_USER", ""),
+            "PASSWORD": os.environ.get("DATABASE_PASSWORD", ""),
+            "HOST": os.environ.get("DATABASE_HOST", ""),
+            "PORT": os.environ.get("DATABASE_PORT", ""),
+            # Seconds a connection is reused across requests, checked to be alive before each request reuses it.
+            "CONN_MAX_AGE": int(os.environ.get("DATABASE_CONN_MAX_AGE", 0 if DATABASE_PGBOUNCER else 60)),
+            "CONN_HEALTH_CHECKS": True,
+            "DISABLE_SERVER_SIDE_CURSORS": DATABASE_PGBOUNCER,
+            "OPTIONS": {"connect_timeout": int(os.environ.get("DATABASE_CONNECT_TIMEOUT", 5))},
+        }
+    }
+else:
+    DATABASES = {
+        "default": {
+            "ENGINE": "django.db.backends.sqlite3",
+            "NAME": os.environ.get("DATABASE_NAME", BASE_DIR / "db.sqlite3"),
+            "CONN_MAX_AGE": int(os.environ.get("DATABASE_CONN_MAX_AGE", 0)),
+            # Seconds a write waits for the database lock before failing with "database is locked".
+            "OPTIONS": {"timeout": int(os.environ.get("DATABASE_TIMEOUT", 20))},
+        }
+    }
+
+# Pragmas set on every new SQLite connection, see `wwreviews.db`. WAL lets reads proceed during a write, and with it
+# synchronous=NORMAL only syncs at checkpoints, which is durable against application (not power) failures.
+SQLITE_PRAGMAS = {
+    "journal_mode": os.environ.get("SQLITE_JOURNAL_MODE", "wal"),
+    "synchronous": "normal",
+    "temp_store": "memory",
+    "cache_size": -64_000,
+    "mmap_size": 256 * 1024 * 1024,
+}
+
+# Local memory by default, set CACHE_BACKEND=database (after `manage.py createcachetable`) or CACHE_BACKEND=redis with
+# CACHE_LOCATION set to a redis:// URL (needs the redis package) to share the cache between processes.
+CACHE_BACKEND = os.environ.get("CACHE_BACKEND", "locmem")
+CACHES = {
     "default": {
-        "ENGINE": "django.db.backends.sqlite3",
-        "NAME": BASE_DIR / "db.sqlite3",
+        "BACKEND": {
+            "database": "django.core.cache.backends.db.DatabaseCache",
+            "redis": "django.core.cache.backends.redis.RedisCache",
+        }.get(CACHE_BACKEND, "django.core.cache.backends.locmem.LocMemCache"),
+        "LOCATION": os.environ.get("CACHE_LOCATION", "wwreviews_cache" if CACHE_BACKEND == "database" else ""),
     }
 }
+# Whether the cache is shared by all the processes serving the API, which the API response cache and ETags require
+# to see the writes of the other processes. Only set it with a local memory cache if a single process serves the API.
+CACHE_SHARED = os.environ.get("CACHE_SHARED", str(CACHE_BACKEND != "locmem")).lower() in ("1", "true")
 
 SECRET_KEY = "django-insecure-#+cpyhffn=ao3e5v^la(h#5x+1t!-qeecww0zx@g^_@0pac7t5"
 
@@ -39,12 +89,29 @@ REDDIT_CLIENT_ID = os.environ.get("REDDIT_CLIENT_ID")
 REDDIT_CLIENT_SECRET = os.environ.get("REDDIT_CLIENT_SECRET")
 REDDIT_REDIRECT_URL = os.environ.get("REDDIT_REDIRECT_URL")
 REDDIT_USER_AGENT = os.environ.get("REDDIT_USER_AGENT")
-REDDIT_CLIENT = praw.Reddit(
-    client_id=REDDIT_CLIENT_ID,
-    client_secret=REDDIT_CLIENT_SECRET,
-    redirect_uri=REDDIT_REDIRECT_URL,
-    user_agent=REDDIT_USER_AGENT,
-)
+REDDIT_WWW_URL = os.environ.get("REDDIT_WWW_URL", "https://www.reddit.com")
+REDDIT_OAUTH_URL = os.environ.get("REDDIT_OAUTH_URL", "https://oauth.reddit.com")
+# Seconds to wait on Reddit during the login callback, before the login fails instead of holding the request open.
+REDDIT_HTTP_TIMEOUT = float(os.environ.get("REDDIT_HTTP_TIMEOUT", 10))
+REDDIT_HTTP_CONNECT_TIMEOUT = float(os.environ.get("REDDIT_HTTP_CONNECT_TIMEOUT", 3))
+
+# Seconds an authenticated token is reused from the in-process token cache, 0 disables the cache.
+TOKEN_CACHE_TTL = int(os.environ.get("TOKEN_CACHE_TTL", 0))
+
+# Records per-view query counts and timings, served at /v1/metrics/ and in `Server-Timing` headers.
+REQUEST_METRICS = os.environ.get("REQUEST_METRICS", "").lower() in ("1", "true")
+# Requests taking at least this many milliseconds are logged with their SQL when request metrics are on, 0 disables it.
+SLOW_REQUEST_MS = float(os.environ.get("SLOW_REQUEST_MS", 0))
+# Bearer token scrapers send to read /v1/metrics/, which staff users and clients in METRICS_ALLOWED_NETWORKS (comma
+# separated, e.g. 10.0.0.0/8,127.0.0.1/32) may also read. Behind a proxy, only list networks the proxy is not in.
+METRICS_TOKEN = os.environ.get("METRICS_TOKEN", "")
+METRICS_ALLOWED_NETWORKS = [
+    network.strip() for network in os.environ.get("METRICS_ALLOWED_NETWORKS", "").split(",") if network.strip()
+]
+
+# Enqueues the review aggregate and search index updates of rating and feedback writes as `ProductJob`s, run by the
+# `process_product_jobs` worker, instead of running them in the request.
+DEFER_REVIEW_SIDE_EFFECTS = os.environ.get("DEFER_REVIEW_SIDE_EFFECTS", "").lower() in ("1", "true")
 
 ALLOWED_HOSTS = ["*"]
 
@@ -60,11 +127,14 @@ INSTALLED_APPS = [
     "django_extensions",
     "django_filters",
     "corsheaders",
+    "wwreviews",
     "accounts",
     "products",
+    "benchmarks",
 ]
 
 MIDDLEWARE = [
+    "wwreviews.metrics.RequestMetricsMiddleware",
     "corsheaders.middleware.CorsMiddleware",
     "django.middleware.security.SecurityMiddleware",
     "django.contrib.sessions.middleware.SessionMiddleware",
@@ -0,0 +1,90 @@
+import asyncio
+
+from asgiref.sync import sync_to_async
+from django.contrib.auth.models import User
+from django.db import connection
+from django.test import TestCase, override_settings
+from rest_framework.test import APIClient
+
+from products.models import Category, Product
+from wwreviews.metrics import REGISTRY, RequestMetricsMiddleware
+
+
+@override_settings(REQUEST_METRICS=True, SLOW_REQUEST_MS=0, METRICS_TOKEN="secret", METRICS_ALLOWED_NETWORKS=[])
+class RequestMetricsTests(TestCase):
+    def setUp(self):
+        REGISTRY.clear()
+        Product.objects.create(
+            name="Track Saw",
+            price=599,
+            link="https://example.com/saw",
+            image_url="https://example.com/saw.png",
+            category=Category.objects.create(name="Saws"),
+        )
+
+    def test_server_timing_and_prometheus_metrics(self):
+        client = APIClient()
+        response = client.get("/v1/products/category/")
+        self.assertRegex(
+            response["Server-Timing"],
+            r'^db;dur=[\d.]+;desc="\d+ queries", serialize;dur=[\d.]+, render;dur=[\d.]+, app;dur=-?[\d.]+, '
+            r"total;dur=[\d.]+$",
+        )
+        client.get("/v1/products/category/")
+        client.get("/v1/products/product/9999/")
+        self.assertGreater(REGISTRY.snapshot()["GET", "category-list"].serialize_time, 0)
+
+        metrics = client.get("/v1/metrics/", HTTP_AUTHORIZATION="Bearer secret").content.decode()
+        self.assertIn('wwreviews_requests_total{method="GET",view="category-list",status="200"} 2', metrics)
+        self.assertIn('wwreviews_requests_total{method="GET",view="product-detail",status="404"} 1', metrics)
+        self.assertIn('wwreviews_request_duration_seconds_count{method="GET",view="category-list"} 2', metrics)
+        self.assertIn(
+            'wwreviews_request_duration_seconds_bucket{method="GET",view="category-list",le="+Inf"} 2', metrics
+        )
+        self.assertRegex(metrics, r'wwreviews_request_queries_total\{method="GET",view="category-list"\} [1-9]')
+        self.assertIn('wwreviews_request_serialize_seconds_total{method="GET",view="category-list"}', metrics)
+
+    async def test_async_requests_are_timed_without_adapting_views(self):
+        # Wraps the connection of the thread running the queries of async views, opened before the hooks were.
+        await sync_to_async(APIClient().get)("/v1/products/category/")
+        response = await self.async_client.get("/v1/products/async/product/")
+        self.assertEqual(response.status_code, 200)
+        self.assertRegex(response["Server-Timing"], r'^db;dur=[\d.]+;desc="[1-9]\d* queries", serialize;dur=[\d.]+')
+        stats = REGISTRY.snapshot()["GET", "products.async_views.AsyncProductView"]
+        self.assertGreater(stats.serialize_time, 0)
+
+        async def get_response(request):
+            pass
+
+        # Django only adapts the middleware, and the handlers after it, to run in threads if it is not async itself.
+        self.assertTrue(asyncio.iscoroutinefunction(RequestMetricsMiddleware(get_response)))
+
+    def test_metrics_access(self):
+        client = APIClient()
+        self.assertEqual(client.get("/v1/metrics/").status_code, 403)
+        self.assertEqual(client.get("/v1/metrics/", HTTP_AUTHORIZATION="Bearer wrong").status_code, 403)
+        with override_settings(METRICS_ALLOWED_NETWORKS=["127.0.0.0/8"]):
+            self.assertEqual(client.get("/v1/metrics/").status_code, 200)
+        client.force_login(User.objects.create(username="staff", is_staff=True))
+        self.assertEqual(client.get("/v1/metrics/").status_code, 200)
+
+    def test_slow_requests_are_logged_with_their_sql(self):
+        with override_settings(SLOW_REQUEST_MS=0.001), self.assertLogs("wwreviews.metrics", "WARNING") as logs:
+            APIClient().get("/v1/products/product/")
+        self.assertIn("Slow request GET /v1/products/product/ (product-list)", logs.output[0])
+        self.assertIn('FROM "products_product"', logs.output[0])
+
+    @override_settings(REQUEST_METRICS=False)
+    def test_disabled(self):
+        response = APIClient().get("/v1/products/category/")
+        self.assertNotIn("Server-Timing", response)
+        self.assertEqual(APIClient().get("/v1/metrics/").status_code, 404)
+
+
+class DatabaseSetupTests(TestCase):
+    def test_sqlite_pragmas_applied_on_connect(self):
+        if connection.vendor != "sqlite":
+            self.skipTest("SQLite only.")
+        with connection.cursor() as cursor:
+            self.assertEqual(cursor.execute("PRAGMA synchronous").fetchone(), (1,))
+            self.assertEqual(cursor.execute("PRAGMA cache_size").fetchone(), (-64_000,))
@@ -18,6 +18,7 @@ from django.urls import include, path
 from django.views.decorators.csrf import csrf_exempt
 from rest_framework.routers import DefaultRouter
 
+from wwreviews.metrics import metrics_view
 from wwreviews.views import ChangePasswordEndpoint, SignupEndpoint, TokenEndpoint, UserEndpoint
 
 router = DefaultRouter()
@@ -31,4 +32,5 @@ urlpatterns = [
     path("v1/auth/change-password/", ChangePasswordEndpoint.as_view()),
     path("v1/accounts/", include("accounts.urls")),
     path("v1/products/", include("products.urls")),
+    path("v1/metrics/", metrics_view, name="metrics"),
 ]
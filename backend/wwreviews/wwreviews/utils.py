@@ -1,14 +1,15 @@
 from typing import Any, Literal
 
-from django.db import models
+from django.db import models, transaction
 from django.http import QueryDict
 from rest_framework import status
-from rest_framework.authentication import TokenAuthentication
 from rest_framework.generics import CreateAPIView
 from rest_framework.permissions import AllowAny, IsAuthenticated
 from rest_framework.response import Response
 from rest_framework.viewsets import ModelViewSet, ReadOnlyModelViewSet
 
+from accounts.authentication import MemberTokenAuthentication
+
 READ_ACTIONS = {"retrieve", "list"}
 
 
@@ -59,7 +60,7 @@ class IsAuthenticatedMixin:
     """
 
     permission_classes = [IsAuthenticated]
-    authentication_classes = [TokenAuthentication]
+    authentication_classes = [MemberTokenAuthentication]
 
 
 class IsAuthenticatedView(IsAuthenticatedMixin, ModelViewSet):
@@ -82,16 +83,17 @@ class ReadOnlyIsAuthenticatedView(IsAuthenticatedMixin, ReadOnlyModelViewSet):
 
 class UnauthenticatedReadMixin:
     """
-    Mixin to allow READ operations.
+    Mixin to allow READ operations. Views with extra read-only actions can extend `read_actions` with their names.
     """
 
-    authentication_classes = [TokenAuthentication]
+    authentication_classes = [MemberTokenAuthentication]
+    read_actions = READ_ACTIONS
 
     def get_permissions(self):
         """
         Gets the permissions for this class. Allows READ operations.
         """
-        if self.action in READ_ACTIONS:
+        if self.action in self.read_actions:
             return [AllowAny()]
         return [IsAuthenticated()]
 
@@ -155,6 +157,25 @@ class CreateUserFieldMixin:
         return super().create(request, *args, **kwargs)
 
 
+class AtomicWriteMixin:
+    """
+    Mixin for a ModelViewSet saving or deleting each instance in a transaction, along with whatever its signal handlers
+    write, such as the jobs they enqueue.
+    """
+
+    def perform_create(self, serializer):
+        with transaction.atomic():
+            super().perform_create(serializer)
+
+    def perform_update(self, serializer):
+        with transaction.atomic():
+            super().perform_update(serializer)
+
+    def perform_destroy(self, instance):
+        with transaction.atomic():
+            super().perform_destroy(instance)
+
+
 class CreatedAtMixin(models.Model):
     created_at = models.DateTimeField(auto_now_add=True)
 
@@ -169,6 +190,42 @@ class UpdatedAtMixin(models.Model):
         abstract = True
 
 
+class LoadedValuesMixin:
+    """
+    Model mixin remembering the field values an instance was loaded from the database with in `_loaded_values`, so
+    signal handlers can tell which fields an update changed without querying for the previous row.
+    """
+
+    @classmethod
+    def from_db(cls, db, field_names, values):
+        instance = super().from_db(db, field_names, values)
+        instance._loaded_values = dict(zip(field_names, values))
+        return instance
+
+    def has_changed(self, fields: list[str]) -> bool:
+        """
+        Whether any of the fields of a just saved instance may differ from the values it was loaded with. Fields still
+        deferred were not saved, while fields assigned after loading the instance without them may have changed.
+        """
+        loaded = getattr(self, "_loaded_values", None)
+        if loaded is None:
+            return True
+        deferred = self.get_deferred_fields()
+        return any(
+            field not in deferred and (field not in loaded or loaded[field] != getattr(self, field)) for field in fields
+        )
+
+    def remember_loaded_values(self, fields: list[str]):
+        """
+        Records the saved values of the fields, which the next save is then compared with.
+        """
+        deferred = self.get_deferred_fields()
+        self._loaded_values = {
+            **getattr(self, "_loaded_values", {}),
+            **{field: getattr(self, field) for field in fields if field not in deferred},
+        }
+
+
 class TrackedMixin(CreatedAtMixin, UpdatedAtMixin):
     """ """
 
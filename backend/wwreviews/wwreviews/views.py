@@ -13,7 +13,7 @@ from rest_framework.permissions import AllowAny
 from rest_framework.response import Response
 from rest_framework.views import APIView
 
-from accounts.models import Member
+from accounts.permissions import is_moderator
 from wwreviews.serializers import RegisterSerializer, UserSerializer
 from wwreviews.utils import READ_ACTIONS, IsAuthenticatedMixin, IsAuthenticatedView
 
@@ -29,11 +29,7 @@ class UserEndpoint(IsAuthenticatedView):
     filterset_fields = ["id", "username", "email", "first_name", "last_name"]
 
     def get_queryset(self):
-        if (
-            self.request.user is not None
-            and self.request.user.member.role == Member.Role.MODERATOR
-            and self.action in READ_ACTIONS
-        ):
+        if self.action in READ_ACTIONS and is_moderator(self.request):
             return self.queryset
         return self.queryset.filter(id=self.request.user.id)
 